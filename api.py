@@ -1,10 +1,24 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+import json
+import numpy as np
 import uvicorn
 from api_config import api_settings
-from app import generate_recommendations, generate_conversational_response
+from app import generate_recommendations, generate_response, extract_info_directly, recommendation_lookups
+from budget_engine import get_budget_engine
+from cache import get_cache
+from http_cache import EncodedBody, request_key
+from itinerary_store import get_itinerary_store
+from job_queue import JobQueue, QueueFull, create_job_store, job_view
+from metrics import metrics
+from deadline import deadline, current_deadline, submit as submit_with_deadline, PartialResult
+from profiling import profile_request, profile_path
+from session_store import create_session_store, new_session, new_session_id
 
 app = FastAPI(
     title="Travel Agent API",
@@ -12,6 +26,29 @@ app = FastAPI(
     version=api_settings.API_VERSION
 )
 
+# Server-side conversation sessions
+session_store = create_session_store(
+    backend=api_settings.SESSION_BACKEND,
+    path=api_settings.SESSION_DB_PATH,
+    ttl=api_settings.SESSION_TTL,
+    max_sessions=api_settings.SESSION_MAX_SESSIONS,
+    max_bytes=api_settings.SESSION_MAX_BYTES
+)
+
+# Runs the distinct lookups of batch recommendation requests
+batch_executor = ThreadPoolExecutor(max_workers=api_settings.BATCH_MAX_WORKERS, thread_name_prefix="batch-lookup")
+
+# Background itinerary jobs (POST /api/recommendations with "background": true)
+job_queue = JobQueue(
+    create_job_store(backend=api_settings.JOB_BACKEND, path=api_settings.JOB_DB_PATH),
+    max_workers=api_settings.JOB_MAX_WORKERS,
+    max_queued=api_settings.JOB_MAX_QUEUED,
+    max_retries=api_settings.JOB_MAX_RETRIES,
+    result_ttl=api_settings.JOB_RESULT_TTL,
+    timeout=api_settings.JOB_TIMEOUT,
+    callback_hosts=api_settings.JOB_CALLBACK_HOSTS
+)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -27,18 +64,136 @@ class TravelRequest(BaseModel):
     start_date: Optional[str] = None
     end_date: Optional[str] = None
     preferences: Optional[Dict[str, Any]] = None
+    # Build the itinerary as a background job and answer with its ID straight away
+    background: bool = False
+    # Receives the finished job (as returned by GET /api/jobs/{id}) in a POST
+    callback_url: Optional[str] = None
+
+class BatchTravelRequest(BaseModel):
+    items: List[TravelRequest]
+    # Seconds for the whole batch, capped at BATCH_TIMEOUT
+    timeout: Optional[float] = None
+
+class QuoteRequest(BaseModel):
+    destinations: List[str]
+    days: List[int]
+    budget_levels: List[str] = ["moderate"]
+    travellers: List[int] = [1]
+    # Quote every combination of the lists instead of matching them up item by item
+    grid: bool = False
 
 class ChatRequest(BaseModel):
     message: str
+    session_id: Optional[str] = None
+    # Only needed to seed a new session; later turns only send session_id
     history: Optional[List[Dict[str, str]]] = None
     travel_info: Optional[Dict[str, Any]] = None
 
+# Helpers
+def trip_duration(start_date, end_date):
+    """Turn ISO start and end dates into the "N days" duration the app uses"""
+    try:
+        days = (datetime.strptime(end_date, "%Y-%m-%d") - datetime.strptime(start_date, "%Y-%m-%d")).days + 1
+        if days > 0:
+            return f"{days} days"
+    except (TypeError, ValueError):
+        pass
+    return "5 days"
+
+def travel_info_from_request(request):
+    """Build the travel info dict the app works with from a recommendations request"""
+    preferences = request.preferences or {}
+    return {
+        "destination": request.destination,
+        "duration": preferences.get("duration") or trip_duration(request.start_date, request.end_date),
+        "budget": preferences.get("budget", "moderate"),
+        "preferences": preferences.get("interests", []),
+        "dietary_preferences": preferences.get("dietary_preferences", ""),
+        "accommodation_preferences": preferences.get("accommodation_preferences", ""),
+        "travel_date": request.start_date or ""
+    }
+
 # Dependencies
 async def verify_api_key(x_api_key: str = Header(None)):
     if api_settings.API_KEY and x_api_key != api_settings.API_KEY:
         raise HTTPException(status_code=403, detail="Invalid API key")
     return x_api_key
 
+def profiling_requested(x_profile_token: str = Header(None)):
+    return bool(api_settings.PROFILE_TOKEN) and x_profile_token == api_settings.PROFILE_TOKEN
+
+def run_profiled(response, profile, label, func, *args, **kwargs):
+    """Run func, under the sampling profiler when the request carried a valid profile token"""
+    if not profile:
+        return func(*args, **kwargs)
+    
+    with profile_request(label) as profiler:
+        result = func(*args, **kwargs)
+    
+    response.headers["X-Profile-Id"] = profiler.profile_id
+    response.headers["X-Profile-Top"] = ", ".join(
+        f"{entry['function']}:{entry['line']} {entry['percent']}%" for entry in profiler.top_functions(limit=5)
+    )
+    return result
+
+def build_recommendations(travel_info):
+    """Recommendations response body for travel info, built under the current deadline.
+
+    Raises PartialResult when a lookup ran out of time, so the body is sent but never cached.
+    """
+    recommendations = generate_recommendations(travel_info)
+    # Point clients at the stored copy they can fetch again by ID
+    stored = get_itinerary_store().find(travel_info)
+    headers = {"X-Itinerary-Id": stored["id"]} if stored else {}
+    body = EncodedBody(json.dumps(recommendations).encode("utf-8"), min_size=api_settings.COMPRESSION_MIN_SIZE, headers=headers)
+    build_deadline = current_deadline()
+    if build_deadline is not None and build_deadline.partial:
+        raise PartialResult(body)
+    return body
+
+def refresh_recommendations(travel_info):
+    """Rebuild a cached recommendations body in the background, under a deadline of its own"""
+    with deadline(api_settings.REQUEST_TIMEOUT):
+        return build_recommendations(travel_info)
+
+def encoded_response(body, if_none_match=None, accept_encoding=None, headers=None, cache_control="no-cache"):
+    """Send an EncodedBody: 304 when the client already has it, else its best compressed variant"""
+    coding, content, etag = body.negotiate(accept_encoding)
+    # no-cache: clients may keep the body but must revalidate it with If-None-Match
+    headers = {**body.headers, **(headers or {}), "ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": cache_control}
+    if body.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(content=content, media_type=body.media_type, headers=headers)
+
+def render_section(value):
+    """Lookup results as JSON: lists of results as their text lines, forecasts as they are"""
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    return str(value)
+
+def recommendations_job(travel_info, progress):
+    """Build an itinerary as a background job, publishing each lookup as soon as it finishes"""
+    lookup_results = None
+    if not get_itinerary_store().find(travel_info):
+        futures = {
+            submit_with_deadline(batch_executor, func, *args): name
+            for name, (_, func, args) in recommendation_lookups(travel_info).items()
+        }
+        lookup_results = {}
+        for future in as_completed(futures):
+            name = futures[future]
+            lookup_results[name] = future.result()
+            progress(name, render_section(lookup_results[name]))
+    recommendations = generate_recommendations(travel_info, lookup_results)
+    stored = get_itinerary_store().find(travel_info)
+    return {"recommendations": recommendations, "itinerary_id": stored["id"] if stored else None}
+
+job_queue.register("recommendations", recommendations_job)
+
 # Routes
 @app.get("/")
 async def root():
@@ -47,38 +202,250 @@ async def root():
 @app.post("/api/recommendations")
 async def get_recommendations(
     request: TravelRequest,
-    api_key: str = Depends(verify_api_key)
+    response: Response,
+    api_key: str = Depends(verify_api_key),
+    profile: bool = Depends(profiling_requested),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
 ):
     try:
-        recommendations = generate_recommendations(
-            destination=request.destination,
-            start_date=request.start_date,
-            end_date=request.end_date,
-            preferences=request.preferences
-        )
-        return recommendations
+        travel_info = travel_info_from_request(request)
+        
+        if request.background:
+            # Don't hold this worker for the whole build; clients poll the job or get a callback
+            try:
+                job = job_queue.submit("recommendations", travel_info, request.callback_url)
+            except QueueFull as e:
+                raise HTTPException(status_code=503, detail=f"Too many background jobs, try again later ({str(e)})")
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return JSONResponse(
+                status_code=202,
+                content={"job_id": job["id"], "status": job["status"], "status_url": f"/api/jobs/{job['id']}"},
+                headers={"Location": f"/api/jobs/{job['id']}"}
+            )
+        
+        def cached_body():
+            # Identical requests share one built (and compressed) itinerary until it expires. Stale
+            # copies are rebuilt after this request has returned, so from the travel info alone
+            try:
+                return get_cache("responses").get(
+                    request_key("recommendations", travel_info),
+                    lambda: build_recommendations(travel_info),
+                    refresh=lambda: refresh_recommendations(travel_info)
+                )
+            except PartialResult as e:
+                return e.value  # Send it, but don't cache it
+        
+        with deadline(api_settings.REQUEST_TIMEOUT) as request_deadline:
+            # Profile the whole lookup, so cache hits show up in profiles as well as builds
+            body = run_profiled(response, profile, "recommendations", cached_body)
+        
+        headers = {name: value for name, value in response.headers.items() if name.startswith("x-profile-")}
+        if request_deadline.partial:
+            headers["X-Partial"] = ", ".join(request_deadline.skipped)
+        return encoded_response(body, if_none_match, accept_encoding, headers)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/recommendations/batch")
+def get_batch_recommendations(
+    request: BatchTravelRequest,
+    api_key: str = Depends(verify_api_key)
+):
+    if len(request.items) > api_settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {api_settings.BATCH_MAX_ITEMS} items")
+    
+    timeout = min(request.timeout or api_settings.BATCH_TIMEOUT, api_settings.BATCH_TIMEOUT)
+    
+    with deadline(timeout) as batch_deadline:
+        # Collapse the lookups shared between items (the same destination with a
+        # different duration or budget) and start each distinct one once; every
+        # lookup runs under the batch's deadline
+        items = []
+        futures = {}
+        itinerary_store = get_itinerary_store()
+        for item in request.items:
+            travel_info = travel_info_from_request(item)
+            lookups = recommendation_lookups(travel_info) if travel_info["destination"].strip() else None
+            stored = itinerary_store.find(travel_info) if lookups else None
+            if stored:
+                # Already built recently; no lookups needed
+                lookups = {}
+            if lookups:
+                for key, func, args in lookups.values():
+                    if key not in futures:
+                        futures[key] = submit_with_deadline(batch_executor, func, *args)
+            items.append((travel_info, lookups))
+        
+        done, pending = wait(futures.values(), timeout=batch_deadline.remaining())
+        for future in pending:
+            future.cancel()
+        if pending:
+            batch_deadline.mark_partial("lookups")
+        
+        results = []
+        for index, (travel_info, lookups) in enumerate(items):
+            result = {"index": index, "destination": travel_info["destination"]}
+            try:
+                if lookups is None:
+                    raise ValueError("A destination is required")
+                lookup_results = {}
+                for name, (key, _, _) in lookups.items():
+                    future = futures[key]
+                    if future not in done:
+                        raise TimeoutError(f"The {name} lookup did not finish within {timeout:g} seconds")
+                    lookup_results[name] = future.result()
+                result["recommendations"] = generate_recommendations(travel_info, lookup_results)
+                stored = itinerary_store.find(travel_info)
+                if stored:
+                    result["itinerary_id"] = stored["id"]
+            except Exception as e:
+                result["error"] = str(e)
+            results.append(result)
+    
+    return {
+        "results": results,
+        "lookups": len(futures),
+        "failed": sum("error" in result for result in results),
+        # Some lookups ran out of time and were answered from whatever had arrived
+        "partial": batch_deadline.partial
+    }
+
+@app.post("/api/quotes")
+async def get_quotes(
+    request: QuoteRequest,
+    api_key: str = Depends(verify_api_key)
+):
+    columns = {
+        "destination": request.destinations,
+        "days": request.days,
+        "budget_level": request.budget_levels,
+        "travellers": request.travellers
+    }
+    if request.grid:
+        combinations = 1
+        for values in columns.values():
+            combinations *= len(values)
+    else:
+        # Lists of one value apply to every item
+        combinations = max(len(values) for values in columns.values())
+        if any(len(values) not in (1, combinations) for values in columns.values()):
+            raise HTTPException(status_code=400, detail="Lists must have the same length, or a single value")
+    if combinations > api_settings.QUOTE_MAX_COMBINATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {api_settings.QUOTE_MAX_COMBINATIONS} combinations per request")
+    if not combinations:
+        return {"count": 0, "quotes": {}}
+    
+    try:
+        engine = get_budget_engine()
+        if request.grid:
+            quote = engine.quote_grid(request.destinations, request.days, request.budget_levels, request.travellers)
+            # Row-major order: destination, then days, budget level and travellers
+            index = [axis.ravel() for axis in np.indices(quote["total"].shape)]
+            columns = {name: [values[i] for i in axis] for (name, values), axis in zip(columns.items(), index)}
+        else:
+            quote = engine.quote(request.destinations, request.days, request.budget_levels, request.travellers)
+            columns = {name: values * (combinations // len(values)) for name, values in columns.items()}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Column-oriented: one list per field, all in the same order
+    for category, costs in quote.items():
+        columns[category] = np.round(costs.ravel(), 2).tolist()
+    return {"count": combinations, "quotes": columns}
+
 @app.post("/api/chat")
 async def chat(
     request: ChatRequest,
-    api_key: str = Depends(verify_api_key)
+    response: Response,
+    api_key: str = Depends(verify_api_key),
+    profile: bool = Depends(profiling_requested)
 ):
     try:
-        response = generate_conversational_response(
-            user_input=request.message,
-            travel_info=request.travel_info,
-            history=request.history
+        session_id = request.session_id or new_session_id()
+        session = session_store.get(session_id) or new_session()
+        if request.history and not session["messages"]:
+            session["messages"] = list(request.history)
+        if request.travel_info:
+            session["travel_info"].update(request.travel_info)
+        session["messages"].append({"role": "user", "content": request.message})
+        
+        # Extract travel information server-side, the same way the Streamlit app does; the session
+        # keeps what was found in messages it has since trimmed, and new findings are merged into it
+        session["travel_info"] = extract_info_directly(
+            [msg["content"] for msg in session["messages"]], session["travel_info"]
         )
-        return {"response": response}
+        
+        with deadline(api_settings.REQUEST_TIMEOUT) as request_deadline:
+            reply = run_profiled(
+                response, profile, "chat", generate_response,
+                request.message, session["travel_info"], session
+            )
+        session["messages"].append({"role": "assistant", "content": reply})
+        session_store.save(session_id, session)
+        stored = get_itinerary_store().find(session["travel_info"]) if session["itinerary"] else None
+        return {
+            "response": reply,
+            "session_id": session_id,
+            "travel_info": session["travel_info"],
+            "itinerary": session["itinerary"],
+            "itinerary_id": stored["id"] if stored and stored["itinerary"] == session["itinerary"] else None,
+            # True when some lookups ran out of time and the reply was built without them
+            "partial": request_deadline.partial,
+            "skipped": request_deadline.skipped
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/itineraries/{itinerary_id}")
+async def get_itinerary(
+    itinerary_id: str,
+    api_key: str = Depends(verify_api_key),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
+):
+    record = get_itinerary_store().get(itinerary_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Itinerary not found")
+    body = EncodedBody(json.dumps(record).encode("utf-8"), min_size=api_settings.COMPRESSION_MIN_SIZE)
+    # Records never change, so clients can keep them as long as they like
+    return encoded_response(body, if_none_match, accept_encoding, cache_control="private, max-age=31536000, immutable")
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, api_key: str = Depends(verify_api_key)):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    # Sections fill in while the job runs; result is set once it is done
+    return job_view(job)
+
+@app.get("/api/metrics")
+async def get_metrics(api_key: str = Depends(verify_api_key)):
+    return metrics.snapshot()
+
+@app.get("/api/profiles/{profile_id}", response_class=PlainTextResponse)
+async def get_profile(
+    profile_id: str,
+    api_key: str = Depends(verify_api_key),
+    profile: bool = Depends(profiling_requested)
+):
+    if not profile:
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+    try:
+        with open(profile_path(profile_id), encoding="utf-8") as f:
+            return f.read()
+    except (ValueError, FileNotFoundError):
+        raise HTTPException(status_code=404, detail="Profile not found")
+
 if __name__ == "__main__":
     uvicorn.run(
         "api:app",
         host="0.0.0.0",
         port=8000,
-        reload=api_settings.DEBUG
+        reload=api_settings.DEBUG,
+        # uvicorn can't reload and run several workers at once
+        workers=1 if api_settings.DEBUG else api_settings.API_WORKERS
     ) 
\ No newline at end of file
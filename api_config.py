@@ -6,15 +6,50 @@ class APISettings(BaseSettings):
     API_VERSION: str = "v1"
     API_PREFIX: str = "/api"
     DEBUG: bool = False
+    API_WORKERS: int = 1  # Set through `run_server.py --mode api --workers N`
     
     # Security
     API_KEY_HEADER: str = "X-API-Key"
     API_KEY: Optional[str] = None
     
+    # Profiling (requests carrying X-Profile-Token with this value are profiled)
+    PROFILE_TOKEN: Optional[str] = None
+    
     # Rate Limiting
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_PERIOD: int = 3600  # 1 hour
     
+    # Conversation sessions ("memory" or "sqlite" to share sessions between workers)
+    SESSION_BACKEND: str = "memory"
+    SESSION_DB_PATH: str = "sessions.db"
+    SESSION_TTL: int = 3600  # 1 hour
+    SESSION_MAX_SESSIONS: int = 10000
+    SESSION_MAX_BYTES: int = 64 * 1024 * 1024
+    
+    # Time budget in seconds for one chat or recommendations request
+    REQUEST_TIMEOUT: float = 45.0
+    
+    # Batch recommendations
+    BATCH_MAX_ITEMS: int = 50
+    BATCH_MAX_WORKERS: int = 8  # Concurrent lookups across all batches
+    BATCH_TIMEOUT: float = 30.0  # Seconds for a whole batch
+    
+    # Background recommendation jobs ("memory", or "sqlite" so every worker can report on them)
+    JOB_BACKEND: str = "memory"
+    JOB_DB_PATH: str = ".cache/jobs.db"
+    JOB_MAX_WORKERS: int = 4  # Jobs running at once
+    JOB_MAX_QUEUED: int = 1000
+    JOB_MAX_RETRIES: int = 2
+    JOB_TIMEOUT: float = 120.0  # Seconds for one attempt
+    JOB_RESULT_TTL: int = 3600  # Seconds a finished job can still be fetched
+    JOB_CALLBACK_HOSTS: list = []  # Hosts job callbacks may be POSTed to; none when empty
+    
+    # Bulk price quotes
+    QUOTE_MAX_COMBINATIONS: int = 100000
+    
+    # Responses smaller than this many bytes are sent uncompressed
+    COMPRESSION_MIN_SIZE: int = 1024
+    
     # CORS
     ALLOWED_ORIGINS: list = ["*"]
     
@@ -16,6 +16,31 @@ from googlesearch import search
 import time
 from bs4 import BeautifulSoup
 import random
+import uuid
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from profiling import profile_request
+from destination_catalog import get_catalog
+from gazetteer import resolve_place, canonical_name, place_key
+from search_index import get_search_index
+from prefetch import prefetcher
+from cache import get_cache
+from negative_cache import get_negative_cache
+from page_cache import get_page_cache, dedupe_urls
+from search_result import SearchResult
+from text_cleanup import clean_title, clean_description, short_title, first_sentence
+from result_pager import get_result_pager, result_set_key, UncachedResults
+from circuit_breaker import breakers
+from metrics import metrics
+from hedging import hedger
+from deadline import deadline, current_deadline, budget, expired, mark_partial, pause, DeadlineExceeded, PartialResult
+from day_planner import get_day_planner
+from itinerary_store import get_itinerary_store
+from budget_engine import get_budget_engine, BUDGET_LEVELS
+from forecast import forecast_cycle, forecast_key, summarize_days, format_day, trip_start
+from intent_router import route_message
+from chat_history import MessageArchive, compact, session_memory, RENDER_WINDOW, SESSION_MEMORY_BUDGET
 
 # Set page configuration
 st.set_page_config(
@@ -88,6 +113,12 @@ if not OPENWEATHER_API_KEY:
 if not GEMINI_API_KEY:
     st.error("Gemini API key not found. Please configure it in your environment.")
 
+# Time budget in seconds for answering one chat message
+CHAT_TIMEOUT = float(os.getenv("CHAT_TIMEOUT", "45"))
+
+# Show the request profiler toggle in the sidebar (for debugging deployed instances)
+ENABLE_PROFILING = os.getenv("ENABLE_PROFILING", "false").lower() == "true"
+
 # Define base URLs and model info
 LOCAL_API_BASE = os.getenv("OPENAI_API_BASE", "http://localhost:11434/v1")
 
@@ -178,135 +209,255 @@ def setup_llm():
 llm = setup_llm()
 
 # Define the search function with improved error handling and rate limiting
-def search_web(query, num_results=5, timeout=15):
+def search_web(query, num_results=5, timeout=15, destination=""):
     """Perform a web search and return structured results with improved robustness"""
     if not query or not query.strip():
         return []
         
-    try:
-        # Perform the search
-        search_results = []
-        user_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Safari/605.1.15',
-            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        ]
+    # Don't repeat a search that recently came back empty or timed out
+    cache_key = f"{query}_{num_results}"
+    if cache_key in get_negative_cache("query"):
+        print(f"Skipping recently failed search: {query}")
+        return []
         
-        # Use an improved cache mechanism with expiration
-        if "search_cache" not in st.session_state:
-            st.session_state.search_cache = {}
-        if "search_cache_timestamps" not in st.session_state:
-            st.session_state.search_cache_timestamps = {}
-        
-        # Check cache with expiration (5 minutes)
-        cache_key = f"{query}_{num_results}"
-        current_time = time.time()
-        if cache_key in st.session_state.search_cache:
-            cache_age = current_time - st.session_state.search_cache_timestamps.get(cache_key, 0)
-            if cache_age < 300:  # 5 minutes expiration
-                print("Using cached search result")
-                return st.session_state.search_cache[cache_key]
-        
-        # Perform the search with the correct parameters
-        search_urls = list(search(query, num_results=num_results * 2))  # Get more results to filter
-        
-        for url in search_urls:
+    try:
+        # Stale results are served while a background refresh runs (see cache.CACHE_TTLS)
+        return get_cache("search").get(cache_key, lambda: fetch_search_results(query, num_results, timeout, destination))
+    except PartialResult as e:
+        # Out of time part way through: use what arrived, without caching it
+        mark_partial("search")
+        return e.value
+    except DeadlineExceeded:
+        mark_partial("search")
+        return []
+    except Exception as e:
+        print(f"Error in web search: {str(e)}")
+        get_negative_cache("query").add(cache_key)
+        return []
+
+# Fetch one result page, reporting the outcome to its host's circuit breaker
+def fetch_page(url, headers, timeout=15):
+    """Fetch a page with retries; the host's breaker must have allowed the fetch"""
+    breaker = breakers.get(url)
+    started = time.time()
+    response = None
+    try:
+        # Add retry mechanism; every attempt only gets what is left of the request's deadline
+        max_retries = 3
+        for retry in range(max_retries):
             try:
-                # Get the webpage content with increased timeout and rotating user agents
-                headers = {
-                    'User-Agent': random.choice(user_agents),
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                    'Accept-Language': 'en-US,en;q=0.5',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1'
-                }
-                
-                # Add retry mechanism
-                max_retries = 3
-                for retry in range(max_retries):
-                    try:
-                        response = requests.get(url, timeout=timeout, headers=headers)
-                        if response.status_code == 200:
-                            break
-                        elif response.status_code == 429:  # Too Many Requests
-                            if retry < max_retries - 1:
-                                time.sleep(random.uniform(2, 5))
-                                continue
-                    except requests.Timeout:
-                        if retry < max_retries - 1:
-                            time.sleep(random.uniform(1, 3))
-                            continue
-                        raise
-                
+                response = requests.get(url, timeout=budget(timeout), headers=headers)
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    
-                    # Get title with improved cleaning
-                    title = soup.title.string if soup.title else url
-                    title = re.sub(r'\s*\|.*$', '', title)  # Remove website name
-                    title = re.sub(r'\s*-\s*.*$', '', title)  # Remove separator and rest
-                    title = re.sub(r'\s+', ' ', title).strip()  # Clean up whitespace
-                    
-                    # Get description with improved extraction
-                    description = ""
-                    meta_desc = soup.find('meta', attrs={'name': 'description'})
-                    if meta_desc:
-                        description = meta_desc.get('content', '')
-                    else:
-                        # Try multiple methods to get description
-                        for tag in ['p', 'div']:
-                            for element in soup.find_all(tag, class_=lambda x: x and ('description' in x.lower() or 'summary' in x.lower())):
-                                description = element.text.strip()
-                                if len(description) > 50:  # Ensure meaningful content
-                                    break
-                            if description:
-                                break
-                        
-                        if not description:
-                            # Get first meaningful paragraph
-                            for p in soup.find_all('p'):
-                                text = p.text.strip()
-                                if len(text) > 50 and not any(x in text.lower() for x in ['copyright', 'all rights reserved', 'privacy policy']):
-                                    description = text[:200] + "..."
-                                    break
-                    
-                    # Clean up description with improved filtering
-                    description = re.sub(r'Visit.*?\.com', '', description, flags=re.IGNORECASE)
-                    description = re.sub(r'https?://.*$', '', description)
-                    description = re.sub(r'www\..*$', '', description)
-                    description = re.sub(r'\s+', ' ', description).strip()
-                    
-                    # Additional quality checks
-                    if (title and description and 
-                        len(title) > 5 and 
-                        len(description) > 20 and
-                        not any(x in url.lower() for x in ['advertisement', 'sponsored', 'promoted'])):
-                        search_results.append({
-                            'title': title,
-                            'url': url,
-                            'description': description
-                        })
-                        
-                        if len(search_results) >= num_results:
-                            break
-                            
+                    break
+                elif response.status_code == 429:  # Too Many Requests
+                    if retry < max_retries - 1:
+                        pause(random.uniform(2, 5))
+                        continue
+            except requests.Timeout:
+                if retry < max_retries - 1 and not expired():
+                    pause(random.uniform(1, 3))
+                    continue
+                raise
+        return response
+    finally:
+        if expired():
+            # Cut short by our own deadline, which says nothing about the host
+            breaker.release()
+        else:
+            breaker.record(response is not None and response.status_code == 200, time.time() - started)
+
+# Rotated between result page fetches
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+]
+
+def parse_result_page(url, html):
+    """Pull a title and description out of a result page, or {} when it has nothing usable"""
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Get the title without the website name; it's stored clean, so nothing downstream cleans it again
+    title = clean_title(soup.title.string if soup.title and soup.title.string else url)
+    
+    # Get description with improved extraction
+    description = ""
+    meta_desc = soup.find('meta', attrs={'name': 'description'})
+    if meta_desc:
+        description = meta_desc.get('content', '')
+    else:
+        # Try multiple methods to get description
+        for tag in ['p', 'div']:
+            for element in soup.find_all(tag, class_=lambda x: x and ('description' in x.lower() or 'summary' in x.lower())):
+                description = element.text.strip()
+                if len(description) > 50:  # Ensure meaningful content
+                    break
+            if description:
+                break
+        
+        if not description:
+            # Get first meaningful paragraph
+            for p in soup.find_all('p'):
+                text = p.text.strip()
+                if len(text) > 50 and not any(x in text.lower() for x in ['copyright', 'all rights reserved', 'privacy policy']):
+                    description = text[:200] + "..."
+                    break
+    
+    # Drop site plugs and trailing URLs once, here
+    description = clean_description(description)
+    
+    # Additional quality checks
+    if len(title) > 5 and len(description) > 20:
+        return {'title': title, 'description': description}
+    return {}
+
+def download_result_page(url, timeout=15):
+    """Fetch and parse one result page; non-200 responses and network errors mark the URL as failed"""
+    failed_urls = get_negative_cache("url")
+    headers = {
+        'User-Agent': random.choice(USER_AGENTS),
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1'
+    }
+    try:
+        response = fetch_page(url, headers, timeout)
+    except requests.RequestException:
+        if not expired():
+            failed_urls.add(url)
+        raise
+    if response.status_code != 200:
+        failed_urls.add(url)
+        raise LookupError(f"HTTP {response.status_code} from {url}")
+    return parse_result_page(url, response.text)
+
+def fetch_search_results(query, num_results=5, timeout=15, destination=""):
+    """Search the web and parse the result pages, bypassing the search cache"""
+    # Perform the search
+    search_results = []
+    
+    # Perform the search with the correct parameters
+    search_urls = list(search(query, num_results=num_results * 2, timeout=budget(5)))  # Get more results to filter
+    
+    # One URL per page and per site, so mirrors and tracking variants aren't fetched twice;
+    # pages are still fetched and shown by the URL search returned
+    search_urls = [url for url in dedupe_urls(search_urls)
+                   if not any(x in url.lower() for x in ['advertisement', 'sponsored', 'promoted'])]
+    
+    # Pages parsed for any earlier query are reused without another download
+    pages = get_page_cache()
+    
+    # Pages that recently timed out or failed aren't fetched again
+    failed_urls = get_negative_cache("url")
+    
+    def page_allowed(url):
+        if url in failed_urls:
+            return False
+        # Hosts that keep timing out or failing are skipped until their circuit closes
+        if not breakers.get(url).allow():
+            metrics.increment("search.pages_skipped_open_circuit")
+            return False
+        return True
+    
+    def load_page(url):
+        started = []
+        
+        def download(url):
+            started.append(url)
+            return download_result_page(url, timeout)
+        
+        try:
+            page, _ = pages.fetch(url, download, wait=budget(15))
+            return url, page
+        finally:
+            # A download reports to the host's breaker; without one, give back what page_allowed() took
+            if not started:
+                breakers.get(url).release()
+    
+    candidates = deque(search_urls)
+    while candidates and len(search_results) < num_results:
+        url = candidates.popleft()
+        if expired():
+            break
+        page = pages.peek(url)
+        if page is None:
+            if not page_allowed(url):
+                continue
+            
+            # With hedging on, a page slower than the usual p90 races the next candidate
+            hedge = {"settled": False, "backup_url": None}
+            hedge_lock = threading.Lock()
+            
+            def next_candidate():
+                while True:
+                    with hedge_lock:
+                        # The hedge can start after the primary already won; leave the candidates alone then
+                        if hedge["settled"]:
+                            raise LookupError("Primary page already loaded")
+                        try:
+                            backup_url = candidates.popleft()
+                        except IndexError:
+                            raise LookupError("No other candidate page to hedge with")
+                        if pages.peek(backup_url) is None and not page_allowed(backup_url):
+                            continue
+                        hedge["backup_url"] = backup_url
+                    return load_page(backup_url)
+            
+            try:
+                loaded_url, page = hedger.call("search_page", lambda url=url: load_page(url), next_candidate)
+            except DeadlineExceeded:
+                break
             except Exception as e:
                 print(f"Error processing URL {url}: {str(e)}")
                 continue
+            finally:
+                with hedge_lock:
+                    hedge["settled"] = True
             
-            # Add a randomized delay to avoid rate limiting
-            time.sleep(random.uniform(1.5, 3.0))
-        
-        # Cache the result with timestamp
-        st.session_state.search_cache[cache_key] = search_results
-        st.session_state.search_cache_timestamps[cache_key] = current_time
+            # When the primary wins, the backup's candidate goes back to the front of the line;
+            # its page is cached or still downloading by then, so it isn't fetched twice
+            if hedge["backup_url"] is not None and loaded_url != hedge["backup_url"]:
+                candidates.appendleft(hedge["backup_url"])
+            url = loaded_url
+            
+            # Add a randomized delay after downloads to avoid rate limiting
+            pause(random.uniform(1.5, 3.0))
         
-        return search_results
-    except Exception as e:
-        print(f"Error in web search: {str(e)}")
-        return []
+        if page:
+            search_results.append(SearchResult(page['title'], url, page['description'], destination))
+    
+    # Keep every parsed result in the local index for later queries
+    if search_results:
+        get_search_index().add(search_results, destination)
+    
+    if expired() and len(search_results) < num_results:
+        if not search_results:
+            raise DeadlineExceeded(f"Request deadline reached while searching for '{query}'")
+        raise PartialResult(search_results)
+    
+    # Treat an empty page set as a failure so a refresh never replaces good cached results
+    if not search_results:
+        raise LookupError(f"No usable search results for '{query}'")
+    
+    return search_results
+
+# Minimum number of indexed results before a search skips the live web search
+LOCAL_RECALL_MIN = 3
+# Larger requests (paged result sets) need the index to cover all of them
+LOCAL_RECALL_MAX_REQUEST = 5
+
+def search_with_index(query, destination, num_results=5):
+    """Answer a search from the local result index, searching the web only when recall is too low"""
+    local_results = get_search_index().search(query, destination=destination, limit=num_results)
+    if len(local_results) >= num_results or (len(local_results) >= LOCAL_RECALL_MIN and num_results <= LOCAL_RECALL_MAX_REQUEST):
+        print(f"Using {len(local_results)} indexed results for: {query}")
+        return local_results
+    web_results = search_web(query, num_results=num_results, destination=destination)
+    # Indexed results first, topped up with new ones from the web
+    return (local_results + [result for result in web_results if result not in local_results])[:num_results]
 
 # Define the search tool
 @tool
@@ -320,14 +471,117 @@ def search_tool(query: str) -> str:
         # Format results in a structured way
         formatted_results = "Here are the relevant search results:\n\n"
         for i, result in enumerate(results, 1):
-            formatted_results += f"{i}. {result['title']}\n"
-            formatted_results += f"   URL: {result['url']}\n"
-            formatted_results += f"   Description: {result['description']}\n\n"
+            formatted_results += f"{i}. {result.title}\n"
+            formatted_results += f"   URL: {result.url}\n"
+            formatted_results += f"   Description: {result.description}\n\n"
         
         return formatted_results
     except Exception as e:
         return f"Error performing search: {str(e)}"
 
+# Raised when OpenWeather answers "city not found" for every way of naming a location
+class LocationNotFound(LookupError):
+    """OpenWeather has no city for this location"""
+
+# Call one OpenWeather endpoint ("weather" or "forecast") for a location
+def fetch_openweather(endpoint, location):
+    """Return OpenWeather's JSON for a location, trying its known city ID, coordinates, then names"""
+    base = f"https://api.openweathermap.org/data/2.5/{endpoint}"
+    params = f"appid={OPENWEATHER_API_KEY}&units=metric"
+    
+    # Go straight to the OpenWeather city this location resolved to before, if any
+    urls = []
+    key = place_key(location)
+    city_id = get_cache("location").peek(key)
+    if city_id:
+        urls.append(f"{base}?id={city_id}&{params}")
+    
+    place = resolve_place(location)
+    if place:
+        # Known places are looked up by their coordinates from the gazetteer
+        urls.append(f"{base}?lat={place.lat}&lon={place.lon}&{params}")
+    else:
+        # Try with different country codes and formats
+        urls += [
+            f"{base}?q={location}&{params}",
+            f"{base}?q={location},US&{params}",
+            f"{base}?q={location},GB&{params}"
+        ]
+    
+    not_found = 0
+    for url in urls:
+        try:
+            # With hedging on, a stalled response gets a duplicate request
+            response = hedger.call("openweather", lambda url=url: requests.get(url, timeout=budget(10)))
+            if response.status_code == 200:
+                data = response.json()
+                # Remember the resolved city so later lookups skip the guessing
+                city_id = data["city"]["id"] if endpoint == "forecast" else data["id"]
+                get_cache("location").set(key, city_id)
+                return data
+            elif response.status_code == 404:
+                not_found += 1
+                continue
+            elif response.status_code == 429:  # Rate limit
+                pause(1)  # Wait before trying next URL
+        except requests.RequestException:
+            continue
+    
+    if expired():
+        raise DeadlineExceeded(f"Request deadline reached while fetching the {endpoint} for {location}")
+    if not_found == len(urls):
+        raise LocationNotFound(f"OpenWeather has no city for {location}")
+    # Rate limits, server errors and network failures say nothing about the location itself
+    raise ConnectionError(f"OpenWeather didn't return the {endpoint} for {location}")
+
+# Fetch and format the current weather for a location, bypassing the cache
+def fetch_weather_report(location):
+    """Fetch the current weather from OpenWeather and build the weather report"""
+    weather_data = fetch_openweather("weather", location)
+    
+    # Extract weather information
+    weather = {
+        "location": weather_data["name"],
+        "country": weather_data["sys"]["country"],
+        "temperature": round(weather_data["main"]["temp"], 1),
+        "feels_like": round(weather_data["main"]["feels_like"], 1),
+        "description": weather_data["weather"][0]["description"].capitalize(),
+        "humidity": weather_data["main"]["humidity"],
+        "wind_speed": round(weather_data["wind"]["speed"], 1),
+        "pressure": weather_data["main"]["pressure"],
+        "visibility": round(weather_data["visibility"] / 1000, 1),  # Convert to km
+        "sunrise": datetime.fromtimestamp(weather_data["sys"]["sunrise"]).strftime("%H:%M"),
+        "sunset": datetime.fromtimestamp(weather_data["sys"]["sunset"]).strftime("%H:%M")
+    }
+    
+    # Generate detailed weather report
+    weather_report = f"🌤️ Weather Report for {weather['location']}, {weather['country']}\n\n"
+    weather_report += f"Current Conditions: {weather['description']}\n"
+    weather_report += f"Temperature: {weather['temperature']}°C (feels like {weather['feels_like']}°C)\n"
+    weather_report += f"Humidity: {weather['humidity']}%\n"
+    weather_report += f"Wind Speed: {weather['wind_speed']} m/s\n"
+    weather_report += f"Pressure: {weather['pressure']} hPa\n"
+    weather_report += f"Visibility: {weather['visibility']} km\n"
+    weather_report += f"Sunrise: {weather['sunrise']}\n"
+    weather_report += f"Sunset: {weather['sunset']}\n\n"
+    
+    # Add weather advice based on conditions
+    if weather['temperature'] > 30:
+        weather_report += "🌡️ Hot weather alert! Stay hydrated and avoid prolonged sun exposure.\n"
+    elif weather['temperature'] < 5:
+        weather_report += "❄️ Cold weather alert! Dress warmly and be prepared for chilly conditions.\n"
+    
+    if weather['humidity'] > 80:
+        weather_report += "💧 High humidity! It might feel warmer than the actual temperature.\n"
+    
+    if weather['wind_speed'] > 10:
+        weather_report += "💨 Strong winds! Hold onto your belongings and be careful with umbrellas.\n"
+    
+    if weather['visibility'] < 5:
+        weather_report += "🌫️ Low visibility! Take extra care when traveling.\n"
+    
+    return weather_report
+
 # Custom tool for weather information with improved error handling
 @tool
 def get_weather(location):
@@ -336,106 +590,58 @@ def get_weather(location):
         if not OPENWEATHER_API_KEY:
             return "Weather information is currently unavailable. Please try again later."
             
-        # Clean up location name with improved handling
-        location = location.replace("In ", "").replace("in ", "")
-        location = location.split(' Is A Great Choice')[0].strip()
-        location = location.split(' For')[0].strip()
-        location = re.sub(r'\s+', ' ', location).strip()
-        
+        location = canonical_name(location)
         if not location:
             return "Please specify a city name to get weather information."
             
-        # Check cache first
-        cache_key = f"weather_{location}"
-        current_time = time.time()
-        
-        if "weather_cache" not in st.session_state:
-            st.session_state.weather_cache = {}
-        if "weather_cache_timestamps" not in st.session_state:
-            st.session_state.weather_cache_timestamps = {}
+        # Locations the weather API recently couldn't resolve fail straight away
+        unresolved = get_negative_cache("location")
+        if place_key(location) in unresolved:
+            return f"Unable to fetch weather data for {location}. Please check if the city name is correct."
             
-        # Check if we have a valid cached result (5 minutes expiration)
-        if cache_key in st.session_state.weather_cache:
-            cache_age = current_time - st.session_state.weather_cache_timestamps.get(cache_key, 0)
-            if cache_age < 300:  # 5 minutes expiration
-                return st.session_state.weather_cache[cache_key]
-        
-        # Try with different country codes and formats
-        urls = [
-            f"https://api.openweathermap.org/data/2.5/weather?q={location},JP&appid={OPENWEATHER_API_KEY}&units=metric",
-            f"https://api.openweathermap.org/data/2.5/weather?q={location}&appid={OPENWEATHER_API_KEY}&units=metric",
-            f"https://api.openweathermap.org/data/2.5/weather?q={location},US&appid={OPENWEATHER_API_KEY}&units=metric",
-            f"https://api.openweathermap.org/data/2.5/weather?q={location},GB&appid={OPENWEATHER_API_KEY}&units=metric"
-        ]
-        
-        weather_data = None
-        for url in urls:
-            try:
-                response = requests.get(url, timeout=10)
-                if response.status_code == 200:
-                    weather_data = response.json()
-                    break
-                elif response.status_code == 404:
-                    continue
-                elif response.status_code == 429:  # Rate limit
-                    time.sleep(1)  # Wait before trying next URL
-            except requests.RequestException:
-                continue
-        
-        if not weather_data:
+        # Stale reports are served while a background refresh runs (see cache.CACHE_TTLS)
+        cache_key = f"weather_{place_key(location)}"
+        try:
+            return get_cache("weather").get(cache_key, lambda: fetch_weather_report(location))
+        except DeadlineExceeded:
+            mark_partial("weather")
+            return f"Weather information for {location} is taking too long to load. Please ask again in a moment."
+        except LocationNotFound:
+            unresolved.add(place_key(location))
             return f"Unable to fetch weather data for {location}. Please check if the city name is correct."
-        
-        # Extract weather information
-        weather = {
-            "location": weather_data["name"],
-            "country": weather_data["sys"]["country"],
-            "temperature": round(weather_data["main"]["temp"], 1),
-            "feels_like": round(weather_data["main"]["feels_like"], 1),
-            "description": weather_data["weather"][0]["description"].capitalize(),
-            "humidity": weather_data["main"]["humidity"],
-            "wind_speed": round(weather_data["wind"]["speed"], 1),
-            "pressure": weather_data["main"]["pressure"],
-            "visibility": round(weather_data["visibility"] / 1000, 1),  # Convert to km
-            "sunrise": datetime.fromtimestamp(weather_data["sys"]["sunrise"]).strftime("%H:%M"),
-            "sunset": datetime.fromtimestamp(weather_data["sys"]["sunset"]).strftime("%H:%M")
-        }
-        
-        # Generate detailed weather report
-        weather_report = f"🌤️ Weather Report for {weather['location']}, {weather['country']}\n\n"
-        weather_report += f"Current Conditions: {weather['description']}\n"
-        weather_report += f"Temperature: {weather['temperature']}°C (feels like {weather['feels_like']}°C)\n"
-        weather_report += f"Humidity: {weather['humidity']}%\n"
-        weather_report += f"Wind Speed: {weather['wind_speed']} m/s\n"
-        weather_report += f"Pressure: {weather['pressure']} hPa\n"
-        weather_report += f"Visibility: {weather['visibility']} km\n"
-        weather_report += f"Sunrise: {weather['sunrise']}\n"
-        weather_report += f"Sunset: {weather['sunset']}\n\n"
-        
-        # Add weather advice based on conditions
-        if weather['temperature'] > 30:
-            weather_report += "🌡️ Hot weather alert! Stay hydrated and avoid prolonged sun exposure.\n"
-        elif weather['temperature'] < 5:
-            weather_report += "❄️ Cold weather alert! Dress warmly and be prepared for chilly conditions.\n"
-        
-        if weather['humidity'] > 80:
-            weather_report += "💧 High humidity! It might feel warmer than the actual temperature.\n"
-        
-        if weather['wind_speed'] > 10:
-            weather_report += "💨 Strong winds! Hold onto your belongings and be careful with umbrellas.\n"
-        
-        if weather['visibility'] < 5:
-            weather_report += "🌫️ Low visibility! Take extra care when traveling.\n"
-        
-        # Cache the result
-        st.session_state.weather_cache[cache_key] = weather_report
-        st.session_state.weather_cache_timestamps[cache_key] = current_time
-        
-        return weather_report
             
     except Exception as e:
         print(f"Weather API error: {str(e)}")
         return f"Error getting weather information for {location}. Please try again later."
 
+# Daily forecast for a location, shared by everyone asking about that city until the next forecast run
+def get_forecast(location):
+    """Return {ISO date: summary} for the next five days at a location, or {} when unavailable"""
+    try:
+        location = canonical_name(location)
+        if not OPENWEATHER_API_KEY or not location:
+            return {}
+        key = place_key(location)
+        if key in get_negative_cache("location"):
+            return {}
+        
+        # Keyed by the forecast run, so entries expire when OpenWeather publishes the next one
+        forecasts = get_cache("forecast")
+        city_id = get_cache("location").peek(key)
+        if city_id:
+            return forecasts.get(f"forecast_{city_id}_{forecast_cycle()}", lambda: summarize_days(fetch_openweather("forecast", location)))
+        
+        # First lookup of this place: resolve its city ID, then file the forecast under it
+        days = summarize_days(fetch_openweather("forecast", location))
+        forecasts.set(f"forecast_{get_cache('location').peek(key)}_{forecast_cycle()}", days)
+        return days
+    except DeadlineExceeded:
+        mark_partial("forecast")
+        return {}
+    except Exception as e:
+        print(f"Forecast error for {location}: {str(e)}")
+        return {}
+
 # Define the functions that will serve as our lightweight web search
 def direct_web_search(query, location=""):
     """
@@ -459,9 +665,9 @@ def direct_web_search(query, location=""):
         # Format results
         formatted_result = "Here are the relevant search results:\n\n"
         for i, result in enumerate(results, 1):
-            formatted_result += f"{i}. {result['title']}\n"
-            formatted_result += f"   URL: {result['url']}\n"
-            formatted_result += f"   Description: {result['description']}\n\n"
+            formatted_result += f"{i}. {result.title}\n"
+            formatted_result += f"   URL: {result.url}\n"
+            formatted_result += f"   Description: {result.description}\n\n"
         
         return formatted_result
             
@@ -470,8 +676,12 @@ def direct_web_search(query, location=""):
         return f"Error searching for '{query}'. Please try again."
 
 # Improved function to extract travel information from user messages
-def extract_info_directly(messages):
-    """Extract travel information directly from user messages with improved pattern matching."""
+def extract_info_directly(messages, known=None):
+    """Extract travel information directly from user messages with improved pattern matching.
+
+    Fields in `known` (found in earlier messages, which may have been archived
+    since) are kept unless the messages give a new value; lists are merged.
+    """
     info = {
         "destination": "",
         "duration": "",
@@ -500,15 +710,8 @@ def extract_info_directly(messages):
     for pattern in destination_patterns:
         destination_match = re.search(pattern, text)
         if destination_match:
-            # Clean up the destination name
-            destination = destination_match.group(1).strip().title()
-            # Remove any duplicate words and clean up
-            words = destination.split()
-            cleaned_words = []
-            for word in words:
-                if word not in cleaned_words and word.lower() not in ['for', 'is', 'a', 'great', 'choice', 'and', 'the', 'to', 'here', 'are', 'some', 'top', 'attractions', 'i', 'recommend']:
-                    cleaned_words.append(word)
-            info["destination"] = " ".join(cleaned_words)
+            # Canonical place name from the gazetteer (cleaned-up text for unknown places)
+            info["destination"] = canonical_name(destination_match.group(1))
             break
     
     # Extract duration with improved pattern matching
@@ -524,10 +727,6 @@ def extract_info_directly(messages):
             info["duration"] = f"{duration_match.group(1)} days"
             break
     
-    # If no duration is specified, default to 5 days
-    if not info["duration"]:
-        info["duration"] = "5 days"
-    
     # Extract travel date with improved pattern matching
     date_patterns = [
         r'(?:in|during|for)\s+(?:the\s+)?(?:month\s+of\s+)?(january|february|march|april|may|june|july|august|september|october|november|december)',
@@ -541,6 +740,20 @@ def extract_info_directly(messages):
             info["travel_date"] = date_match.group(1).title()
             break
     
+    # An exact start date ("2026-05-04", "leaving tomorrow", "starting in 3 days") is kept as an ISO date,
+    # so the days inside the forecast range get their weather
+    today = datetime.now().date()
+    exact_date = re.search(r'\b(\d{4}-\d{2}-\d{2})\b', text)
+    relative_date = re.search(r'\b(?:leaving|starting|arriving|departing)\s+(today|tomorrow|in (\d+) days?)\b', text)
+    if exact_date:
+        try:
+            info["travel_date"] = datetime.strptime(exact_date.group(1), "%Y-%m-%d").date().isoformat()
+        except ValueError:
+            pass
+    elif relative_date:
+        offset = {"today": 0, "tomorrow": 1}.get(relative_date.group(1), int(relative_date.group(2) or 0))
+        info["travel_date"] = (today + timedelta(days=offset)).isoformat()
+    
     # Extract budget with improved pattern matching
     budget_patterns = {
         "low": ["budget", "cheap", "inexpensive", "affordable", "economical", "low cost", "low-cost", "low budget", "low-budget"],
@@ -620,128 +833,144 @@ def extract_info_directly(messages):
     if any(word in text for word in ["wheelchair", "accessible", "disability", "mobility", "handicap"]):
         info["accessibility_needs"] = "wheelchair"
     
+    if known:
+        info = merge_travel_info(known, info)
+    
+    # If no duration is specified, default to 5 days
+    if not info["duration"]:
+        info["duration"] = "5 days"
+    
     return info
 
+# Merge newly extracted travel information into what is already known
+def merge_travel_info(known, found):
+    """Known travel info updated with every non-empty field found; list fields are combined"""
+    merged = dict(known)
+    for key, value in found.items():
+        if isinstance(value, list):
+            existing = list(merged.get(key) or [])
+            merged[key] = existing + [item for item in value if item not in existing]
+        elif value or key not in merged:
+            merged[key] = value
+    return merged
+
 # Improved function to search for attractions
-def search_attractions(destination, preferences=""):
+def search_attractions(destination, preferences="", num_results=5):
     """Search for attractions based on destination and preferences with improved filtering."""
     try:
         if not destination or not destination.strip():
             return ["Please specify a destination to search for attractions."]
             
+        destination = canonical_name(destination)
         print(f"Searching for attractions in {destination} with preferences: {preferences}")
         
-        # Build query based on preferences
-        query = f"Top tourist attractions in {destination}, Japan"
+        # Answer from the offline destination catalog when it has curated data
+        catalog_attractions = get_catalog().get(destination, "attractions")
+        if catalog_attractions and not preferences:
+            return catalog_attractions
+        
+        # Build query based on preferences, qualified with the place's country
+        place = resolve_place(destination)
+        location = place.label if place else destination
+        query = f"Top tourist attractions in {location}"
         if preferences:
             preference_list = [p.strip() for p in preferences.split(',')]
             if len(preference_list) == 1:
-                query = f"Top {preference_list[0]} attractions in {destination}, Japan"
+                query = f"Top {preference_list[0]} attractions in {location}"
             else:
                 preference_str = " and ".join(preference_list)
-                query = f"Top {preference_str} attractions in {destination}, Japan"
+                query = f"Top {preference_str} attractions in {location}"
         
         # Perform the search
         print(f"Searching with query: {query}")
-        results = search_web(query)
+        results = search_with_index(query, destination, num_results)
         
         if not results:
-            return [f"No attraction data available for {destination}. Please try a different search query."]
+            return catalog_attractions or [f"No attraction data available for {destination}. Please try a different search query."]
         
-        # Format results with improved filtering
-        formatted_attractions = []
+        # Keep the results that pass the filters; they're rendered as text only when shown
+        matching_attractions = []
         excluded_terms = ['restaurant', 'hotel', 'accommodation', 'booking', 'tripadvisor', 'expedia', 'top 10', 'best']
         
         for result in results:
-            if not result or not isinstance(result, dict):
+            if not isinstance(result, SearchResult):
                 continue
                 
-            title = result.get('title', '').strip()
-            description = result.get('description', '').strip()
+            title = result.title
+            description = result.description
             
             # Skip results that are likely not attractions or are from wrong location
-            if any(term in title.lower() for term in excluded_terms) or 'delhi' in title.lower():
+            if any(term in title.lower() for term in excluded_terms):
                 continue
                 
             if title and description and len(title) > 5:
-                # Clean up the title and description
-                title = re.sub(r'\s*\|.*$', '', title)
-                title = re.sub(r'\s*-\s*.*$', '', title)
-                
-                formatted_attraction = f"{title} - {description}"
-                formatted_attractions.append(formatted_attraction)
+                matching_attractions.append(result)
         
-        if formatted_attractions:
-            return formatted_attractions
+        if matching_attractions:
+            return matching_attractions
         else:
-            # Return default Tokyo attractions if no search results
-            return [
-                "Senso-ji Temple - Ancient Buddhist temple in Asakusa, Tokyo's oldest temple",
-                "Tokyo Skytree - Tallest structure in Japan with observation decks",
-                "Shibuya Crossing - Famous pedestrian crossing and entertainment area",
-                "Meiji Shrine - Shinto shrine dedicated to Emperor Meiji",
-                "Tsukiji Outer Market - Famous fish market with fresh seafood and local food"
-            ]
+            # Fall back to the catalog's attractions if no search results
+            return catalog_attractions or [f"No attraction data available for {destination}. Please try a different search query."]
     
     except Exception as e:
         print(f"Error in search_attractions: {e}")
         return ["Error searching for attractions. Please try again."]
 
 # Improved function to search for restaurants
-def search_restaurants(destination, dietary_preferences=""):
+def search_restaurants(destination, dietary_preferences="", num_results=5):
     """Search for restaurants based on destination and dietary preferences with improved filtering."""
     try:
         if not destination or not destination.strip():
             return ["Please specify a destination to search for restaurants."]
             
+        destination = canonical_name(destination)
         print(f"Searching for restaurants in {destination} with preferences: {dietary_preferences}")
         
-        # Build query based on preferences
-        query = f"Best restaurants in {destination}, Japan"
+        # Answer from the offline destination catalog when it has curated data
+        catalog_restaurants = get_catalog().get(destination, "restaurants")
+        if catalog_restaurants and not dietary_preferences:
+            return catalog_restaurants
+        
+        # Build query based on preferences, qualified with the place's country
+        place = resolve_place(destination)
+        location = place.label if place else destination
+        query = f"Best restaurants in {location}"
         if dietary_preferences:
-            query = f"Best {dietary_preferences} restaurants in {destination}, Japan"
+            query = f"Best {dietary_preferences} restaurants in {location}"
+        
+        # Results must mention the place (or its country) to count as local
+        location_names = [destination.lower()] + ([place.country.lower()] if place else [])
         
         # Perform the search
         print(f"Searching with query: {query}")
-        results = search_web(query)
+        results = search_with_index(query, destination, num_results)
         
         if not results:
-            return [f"No restaurant data available for {destination}. Please try a different search query."]
+            return catalog_restaurants or [f"No restaurant data available for {destination}. Please try a different search query."]
         
-        # Format results with improved filtering
-        formatted_restaurants = []
+        # Keep the results that pass the filters; they're rendered as text only when shown
+        matching_restaurants = []
         restaurant_keywords = ['restaurant', 'café', 'cafe', 'bistro', 'eatery', 'dining', 'food']
         
         for result in results:
-            if not result or not isinstance(result, dict):
+            if not isinstance(result, SearchResult):
                 continue
                 
-            title = result.get('title', '').strip()
-            description = result.get('description', '').strip()
+            title = result.title
+            description = result.description
             
             # Check if this is likely a restaurant and in the correct location
             is_restaurant = any(keyword in title.lower() or keyword in description.lower() for keyword in restaurant_keywords)
-            is_correct_location = 'tokyo' in title.lower() or 'japan' in title.lower()
+            is_correct_location = any(name in title.lower() for name in location_names)
             
             if title and description and len(title) > 5 and is_restaurant and is_correct_location:
-                # Clean up the title and description
-                title = re.sub(r'\s*\|.*$', '', title)
-                title = re.sub(r'\s*-\s*.*$', '', title)
-                
-                formatted_restaurant = f"{title} - {description}"
-                formatted_restaurants.append(formatted_restaurant)
+                matching_restaurants.append(result)
         
-        if formatted_restaurants:
-            return formatted_restaurants
+        if matching_restaurants:
+            return matching_restaurants
         else:
-            # Return default Tokyo restaurants if no search results
-            return [
-                "Sukiyabashi Jiro - World-famous sushi restaurant in Ginza",
-                "Tsukiji Tama Sushi - Fresh sushi in Tsukiji market area",
-                "Ichiran Ramen - Popular ramen chain with private booths",
-                "Gonpachi Nishiazabu - Traditional Japanese restaurant",
-                "Robot Restaurant - Unique dining experience in Shinjuku"
-            ]
+            # Fall back to the catalog's restaurants if no search results
+            return catalog_restaurants or [f"No restaurant data available for {destination}. Please try a different search query."]
     
     except Exception as e:
         print(f"Error in search_restaurants: {e}")
@@ -751,10 +980,7 @@ def search_restaurants(destination, dietary_preferences=""):
 def search_accommodations(destination, preference="moderate"):
     """Search for accommodations based on destination and preference with improved filtering."""
     try:
-        # Clean up destination name
-        destination = destination.split(' Is A Great Choice')[0].strip()
-        destination = destination.split(' For')[0].strip()
-        
+        destination = canonical_name(destination)
         if not destination:
             return ["Please specify a destination to search for hotels."]
             
@@ -789,34 +1015,28 @@ def search_accommodations(destination, preference="moderate"):
         if not results:
             return [f"No hotel data available for {destination}. Please try a different search query."]
         
-        # Format results with improved filtering
-        formatted_accommodations = []
+        # Keep the results that pass the filters; they're rendered as text only when shown
+        matching_accommodations = []
         accommodation_keywords = ['hotel', 'inn', 'resort', 'lodge', 'accommodation', 'stay', 'apartment', 'rental']
         excluded_terms = ['booking.com', 'tripadvisor', 'expedia', 'hotels.com', 'agoda', 'best hotels', 'top hotels']
         
         for result in results:
-            if not result or not isinstance(result, dict):
+            if not isinstance(result, SearchResult):
                 continue
                 
-            # Clean up the title and description
-            title = result.get('title', '').split(' - ')[0].strip()
-            # Remove website names and extra information
-            title = re.sub(r'\s*\|.*$', '', title)
-            title = re.sub(r'\s*-\s*.*$', '', title)
-            title = re.sub(r'\s*\d{4}.*$', '', title)
-            
-            description = result.get('description', '').split('.')[0].strip()  # Take first sentence only
+            # Titles are already clean; hotel listings also drop any year ("... 2024 Review")
+            title = short_title(result.title)
+            description = first_sentence(result.description)  # Take first sentence only
             
             # Check if this is likely an accommodation
             is_accommodation = any(keyword in title.lower() or keyword in description.lower() for keyword in accommodation_keywords)
             is_excluded = any(term in title.lower() or term in description.lower() for term in excluded_terms)
             
             if title and description and len(title) > 5 and is_accommodation and not is_excluded:
-                formatted_accommodation = f"{title} - {description}"
-                formatted_accommodations.append(formatted_accommodation)
+                matching_accommodations.append(result.replace(title, description))
         
-        if formatted_accommodations:
-            return formatted_accommodations
+        if matching_accommodations:
+            return matching_accommodations
         else:
             return [f"No specific hotel information found for {destination}. Here are some general recommendations:\n" +
                    "- Consider staying in the city center for easy access to attractions\n" +
@@ -845,12 +1065,12 @@ def search_accessible_attractions(destination):
         query = f"Wheelchair accessible attractions in {destination}"
         
         # Perform the search
-        results = search_web(query)
+        results = search_with_index(query, destination)
         
         if not results:
             # Try a more general search if the first one didn't work
             query = f"Accessible tourism {destination}"
-            results = search_web(query)
+            results = search_with_index(query, destination)
         
         if not results:
             return [f"No specific accessibility information found for {destination}. Here are some general recommendations:\n" +
@@ -859,25 +1079,20 @@ def search_accessible_attractions(destination):
                    "- Consider museums and modern attractions which typically have better accessibility\n" +
                    "- Check if the city has an accessibility guide for tourists"]
         
-        # Format results
-        formatted_attractions = []
+        # Keep the usable results
+        matching_attractions = []
         for result in results:
-            if not result or not isinstance(result, dict):
+            if not isinstance(result, SearchResult):
                 continue
                 
-            title = result.get('title', '').strip()
-            description = result.get('description', '').strip()
+            title = result.title
+            description = result.description
             
             if title and description and len(title) > 5:
-                # Clean up the title and description
-                title = re.sub(r'\s*\|.*$', '', title)
-                title = re.sub(r'\s*-\s*.*$', '', title)
-                
-                formatted_attraction = f"{title} - {description}"
-                formatted_attractions.append(formatted_attraction)
+                matching_attractions.append(result)
         
-        if formatted_attractions:
-            return formatted_attractions
+        if matching_attractions:
+            return matching_attractions
         else:
             return [f"No specific accessibility information found for {destination}. Here are some general recommendations:\n" +
                    "- Contact attractions directly to inquire about accessibility features\n" +
@@ -890,7 +1105,7 @@ def search_accessible_attractions(destination):
         return ["Error searching for accessible attractions. Please try again."]
 
 # Function to search for special interest activities
-def search_special_interest(destination, interest):
+def search_special_interest(destination, interest, num_results=5):
     """Search for activities related to a special interest in a destination."""
     try:
         if not destination or not destination.strip():
@@ -905,30 +1120,25 @@ def search_special_interest(destination, interest):
         query = f"Best {interest} experiences in {destination}"
         
         # Perform the search
-        results = search_web(query)
+        results = search_with_index(query, destination, num_results)
         
         if not results:
             return [f"No specific {interest} information found for {destination}. Please try a different search term."]
         
-        # Format results
-        formatted_activities = []
+        # Keep the usable results
+        matching_activities = []
         for result in results:
-            if not result or not isinstance(result, dict):
+            if not isinstance(result, SearchResult):
                 continue
                 
-            title = result.get('title', '').strip()
-            description = result.get('description', '').strip()
+            title = result.title
+            description = result.description
             
             if title and description and len(title) > 5:
-                # Clean up the title and description
-                title = re.sub(r'\s*\|.*$', '', title)
-                title = re.sub(r'\s*-\s*.*$', '', title)
-                
-                formatted_activity = f"{title} - {description}"
-                formatted_activities.append(formatted_activity)
+                matching_activities.append(result)
         
-        if formatted_activities:
-            return formatted_activities
+        if matching_activities:
+            return matching_activities
         else:
             return [f"No specific {interest} information found for {destination}. Please try a different search term."]
     
@@ -936,23 +1146,47 @@ def search_special_interest(destination, interest):
         print(f"Error in search_special_interest: {e}")
         return [f"Error searching for {interest} activities in {destination}. Please try again."]
 
+# Describe the live lookups an itinerary needs
+def recommendation_lookups(travel_info):
+    """Return {name: (key, func, args)} for the lookups behind an itinerary; equal keys fetch the same data"""
+    destination = canonical_name(travel_info.get('destination', ''))
+    preferences = travel_info.get('preferences', [])
+    preference = preferences[0] if preferences else ""
+    key = place_key(destination)
+    
+    return {
+        "weather": (("weather", key), get_weather, (destination,)),
+        "forecast": (("forecast", key), get_forecast, (destination,)),
+        "attractions": (("attractions", key, preference.lower()), search_attractions, (destination, preference)),
+        "restaurants": (("restaurants", key), search_restaurants, (destination,))
+    }
+
 # Improved function to generate travel recommendations
-def generate_recommendations():
+def generate_recommendations(travel_info=None, lookup_results=None):
     """Generate detailed travel recommendations with specific attractions and activities."""
     try:
-        destination = st.session_state.travel_info.get('destination', '')
-        duration = st.session_state.travel_info.get('duration', '')
-        budget = st.session_state.travel_info.get('budget', 'moderate')
-        preferences = st.session_state.travel_info.get('preferences', [])
+        if travel_info is None:
+            travel_info = st.session_state.travel_info
+        destination = travel_info.get('destination', '')
+        duration = travel_info.get('duration', '')
+        budget = travel_info.get('budget', 'moderate')
+        preferences = travel_info.get('preferences', [])
         
         if not destination or not duration:
             return "I need more information about your destination and travel duration to generate recommendations."
         
-        # Clean up destination name for weather API
-        clean_destination = destination.split(' Here')[0].strip()
+        # Reuse a recent itinerary built from the same inputs
+        stored = get_itinerary_store().find(travel_info)
+        if stored:
+            print(f"Reusing stored itinerary {stored['id']}")
+            return stored["itinerary"]
         
-        # Get weather information
-        weather_info = get_weather(clean_destination)
+        # Weather, attractions and restaurants; callers batching several trips pass them in
+        if lookup_results is None:
+            lookup_results = {
+                name: func(*args) for name, (_, func, args) in recommendation_lookups(travel_info).items()
+            }
+        weather_info = lookup_results["weather"]
         
         # Start building the itinerary
         itinerary = f"# Your {duration} Itinerary for {destination}\n\n"
@@ -962,125 +1196,31 @@ def generate_recommendations():
         if preferences:
             itinerary += "## Your Interests\n" + ", ".join(preferences) + "\n\n"
         
-        # Get specific attractions based on preferences
-        attractions = search_attractions(destination, preferences[0] if preferences else "")
-        restaurants = search_restaurants(destination)
+        # Specific attractions based on preferences
+        attractions = lookup_results["attractions"]
+        restaurants = lookup_results["restaurants"]
         
         # Create day-by-day itinerary
         itinerary += "## Day-by-Day Itinerary\n"
         
-        # Define different types of activities for variety based on preferences
-        morning_activities = {
-            "food": [
-                "Visit Tsukiji Outer Market for fresh seafood and local breakfast",
-                "Start your day with a traditional Japanese breakfast at a local café",
-                "Explore the food stalls at Ameyoko Market",
-                "Visit a local bakery for fresh Japanese pastries",
-                "Take a food tour in Asakusa"
-            ],
-            "culture": [
-                "Visit Senso-ji Temple in Asakusa",
-                "Explore Meiji Shrine and its peaceful gardens",
-                "Visit the Imperial Palace East Gardens",
-                "Take a traditional tea ceremony class",
-                "Visit a local shrine for morning prayers"
-            ],
-            "technology": [
-                "Visit the Miraikan Science Museum",
-                "Explore the Sony ExploraScience Museum",
-                "Visit the Panasonic Center Tokyo",
-                "Check out the latest gadgets at Bic Camera",
-                "Visit the Gundam Base Tokyo"
-            ]
-        }
-        
-        afternoon_activities = {
-            "food": [
-                "Take a sushi-making class",
-                "Visit a sake brewery for tasting",
-                "Explore the food halls at department stores",
-                "Take a ramen tour in different neighborhoods",
-                "Visit a wagyu beef restaurant"
-            ],
-            "culture": [
-                "Visit the Tokyo National Museum",
-                "Explore the Edo-Tokyo Museum",
-                "Visit a traditional Japanese garden",
-                "Take a calligraphy class",
-                "Visit a local art gallery"
-            ],
-            "technology": [
-                "Visit Akihabara Electric Town",
-                "Explore the Digital Art Museum",
-                "Visit the National Museum of Emerging Science",
-                "Check out the latest tech at Yodobashi Camera",
-                "Visit the Ghibli Museum"
-            ]
-        }
-        
-        evening_activities = {
-            "food": [
-                "Dine at a traditional izakaya",
-                "Try street food at a night market",
-                "Visit a themed restaurant",
-                "Take a food tour in Shibuya",
-                "Dine at a robot restaurant"
-            ],
-            "culture": [
-                "Watch a traditional performance",
-                "Visit a local festival",
-                "Take a night walk in a historic district",
-                "Visit a local bar in Golden Gai",
-                "Watch a sumo match"
-            ],
-            "technology": [
-                "Visit the teamLab Borderless Museum",
-                "Explore the nightlife in Odaiba",
-                "Visit a gaming arcade",
-                "Take a night photography tour",
-                "Visit a VR gaming center"
-            ]
-        }
-        
-        # Generate unique itinerary for each day
-        for day in range(1, int(duration.split()[0]) + 1):
+        # Spread activities across all of the user's interests without repeats
+        catalog = get_catalog()
+        day_plan = get_day_planner().plan(destination, int(duration.split()[0]), preferences)
+        
+        # Days of the trip inside the five-day forecast get their expected weather
+        forecast = lookup_results.get("forecast") or {}
+        start = trip_start(travel_info.get('travel_date', ''))
+        forecast_shown = False
+        
+        for day, activities in enumerate(day_plan, 1):
             itinerary += f"\n### Day {day}\n"
-            
-            # Morning
-            itinerary += "**Morning:**\n"
-            if preferences:
-                # Select activities based on preferences
-                for preference in preferences:
-                    if preference in morning_activities:
-                        activity = random.choice(morning_activities[preference])
-                        itinerary += f"- {activity}\n"
-                        break
-            else:
-                itinerary += "- Start your day with a visit to a local café\n"
-            
-            # Afternoon
-            itinerary += "\n**Afternoon:**\n"
-            if preferences:
-                # Select activities based on preferences
-                for preference in preferences:
-                    if preference in afternoon_activities:
-                        activity = random.choice(afternoon_activities[preference])
-                        itinerary += f"- {activity}\n"
-                        break
-            else:
-                itinerary += "- Visit a local museum or art gallery\n"
-            
-            # Evening
-            itinerary += "\n**Evening:**\n"
-            if preferences:
-                # Select activities based on preferences
-                for preference in preferences:
-                    if preference in evening_activities:
-                        activity = random.choice(evening_activities[preference])
-                        itinerary += f"- {activity}\n"
-                        break
-            else:
-                itinerary += "- Enjoy dinner at a local restaurant\n"
+            day_forecast = forecast.get((start + timedelta(days=day - 1)).isoformat()) if start else None
+            if day_forecast:
+                itinerary += f"*Forecast: {format_day(day_forecast)}*\n"
+                forecast_shown = True
+            itinerary += f"**Morning:**\n- {activities['morning']}\n"
+            itinerary += f"\n**Afternoon:**\n- {activities['afternoon']}\n"
+            itinerary += f"\n**Evening:**\n- {activities['evening']}\n"
         
         # Add specific recommendations
         itinerary += "\n## Additional Recommendations\n"
@@ -1099,45 +1239,25 @@ def generate_recommendations():
         
         # Accommodation Options
         itinerary += "\n### Accommodation Options\n"
-        budget_levels = {
-            "low": "Budget hotels and hostels in areas like Asakusa or Ueno",
-            "moderate": "Mid-range hotels in Shibuya, Shinjuku, or Ginza",
-            "high": "Luxury hotels in Roppongi, Marunouchi, or the Tokyo Station area"
-        }
-        itinerary += budget_levels.get(budget, budget_levels["moderate"]) + "\n"
+        accommodation = catalog.get(destination, f"hotels:{budget}", fallback=True) or catalog.get(destination, "hotels:moderate", fallback=True)
+        itinerary += "\n".join(accommodation or []) + "\n"
         
         # Transportation Tips
         itinerary += "\n### Transportation Tips\n"
-        itinerary += "- Purchase a Suica or Pasmo card for convenient public transport\n"
-        itinerary += "- Consider getting a JR Pass if planning day trips\n"
-        itinerary += "- Use the efficient subway system for city travel\n"
-        itinerary += "- Download the Tokyo Subway Navigation app\n"
-        itinerary += "- Keep your transport card topped up\n"
+        for tip in catalog.get(destination, "transport", fallback=True) or []:
+            itinerary += f"- {tip}\n"
         
-        # Add budget breakdown with more realistic estimates for Tokyo
+        # Add budget breakdown with estimates for the destination
         itinerary += "\n### Estimated Budget Breakdown\n"
         
-        # Calculate rough budget estimates based on budget level and destination
-        budget_multipliers = {"low": 0.7, "moderate": 1.0, "high": 1.5}
-        multiplier = budget_multipliers.get(budget, 1.0)
+        # Rough estimates from the destination's cost table and the budget level
+        quote = get_budget_engine().quote(destination, int(duration.split()[0]), budget if budget in BUDGET_LEVELS else "moderate")
         
-        # Base costs adjusted for Tokyo
-        accommodation_cost = 200 * multiplier  # per night
-        food_cost = 100 * multiplier  # per day
-        activities_cost = 50 * multiplier  # per day
-        transport_cost = 30 * multiplier  # per day
-        
-        total_accommodation = accommodation_cost * int(duration.split()[0])
-        total_food = food_cost * int(duration.split()[0])
-        total_activities = activities_cost * int(duration.split()[0])
-        total_transport = transport_cost * int(duration.split()[0])
-        total_cost = total_accommodation + total_food + total_activities + total_transport
-        
-        itinerary += f"- Accommodation: ${total_accommodation:.0f}\n"
-        itinerary += f"- Food: ${total_food:.0f}\n"
-        itinerary += f"- Activities: ${total_activities:.0f}\n"
-        itinerary += f"- Transportation: ${total_transport:.0f}\n"
-        itinerary += f"- Total: Approximately ${total_cost:.0f}\n"
+        itinerary += f"- Accommodation: ${quote['accommodation'][0]:.0f}\n"
+        itinerary += f"- Food: ${quote['food'][0]:.0f}\n"
+        itinerary += f"- Activities: ${quote['activities'][0]:.0f}\n"
+        itinerary += f"- Transportation: ${quote['transport'][0]:.0f}\n"
+        itinerary += f"- Total: Approximately ${quote['total'][0]:.0f}\n"
         
         # Add money-saving tips
         itinerary += "\n### Money-Saving Tips\n"
@@ -1161,17 +1281,42 @@ def generate_recommendations():
         itinerary += "- Get travel insurance\n"
         itinerary += "- Keep your hotel address in Japanese\n"
         
+        # Partial itineraries (a lookup ran out of time) are shown but never reused
+        request_deadline = current_deadline()
+        if request_deadline is None or not request_deadline.partial:
+            # With Forecast lines, reuse is limited to this start date and forecast run
+            get_itinerary_store().save(travel_info, itinerary, forecast_key(travel_info.get('travel_date')) if forecast_shown else "")
         return itinerary
         
     except Exception as e:
         print(f"Error generating recommendations: {str(e)}")
         return "I apologize, but I encountered an error while generating your travel recommendations. Please try again."
 
+# Page through one search helper's results for a conversation
+def result_page(state, search, category, destination, qualifier="", first=False):
+    """Return the first (or next) page of a search helper's results, from the result set shared by every session"""
+    key = result_set_key(category, place_key(destination), qualifier)
+    
+    def load(limit):
+        results = search(destination, qualifier, num_results=limit)
+        # Error and "no data" messages, and the catalog lists a search falls back to, aren't kept as results
+        if not all(isinstance(result, SearchResult) for result in results):
+            raise UncachedResults(results)
+        return results
+    
+    pager = get_result_pager()
+    return pager.first_page(state, key, load) if first else pager.next_page(state, key, load)
+
 # Improved function to generate conversational responses
-def generate_conversational_response(user_input, travel_info, itinerary_generated=False):
+def generate_conversational_response(user_input, travel_info, itinerary_generated=False, route=None, state=None):
     """Generate a more natural conversational response based on user input and travel context with improved context handling."""
+    # Conversation state (the generated itinerary); the Streamlit session unless given
+    if state is None:
+        state = st.session_state
     destination = travel_info.get('destination', '')
     user_input_lower = user_input.lower()
+    if route is None:
+        route = route_message(user_input_lower)
     
     # Different greeting variants with more personality
     greetings = [
@@ -1183,7 +1328,7 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
     ]
     
     # If this is a new conversation and we don't have destination yet
-    if not destination and ("hi" in user_input_lower or "hello" in user_input_lower or len(user_input_lower) < 20):
+    if not destination and (route.has("greeting") or len(user_input_lower) < 20):
         return random.choice(greetings) + " Where would you like to travel to?"
     
     # If we have all the necessary information, generate itinerary
@@ -1193,8 +1338,8 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
         len(user_input_lower.split()) > 10):  # More detailed message
         
         # Generate the itinerary with improved context
-        itinerary = generate_recommendations()
-        st.session_state.itinerary = itinerary
+        itinerary = generate_recommendations(travel_info)
+        state["itinerary"] = itinerary
         
         return "I've crafted a personalized itinerary for your trip! You can find it above. Would you like to:\n\n" + \
                "1. Get more details about any specific day or activity\n" + \
@@ -1204,7 +1349,7 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
                "5. Learn about local customs and etiquette"
     
     # If user just provided their destination
-    if destination and ("visit" in user_input_lower or "travel to" in user_input_lower or "going to" in user_input_lower):
+    if destination and route.has("destination_given"):
         # Get initial weather info for the destination
         weather_info = get_weather(destination)
         
@@ -1216,7 +1361,7 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
                "4. Are you traveling with any specific requirements? (e.g., accessibility needs, dietary restrictions)"
     
     # If user provided destination but no duration
-    if destination and not travel_info.get('duration') and not "day" in user_input_lower:
+    if destination and not travel_info.get('duration') and not route.has("day"):
         return f"Perfect! {destination} has so much to offer. To create a personalized itinerary, I need to know:\n\n" + \
                "1. How many days are you planning to stay?\n" + \
                "2. What's your budget level (low, moderate, or high)?\n" + \
@@ -1235,7 +1380,7 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
     
     # Handle follow-up questions about specific topics after itinerary was generated
     if itinerary_generated:
-        if "transport" in user_input_lower or "getting around" in user_input_lower:
+        if route.has("followup_transport"):
             return f"Getting around {destination} is straightforward. Here are some transportation tips:\n\n" + \
                    "- Public transportation is usually the most efficient option\n" + \
                    "- Consider purchasing a multi-day pass for convenience\n" + \
@@ -1244,7 +1389,7 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
                    "- Research peak hours to avoid crowds\n" + \
                    "- Consider ride-sharing services for flexibility\n\n" + \
                    "Would you like more specific information about transportation options?"
-        elif "safety" in user_input_lower or "safe" in user_input_lower:
+        elif route.has("followup_safety"):
             return f"{destination} is generally safe for tourists, but here are some important safety tips:\n\n" + \
                    "- Keep your belongings secure and be aware of your surroundings\n" + \
                    "- Avoid isolated areas at night\n" + \
@@ -1254,9 +1399,9 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
                    "- Stay hydrated and protect yourself from the sun\n" + \
                    "- Be cautious with street food and water\n" + \
                    "- Keep your hotel address with you at all times"
-        elif "weather" in user_input_lower or "climate" in user_input_lower:
+        elif route.has("followup_weather"):
             return None  # Let the existing weather function handle this
-        elif "currency" in user_input_lower or "money" in user_input_lower:
+        elif route.has("followup_currency"):
             return f"Here's what you need to know about money in {destination}:\n\n" + \
                    "- Check the local currency and current exchange rates\n" + \
                    "- Major credit cards are widely accepted in most tourist areas\n" + \
@@ -1266,7 +1411,7 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
                    "- Consider using a travel-friendly credit card\n" + \
                    "- Keep emergency cash in a separate location\n" + \
                    "- Be aware of common tourist scams"
-        elif "language" in user_input_lower or "speak" in user_input_lower:
+        elif route.has("followup_language"):
             return f"Language tips for {destination}:\n\n" + \
                    "- Learn a few basic phrases in the local language\n" + \
                    "- Download a translation app for offline use\n" + \
@@ -1276,7 +1421,7 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
                    "- Consider taking a basic language class before your trip\n" + \
                    "- Use hand gestures and body language when needed\n" + \
                    "- Learn numbers and basic directions"
-        elif "budget" in user_input_lower or "cost" in user_input_lower or "expensive" in user_input_lower:
+        elif route.has("followup_budget"):
             budget_level = travel_info.get('budget', 'moderate')
             if budget_level == "low":
                 return f"Here are some budget-friendly tips for {destination}:\n\n" + \
@@ -1310,7 +1455,7 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
                        "- Stay in central locations for convenience"
     
     # If user asks a vague question about where to go
-    if any(phrase in user_input_lower for phrase in ["where should i go", "recommend a place", "good place to visit", "somewhere nice", "vacation ideas"]):
+    if route.mentions("vague"):
         return "I'd be happy to help you plan a vacation! To provide personalized recommendations, I need some information:\n\n" + \
                "1. What type of destination interests you?\n" + \
                "   - Beach destination\n" + \
@@ -1334,7 +1479,7 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
                "   - Language preferences"
     
     # If user mentions special requirements like accessibility
-    if "wheelchair" in user_input_lower or "accessible" in user_input_lower or "disability" in user_input_lower:
+    if route.has("accessibility_mention"):
         if destination:
             return f"I'll help you plan an accessible trip to {destination}. Here's what you should know:\n\n" + \
                    "- Many attractions have wheelchair access and facilities\n" + \
@@ -1355,7 +1500,7 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
                    "5. Any specific accessibility requirements?"
     
     # If user mentions dietary restrictions
-    if any(diet in user_input_lower for diet in ["vegetarian", "vegan", "gluten-free", "food allergy", "dietary"]):
+    if route.has("dietary"):
         if destination:
             return f"I'll make sure to include {travel_info.get('dietary_preferences', 'dietary-friendly')} restaurant recommendations for your trip to {destination}. Here's what you should know:\n\n" + \
                    "- Many restaurants now offer good options for various dietary needs\n" + \
@@ -1376,36 +1521,45 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
                    "5. Any specific dietary requirements?"
     
     # Handle follow-up questions about specific interests
-    if any(word in user_input_lower for word in ["more", "tell me more", "what else", "other", "another"]):
+    if route.has("more"):
         if destination:
             # Get additional recommendations based on existing preferences
             preferences = travel_info.get('preferences', [])
             if preferences:
                 response = f"Here are more recommendations for {destination} based on your interests:\n\n"
+                # Each "more" continues from where the last list for this interest stopped
                 for preference in preferences:
                     if preference == "food":
-                        restaurants = search_restaurants(destination, travel_info.get('dietary_preferences', ''))
+                        restaurants = result_page(state, search_restaurants, "restaurants", destination, travel_info.get('dietary_preferences', ''))
                         response += "**Additional Food Experiences:**\n"
-                        for restaurant in restaurants[3:6]:  # Get next 3 restaurants
+                        for restaurant in restaurants:
                             response += f"- {restaurant}\n"
+                        if not restaurants:
+                            response += "- That's every restaurant I found.\n"
                         response += "\n"
                     elif preference == "technology":
-                        tech_attractions = search_special_interest(destination, "technology")
+                        tech_attractions = result_page(state, search_special_interest, "special_interest", destination, "technology")
                         response += "**More Technology Spots:**\n"
-                        for attraction in tech_attractions[3:6]:
+                        for attraction in tech_attractions:
                             response += f"- {attraction}\n"
+                        if not tech_attractions:
+                            response += "- That's every technology spot I found.\n"
                         response += "\n"
                     elif preference == "art":
-                        art_attractions = search_attractions(destination, "art")
+                        art_attractions = result_page(state, search_attractions, "attractions", destination, "art")
                         response += "**Additional Art & Museums:**\n"
-                        for attraction in art_attractions[3:6]:
+                        for attraction in art_attractions:
                             response += f"- {attraction}\n"
+                        if not art_attractions:
+                            response += "- That's every art spot I found.\n"
                         response += "\n"
                     elif preference == "culture":
-                        cultural_attractions = search_attractions(destination, "cultural")
+                        cultural_attractions = result_page(state, search_attractions, "attractions", destination, "cultural")
                         response += "**More Cultural Experiences:**\n"
-                        for attraction in cultural_attractions[3:6]:
+                        for attraction in cultural_attractions:
                             response += f"- {attraction}\n"
+                        if not cultural_attractions:
+                            response += "- That's every cultural experience I found.\n"
                         response += "\n"
                 response += "\nWould you like to know more about any specific aspect of your trip?"
                 return response
@@ -1413,15 +1567,22 @@ def generate_conversational_response(user_input, travel_info, itinerary_generate
     return None  # Return None if no conversational response is generated
 
 # Improved function to generate responses
-def generate_response(prompt, travel_info):
+def generate_response(prompt, travel_info, state=None):
     """Generate a response based on user input and travel information with improved handling."""
     try:
-        # Clean up destination name
-        destination = travel_info.get('destination', '').split(' For')[0].strip()
+        # Conversation state (the generated itinerary); the Streamlit session unless given
+        if state is None:
+            state = st.session_state
+        
+        destination = canonical_name(travel_info.get('destination', ''))
         user_input_lower = prompt.lower()
         
+        # Work out the intent and its slots in a single pass (priority order lives in intent_router.INTENTS)
+        route = route_message(user_input_lower)
+        intent = route.intent
+        
         # Handle beach destination queries
-        if "beach" in user_input_lower or "beaches" in user_input_lower:
+        if intent == "beach":
             if not destination:
                 # Suggest popular beach destinations
                 return "Here are some great beach destinations for your vacation:\n\n" + \
@@ -1462,22 +1623,8 @@ def generate_response(prompt, travel_info):
                            "5. Nightlife options"
 
         # Check for mixed interests in the prompt
-        if any(word in user_input_lower for word in ["love", "interested in", "like", "enjoy", "want to"]):
-            interests = []
-            if "food" in user_input_lower or "restaurant" in user_input_lower:
-                interests.append("food")
-            if "technology" in user_input_lower or "tech" in user_input_lower:
-                interests.append("technology")
-            if "art" in user_input_lower or "museum" in user_input_lower:
-                interests.append("art")
-            if "culture" in user_input_lower or "cultural" in user_input_lower:
-                interests.append("culture")
-            if "shopping" in user_input_lower:
-                interests.append("shopping")
-            if "nature" in user_input_lower or "outdoor" in user_input_lower:
-                interests.append("nature")
-            if "beach" in user_input_lower:
-                interests.append("beach")
+        if intent == "interests":
+            interests = route.slots["interests"]
             
             if interests:
                 response = f"Great! I'll help you explore {destination} focusing on {', '.join(interests)}. Here are some recommendations:\n\n"
@@ -1485,51 +1632,51 @@ def generate_response(prompt, travel_info):
                 # Get relevant recommendations for each interest
                 for interest in interests:
                     if interest == "food":
-                        restaurants = search_restaurants(destination, travel_info.get('dietary_preferences', ''))
+                        restaurants = result_page(state, search_restaurants, "restaurants", destination, travel_info.get('dietary_preferences', ''), first=True)
                         response += "**Food Experiences:**\n"
-                        for restaurant in restaurants[:3]:
+                        for restaurant in restaurants:
                             response += f"- {restaurant}\n"
                         response += "\n"
                     
                     elif interest == "technology":
-                        tech_attractions = search_special_interest(destination, "technology")
+                        tech_attractions = result_page(state, search_special_interest, "special_interest", destination, "technology", first=True)
                         response += "**Technology Spots:**\n"
-                        for attraction in tech_attractions[:3]:
+                        for attraction in tech_attractions:
                             response += f"- {attraction}\n"
                         response += "\n"
                     
                     elif interest == "art":
-                        art_attractions = search_attractions(destination, "art")
+                        art_attractions = result_page(state, search_attractions, "attractions", destination, "art", first=True)
                         response += "**Art & Museums:**\n"
-                        for attraction in art_attractions[:3]:
+                        for attraction in art_attractions:
                             response += f"- {attraction}\n"
                         response += "\n"
                     
                     elif interest == "culture":
-                        cultural_attractions = search_attractions(destination, "cultural")
+                        cultural_attractions = result_page(state, search_attractions, "attractions", destination, "cultural", first=True)
                         response += "**Cultural Experiences:**\n"
-                        for attraction in cultural_attractions[:3]:
+                        for attraction in cultural_attractions:
                             response += f"- {attraction}\n"
                         response += "\n"
                     
                     elif interest == "shopping":
-                        shopping_attractions = search_attractions(destination, "shopping")
+                        shopping_attractions = result_page(state, search_attractions, "attractions", destination, "shopping", first=True)
                         response += "**Shopping Areas:**\n"
-                        for attraction in shopping_attractions[:3]:
+                        for attraction in shopping_attractions:
                             response += f"- {attraction}\n"
                         response += "\n"
                     
                     elif interest == "nature":
-                        nature_attractions = search_attractions(destination, "nature")
+                        nature_attractions = result_page(state, search_attractions, "attractions", destination, "nature", first=True)
                         response += "**Nature & Outdoor:**\n"
-                        for attraction in nature_attractions[:3]:
+                        for attraction in nature_attractions:
                             response += f"- {attraction}\n"
                         response += "\n"
                     
                     elif interest == "beach":
-                        beach_attractions = search_attractions(destination, "beach")
+                        beach_attractions = result_page(state, search_attractions, "attractions", destination, "beach", first=True)
                         response += "**Beach Experiences:**\n"
-                        for attraction in beach_attractions[:3]:
+                        for attraction in beach_attractions:
                             response += f"- {attraction}\n"
                         response += "\n"
                 
@@ -1537,7 +1684,7 @@ def generate_response(prompt, travel_info):
                 return response
 
         # Check for weather queries - handle various formats
-        if any(word in user_input_lower for word in ["weather", "temperature", "climate", "rain", "sunny", "forecast", "whats weather", "what's weather", "whats the weather", "what's the weather", "weather in", "weather there"]):
+        if intent == "weather":
             # Extract location from the query if it's not in travel_info
             location = destination
             if not location:
@@ -1545,8 +1692,8 @@ def generate_response(prompt, travel_info):
                 location_match = re.search(r"weather in (\w+)", user_input_lower)
                 if location_match:
                     location = location_match.group(1).title()
-                elif "weather there" in user_input_lower and st.session_state.travel_info.get('destination'):
-                    location = st.session_state.travel_info['destination'].split(' For')[0].strip()
+                elif "weather there" in user_input_lower and travel_info.get('destination'):
+                    location = canonical_name(travel_info['destination'])
             
             if location:
                 weather_info = get_weather(location)
@@ -1555,94 +1702,86 @@ def generate_response(prompt, travel_info):
                 return "Which city would you like to know the weather for?"
         
         # Check for specific queries first
-        if any(word in user_input_lower for word in ["hotel", "stay", "accommodation", "lodging", "place to sleep"]):
+        if intent == "hotel":
             if not destination:
                 return "Please specify a destination first. Where would you like to stay?"
             accommodations = search_accommodations(destination, travel_info.get('accommodation_preferences', 'moderate'))
             return "Here are some recommended hotels for your stay:\n\n" + "\n".join([f"- {accommodation}" for accommodation in accommodations[:5]])
             
-        elif any(word in user_input_lower for word in ["restaurant", "food", "eat", "dining", "cuisine", "meal"]):
+        elif intent == "restaurant":
             if not destination:
                 return "Please specify a destination first. Where would you like to eat?"
             restaurants = search_restaurants(destination, travel_info.get('dietary_preferences', ''))
             return "Here are some restaurants you might enjoy:\n\n" + "\n".join([f"- {restaurant}" for restaurant in restaurants[:5]])
             
-        elif any(word in user_input_lower for word in ["attraction", "visit", "see", "museum", "landmark", "sight"]):
+        elif intent == "attraction":
             if not destination:
                 return "Please specify a destination first. Where would you like to visit?"
             attractions = search_attractions(destination, ",".join(travel_info.get('preferences', [])))
             return "Here are some top attractions I recommend:\n\n" + "\n".join([f"- {attraction}" for attraction in attractions[:5]])
         
         # Check for itinerary generation request
-        elif any(word in user_input_lower for word in ["itinerary", "plan", "schedule", "day by day", "what to do"]):
+        elif intent == "itinerary":
             if not destination:
                 return "Please specify a destination first. Where would you like to plan your trip?"
-            itinerary = generate_recommendations()
-            st.session_state.itinerary = itinerary
+            itinerary = generate_recommendations(travel_info)
+            state["itinerary"] = itinerary
             return "I've generated your complete travel itinerary! You can find it above. Would you like to know more about any specific aspect of your trip?"
         
         # Handle transportation queries
-        elif any(word in user_input_lower for word in ["transport", "getting around", "travel within", "public transit", "bus", "train", "subway", "metro"]):
+        elif intent == "transport":
             if not destination:
                 return "Please specify a destination first so I can provide transportation information."
             return f"Getting around {destination} is relatively straightforward. Public transportation is usually the most efficient option. Would you like more specific information about transportation options?"
         
         # Handle safety queries
-        elif any(word in user_input_lower for word in ["safe", "safety", "dangerous", "crime", "secure"]):
+        elif intent == "safety":
             if not destination:
                 return "Please specify a destination first so I can provide safety information."
             return f"{destination} is generally safe for tourists, but always exercise normal precautions as you would in any large city. Keep your belongings secure, be aware of your surroundings, and avoid isolated areas at night."
         
         # Handle currency/money queries
-        elif any(word in user_input_lower for word in ["currency", "money", "cash", "exchange", "payment", "credit card"]):
+        elif intent == "currency":
             if not destination:
                 return "Please specify a destination first so I can provide currency information."
             return f"Be sure to check the local currency for {destination} before your trip. Major credit cards are widely accepted in most tourist destinations, but it's always good to have some local currency for small purchases."
         
         # Handle language queries
-        elif any(word in user_input_lower for word in ["language", "speak", "talk", "communicate", "phrase", "translation"]):
+        elif intent == "language":
             if not destination:
                 return "Please specify a destination first so I can provide language information."
             return f"It's always helpful to learn a few basic phrases in the local language when visiting {destination}. Even simple greetings can enhance your travel experience and show respect for the local culture."
         
         # Handle accessibility queries
-        elif any(word in user_input_lower for word in ["wheelchair", "accessible", "disability", "mobility", "handicap"]):
+        elif intent == "accessibility":
             if not destination:
                 return "Please specify a destination first so I can provide accessibility information."
             
             # Update travel info to include accessibility needs
-            st.session_state.travel_info["accessibility_needs"] = "wheelchair"
+            travel_info["accessibility_needs"] = "wheelchair"
             
             # Get accessible attractions
             attractions = search_accessible_attractions(destination)
             return f"Here are some wheelchair-accessible attractions in {destination}:\n\n" + "\n".join([f"- {attraction}" for attraction in attractions[:5]]) + "\n\nWould you like me to create a fully accessible itinerary for your trip?"
         
         # Handle special interest queries (Broadway, wine, etc.)
-        for interest, keywords in {
-            "broadway": ["broadway", "theater", "theatre", "show", "musical", "play"],
-            "wine": ["wine", "vineyard", "winery", "wine tasting"],
-            "photography": ["photography", "photo", "camera", "picture"],
-            "architecture": ["architecture", "building", "design", "structure"],
-            "literature": ["literature", "book", "author", "literary", "bookstore"],
-            "music": ["music", "concert", "festival", "live music", "band"],
-            "sports": ["sports", "game", "match", "stadium", "arena"]
-        }.items():
-            if any(keyword in user_input_lower for keyword in keywords):
-                if not destination:
-                    return f"I can help you find great {interest} experiences. Where would you like to travel to?"
-                
-                # Update travel info to include special interest
-                if "special_interests" not in st.session_state.travel_info:
-                    st.session_state.travel_info["special_interests"] = []
-                if interest not in st.session_state.travel_info["special_interests"]:
-                    st.session_state.travel_info["special_interests"].append(interest)
-                
-                # Get special interest activities
-                activities = search_special_interest(destination, interest)
-                return f"Here are some {interest} experiences in {destination}:\n\n" + "\n".join([f"- {activity}" for activity in activities[:5]]) + "\n\nI'll make sure to include these in your itinerary!"
+        if intent == "special_interest":
+            interest = route.slots["special_interest"][0]
+            if not destination:
+                return f"I can help you find great {interest} experiences. Where would you like to travel to?"
+            
+            # Update travel info to include special interest
+            if "special_interests" not in travel_info:
+                travel_info["special_interests"] = []
+            if interest not in travel_info["special_interests"]:
+                travel_info["special_interests"].append(interest)
+            
+            # Get special interest activities
+            activities = search_special_interest(destination, interest)
+            return f"Here are some {interest} experiences in {destination}:\n\n" + "\n".join([f"- {activity}" for activity in activities[:5]]) + "\n\nI'll make sure to include these in your itinerary!"
         
         # Handle vague travel queries
-        if any(phrase in user_input_lower for phrase in ["where should i go", "recommend a place", "good place to visit", "somewhere nice", "vacation ideas"]):
+        if intent == "vague":
             return "I'd be happy to help you plan a vacation! To provide personalized recommendations, I need some information:\n\n" + \
                    "1. What type of destination interests you?\n" + \
                    "   - Beach destination\n" + \
@@ -1679,7 +1818,7 @@ def generate_response(prompt, travel_info):
                 return "Where would you like to travel to? I can help you plan your trip!"
         
         # Try to generate a conversational response
-        conversational_response = generate_conversational_response(prompt, travel_info, bool(st.session_state.get('itinerary', None)))
+        conversational_response = generate_conversational_response(prompt, travel_info, bool(state.get('itinerary', None)), route, state)
         if conversational_response:
             return conversational_response
         
@@ -1699,42 +1838,98 @@ def generate_response(prompt, travel_info):
         print(f"Error generating response: {str(e)}")
         return "I apologize, but I encountered an error. Could you please rephrase your question?"
 
+# Send a message to the configured LLM, bypassing the cache
+def send_to_llm(prompt, history=None):
+    """Send a message to the LLM and return the response text"""
+    if LLM_MODE == "google" and GEMINI_API_KEY:
+        # Initialize Gemini model
+        model = genai.GenerativeModel('gemini-pro')
+        
+        # Create chat history if provided
+        chat = model.start_chat(history=history) if history else model
+        
+        # Generate response
+        response = chat.send_message(prompt)
+        return response.text
+    else:
+        # For local mode, use the existing chat function
+        messages = []
+        if history:
+            for msg in history:
+                messages.append({"role": msg["role"], "content": msg["content"]})
+        messages.append({"role": "user", "content": prompt})
+        
+        response = llm.invoke(messages)
+        return response.content
+
+# LLM calls run here so a caller can stop waiting when its deadline passes
+llm_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm")
+
+# Longest a single LLM call may take, even without a request deadline
+LLM_TIMEOUT = 120
+
+def call_llm(prompt, history=None):
+    """Call the LLM, waiting no longer than the request's remaining time"""
+    future = llm_executor.submit(send_to_llm, prompt, history)
+    try:
+        return future.result(timeout=budget(LLM_TIMEOUT))
+    except FutureTimeoutError:
+        raise DeadlineExceeded("The LLM did not answer before the request deadline")
+
 # Function to chat with LLM
 def chat(prompt, history=None):
     """Send a message to the LLM and get a response"""
     try:
-        if LLM_MODE == "google" and GEMINI_API_KEY:
-            # Initialize Gemini model
-            model = genai.GenerativeModel('gemini-pro')
-            
-            # Create chat history if provided
-            chat = model.start_chat(history=history) if history else model
-            
-            # Generate response
-            response = chat.send_message(prompt)
-            return response.text
-        else:
-            # For local mode, use the existing chat function
-            messages = []
-            if history:
-                for msg in history:
-                    messages.append({"role": msg["role"], "content": msg["content"]})
-            messages.append({"role": "user", "content": prompt})
-            
-            response = llm.invoke(messages)
-            return response.content
+        if not history:
+            # One-off prompts are answered from the LLM cache shared by all sessions and workers
+            return get_cache("llm").get(f"{LLM_MODE}_{prompt}", lambda: call_llm(prompt))
+        return call_llm(prompt, history)
             
+    except DeadlineExceeded:
+        mark_partial("llm")
+        return "I'm sorry, that is taking longer than expected. Please ask again in a moment."
     except Exception as e:
         print(f"Error in chat function: {str(e)}")
         return "I apologize, but I encountered an error while processing your request. Please try again."
 
+# Start warming the caches as soon as we know where the user is going
+def prefetch_destination(session_id, travel_info):
+    """Prefetch the weather, forecast, attractions, restaurants and hotels the user is likely to ask about next"""
+    destination = canonical_name(travel_info.get('destination', ''))
+    preferences = ",".join(travel_info.get('preferences', []))
+    dietary_preferences = travel_info.get('dietary_preferences', '')
+    accommodation_preferences = travel_info.get('accommodation_preferences', 'moderate')
+    signature = (place_key(destination), preferences, dietary_preferences, accommodation_preferences, travel_info.get('budget', ''))
+    
+    # Use the same arguments as the later turns so they become cache hits
+    def make_lookups():
+        return [
+            (0, f"weather for {destination}", lambda: get_weather(destination)),
+            (1, f"forecast for {destination}", lambda: get_forecast(destination)),
+            (1, f"attractions in {destination}", lambda: search_attractions(destination, preferences)),
+            (2, f"restaurants in {destination}", lambda: search_restaurants(destination, dietary_preferences)),
+            (3, f"hotels in {destination}", lambda: search_accommodations(destination, accommodation_preferences))
+        ]
+    
+    prefetcher.update(session_id, destination, signature, make_lookups)
+
 # Initialize session state variables
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "message_archive" not in st.session_state:
+    # Older messages, compressed and out of live state
+    st.session_state.message_archive = MessageArchive()
 if "travel_info" not in st.session_state:
     st.session_state.travel_info = {}
 if "itinerary" not in st.session_state:
     st.session_state.itinerary = None
+    # A refreshed page or another device can reopen an itinerary from its link
+    if "itinerary" in st.query_params:
+        stored = get_itinerary_store().get(st.query_params["itinerary"])
+        if stored:
+            st.session_state.itinerary = stored["itinerary"]
 if "llm" not in st.session_state:
     st.session_state.llm = llm
 
@@ -1746,20 +1941,68 @@ with col1:
 
 with col2:
     if st.button("Start New Chat"):
+        prefetcher.cancel(st.session_state.session_id)
         st.session_state.messages = []
+        st.session_state.message_archive = MessageArchive()
+        st.session_state.cursors = {}
         st.session_state.travel_info = {}
         st.session_state.itinerary = None
+        st.query_params.clear()
         st.rerun()
 
+# Debug tools, only shown when profiling is enabled for this deployment
+profile_next_request = False
+if ENABLE_PROFILING:
+    with st.sidebar:
+        st.markdown("### 🛠️ Debug")
+        profile_next_request = st.checkbox("Profile requests", help="Run each chat request under the sampling profiler")
+        if st.session_state.get("last_profile"):
+            last_profile = st.session_state.last_profile
+            st.markdown(f"**Last profile:** `{last_profile['profile_id']}`")
+            for entry in last_profile["top_functions"]:
+                st.markdown(f"- `{entry['function']}` (line {entry['line']}): {entry['percent']}%")
+            st.download_button(
+                label="📥 Download folded stacks",
+                data=last_profile["folded"],
+                file_name=f"{last_profile['profile_id']}.folded",
+                mime="text/plain"
+            )
+        
+        # Hosts whose circuit is open, or that are slowest, are the ones hurting latency
+        host_status = list(breakers.status().items())[:5]
+        if host_status:
+            st.markdown("**Search hosts (slowest first):**")
+            for host, status in host_status:
+                st.markdown(f"- `{host}`: {status['state']}, {status['failures']}/{status['requests']} failed, p95 {status['p95_seconds']}s")
+
 # Create two columns for chat and itinerary with different widths
 chat_col, itinerary_col = st.columns([2, 1])
 
-# Display chat messages in the left column
+# Display chat messages in the left column; only the latest are rendered on every rerun
 with chat_col:
-    for message in st.session_state.messages:
+    archive = st.session_state.message_archive
+    live_messages = st.session_state.messages
+    earlier_count = len(archive) + max(len(live_messages) - RENDER_WINDOW, 0)
+    if earlier_count:
+        if st.toggle(f"Show {earlier_count} earlier messages"):
+            if archive.dropped:
+                st.caption(f"{archive.dropped} of the oldest messages are no longer kept.")
+            for message in archive.messages() + live_messages[:-RENDER_WINDOW]:
+                with st.chat_message(message["role"]):
+                    st.markdown(message["content"])
+    for message in live_messages[-RENDER_WINDOW:]:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
 
+# How much of its memory budget this conversation holds
+with st.sidebar:
+    usage = session_memory(st.session_state.messages, st.session_state.message_archive, st.session_state.itinerary)
+    st.progress(
+        min(usage["total"] / SESSION_MEMORY_BUDGET, 1.0),
+        text=f"Session memory: {usage['total'] / 1024:.0f} KB of {SESSION_MEMORY_BUDGET / 1024:.0f} KB"
+    )
+    st.caption(f"Messages {usage['messages'] / 1024:.0f} KB · archived {usage['archive'] / 1024:.0f} KB · itinerary {usage['itinerary'] / 1024:.0f} KB")
+
 # Display itinerary in a scrollable box in the right column
 with itinerary_col:
     st.markdown("### 📋 Your Travel Itinerary")
@@ -1875,13 +2118,13 @@ if prompt := st.chat_input("Plan your trip..."):
         with st.chat_message("user"):
             st.markdown(prompt)
     
-    # Extract travel information from user message
-    travel_info = extract_info_directly([msg["content"] for msg in st.session_state.messages])
+    # Extract travel information from the live messages, keeping what archived ones contributed
+    st.session_state.travel_info = extract_info_directly(
+        [msg["content"] for msg in st.session_state.messages], st.session_state.travel_info
+    )
     
-    # Update travel info in session state
-    for key, value in travel_info.items():
-        if value:  # Only update if the new value is not empty
-            st.session_state.travel_info[key] = value
+    # Prefetch likely follow-up lookups in the background
+    prefetch_destination(st.session_state.session_id, st.session_state.travel_info)
     
     # Generate response based on the extracted information
     with chat_col:
@@ -1890,9 +2133,33 @@ if prompt := st.chat_input("Plan your trip..."):
             loading_placeholder = st.empty()
             loading_placeholder.markdown('<div class="loading-dots" style="display: inline-block;">Thinking</div>', unsafe_allow_html=True)
             
-            response = generate_response(prompt, st.session_state.travel_info)
+            # Every lookup made for this message shares one time budget
+            with deadline(CHAT_TIMEOUT) as chat_deadline:
+                if profile_next_request:
+                    with profile_request("chat") as profiler:
+                        response = generate_response(prompt, st.session_state.travel_info)
+                    st.session_state.last_profile = {
+                        "profile_id": profiler.profile_id,
+                        "top_functions": profiler.top_functions(limit=5),
+                        "folded": profiler.folded()
+                    }
+                else:
+                    response = generate_response(prompt, st.session_state.travel_info)
+            
+            # Flag answers built without everything they needed
+            if chat_deadline.partial:
+                response += f"\n\n_Some details ({', '.join(chat_deadline.skipped)}) took too long to load and were left out. Ask again for the full answer._"
             
             # Clear loading animation and show response
             loading_placeholder.empty()
             st.markdown(response)
-            st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
+            st.session_state.messages.append({"role": "assistant", "content": response})
+            
+            # Keep the session within its memory budget; the travel info already holds what older messages said
+            compact(st.session_state.messages, st.session_state.message_archive)
+            
+            # Put the stored itinerary's ID in the URL so the page can be reopened
+            if st.session_state.itinerary:
+                stored = get_itinerary_store().find(st.session_state.travel_info)
+                if stored and stored["itinerary"] == st.session_state.itinerary:
+                    st.query_params["itinerary"] = stored["id"]
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""Scale benchmark for the destination catalog.
+
+The shipped catalog (data/destinations.json) is a demo of a handful of
+cities, so this builds synthetic catalogs of any size from it and times
+opening them and looking entries up:
+
+    python benchmarks/catalog_scale.py [destinations]
+"""
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from destination_catalog import DEFAULT_CITY, SOURCE_PATH, DestinationCatalog, build_catalog  # noqa: E402
+
+
+def generate_fixture(cities, source_path=SOURCE_PATH):
+    """A synthetic catalog source of `cities` destinations for benchmarks.
+
+    Each made-up destination ("Tokyo 17") is a copy of a real entry with
+    numbered names and aliases, so the fixture has the real entries' shape
+    and payload sizes at any scale.
+    """
+    with open(source_path, encoding="utf-8") as f:
+        source = json.load(f)
+    real = [(city, entry) for city, entry in source.items() if city != DEFAULT_CITY]
+    fixture = {DEFAULT_CITY: source[DEFAULT_CITY]} if DEFAULT_CITY in source else {}
+    for i in range(cities):
+        city, entry = real[i % len(real)]
+        fixture[f"{city} {i}"] = dict(
+            entry,
+            name=f"{entry.get('name') or city.title()} {i}",
+            aliases=[f"{alias} {i}" for alias in entry.get("aliases", [])]
+        )
+    return fixture
+
+
+def benchmark(cities, lookups=200000):
+    """Build a catalog of `cities` generated destinations and time opening it and looking entries up"""
+    os.makedirs(".cache", exist_ok=True)
+    source_path = os.path.join(".cache", "destinations_fixture.json")
+    target_path = os.path.join(".cache", "destinations_fixture.cat")
+    with open(source_path, "w", encoding="utf-8") as f:
+        json.dump(generate_fixture(cities), f)
+
+    start = time.perf_counter()
+    _, entries = build_catalog(source_path, target_path)
+    print(f"Built {cities} destinations, {entries} index entries, {os.path.getsize(target_path) / 1e6:.1f} MB "
+          f"in {time.perf_counter() - start:.2f} s")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    catalog = DestinationCatalog(target_path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Opened in {elapsed * 1000:.0f} ms, index peak {peak / 1e6:.1f} MB")
+
+    rng = random.Random(0)
+    names = catalog.cities()
+    categories = ["attractions", "restaurants", "transport", "hotels:moderate", "daily_costs"]
+    queries = [(rng.choice(names).title(), rng.choice(categories)) for _ in range(lookups)]
+    misses = [(f"Nowhere {i}", rng.choice(categories)) for i in range(lookups)]
+    for label, run in [
+        ("hit", lambda: [catalog.get(city, category) for city, category in queries]),
+        ("hit, repeated", lambda: [catalog.get(city, category) for city, category in queries]),
+        ("miss + fallback", lambda: [catalog.get(city, category, fallback=True) for city, category in misses]),
+        ("activities", lambda: [catalog.activities(city, "morning") for city, _ in queries[:lookups // 10]]),
+    ]:
+        count = lookups // 10 if label == "activities" else lookups
+        start = time.perf_counter()
+        run()
+        print(f"{label:16} {(time.perf_counter() - start) / count * 1e6:6.2f} µs per lookup")
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
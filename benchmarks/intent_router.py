@@ -0,0 +1,36 @@
+"""Routing cost of the intent router over a handful of typical messages:
+
+    python benchmarks/intent_router.py [rounds]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import route_message  # noqa: E402
+
+MESSAGES = [
+    "are there good beaches in bali?",
+    "i love food and technology",
+    "what's the weather like in paris",
+    "find me a hotel near the station",
+    "how do i get around by subway",
+    "do they take credit card",
+    "any jazz concert tonight",
+    "vacation ideas",
+    "thanks",
+]
+
+
+def benchmark(rounds=2000):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for message in MESSAGES:
+            route_message(message)
+    elapsed = time.perf_counter() - start
+    print(f"Routing cost: {elapsed / (rounds * len(MESSAGES)) * 1e6:.1f} µs per message")
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
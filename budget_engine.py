@@ -0,0 +1,133 @@
+import threading
+import time
+
+import numpy as np
+
+from destination_catalog import get_catalog, normalize_city
+
+COST_CATEGORIES = ("accommodation", "food", "activities", "transport")
+BUDGET_LEVELS = ("low", "moderate", "high")
+
+# Used when neither the destination nor the catalog defaults price a category
+FALLBACK_DAILY_COSTS = {"accommodation": 200, "food": 100, "activities": 50, "transport": 30}
+FALLBACK_MULTIPLIERS = {"low": 0.7, "moderate": 1.0, "high": 1.5}
+
+# Accommodation is priced per room; everything else per traveller
+TRAVELLERS_PER_ROOM = 2
+
+
+class BudgetEngine:
+    """Price trips for many (destination, days, budget level, travellers) combinations at once.
+
+    The catalog's daily costs and budget multipliers are loaded into one cost
+    table per destination, so a quote is a handful of array operations no
+    matter how many combinations it covers.
+    """
+
+    def __init__(self, catalog=None):
+        catalog = catalog or get_catalog()
+        # Row 0 holds the catalog defaults, used for destinations it doesn't know
+        self.destinations = [""] + catalog.cities()
+        self.rows = {city: row for row, city in enumerate(self.destinations)}
+
+        self.daily_costs = np.empty((len(self.destinations), len(COST_CATEGORIES)))
+        self.multipliers = np.empty((len(self.destinations), len(BUDGET_LEVELS)))
+        for row, city in enumerate(self.destinations):
+            daily_costs = catalog.get_values(city, "daily_costs")
+            multipliers = catalog.get_values(city, "budget_multipliers")
+            self.daily_costs[row] = [daily_costs.get(category, FALLBACK_DAILY_COSTS[category]) for category in COST_CATEGORIES]
+            self.multipliers[row] = [multipliers.get(level, FALLBACK_MULTIPLIERS[level]) for level in BUDGET_LEVELS]
+
+    def destination_rows(self, destinations):
+        """Map destination names to cost table rows"""
+        return np.fromiter((self.rows.get(normalize_city(name), 0) for name in destinations), dtype=np.intp, count=len(destinations))
+
+    @staticmethod
+    def level_columns(levels):
+        """Map budget level names to multiplier columns"""
+        try:
+            return np.fromiter((BUDGET_LEVELS.index(level.lower()) for level in levels), dtype=np.intp, count=len(levels))
+        except ValueError:
+            raise ValueError(f"Budget level must be one of {', '.join(BUDGET_LEVELS)}")
+
+    def quote(self, destinations, days, levels, travellers=1):
+        """Return {category: costs, "total": costs} for broadcast arrays of trip parameters.
+
+        Every argument is a scalar or a sequence; sequences of different
+        lengths broadcast the way NumPy arrays do.
+        """
+        rows = self.destination_rows(np.atleast_1d(destinations).tolist())
+        columns = self.level_columns(np.atleast_1d(levels).tolist())
+        days = np.asarray(days)
+        travellers = np.asarray(travellers)
+        if (days < 1).any() or (travellers < 1).any():
+            raise ValueError("Days and travellers must be at least 1")
+        return self._price(rows, days, columns, travellers)
+
+    def quote_grid(self, destinations, days, levels, travellers=(1,)):
+        """Quote every combination of the given values, in row-major order"""
+        rows = self.destination_rows(list(destinations))
+        columns = self.level_columns(list(levels))
+        days = np.asarray(days)
+        travellers = np.asarray(travellers)
+        if (days < 1).any() or (travellers < 1).any():
+            raise ValueError("Days and travellers must be at least 1")
+        return self._price(
+            rows[:, None, None, None], days[None, :, None, None],
+            columns[None, None, :, None], travellers[None, None, None, :]
+        )
+
+    def _price(self, rows, days, columns, travellers):
+        rows, days, columns, travellers = np.broadcast_arrays(rows, days, columns, travellers)
+        per_day = self.daily_costs[rows] * self.multipliers[rows, columns][..., None]
+        units = np.stack([
+            np.ceil(travellers / TRAVELLERS_PER_ROOM),  # Rooms
+            travellers, travellers, travellers
+        ], axis=-1)
+        costs = per_day * units * days[..., None]
+        quote = {category: costs[..., index] for index, category in enumerate(COST_CATEGORIES)}
+        quote["total"] = costs.sum(axis=-1)
+        return quote
+
+
+_budget_engine = None
+_budget_engine_lock = threading.Lock()
+
+
+def get_budget_engine():
+    """Return the process-wide budget engine, building its cost table on first use"""
+    global _budget_engine
+    with _budget_engine_lock:
+        if _budget_engine is None:
+            _budget_engine = BudgetEngine()
+        return _budget_engine
+
+
+if __name__ == "__main__":
+    engine = get_budget_engine()
+    destinations = engine.destinations[1:] + ["Somewhere unknown"]
+    days = np.arange(1, 31)
+    travellers = np.arange(1, 7)
+
+    start = time.perf_counter()
+    quote = engine.quote_grid(destinations, days, BUDGET_LEVELS, travellers)
+    elapsed = time.perf_counter() - start
+    combinations = quote["total"].size
+    print(f"Priced {combinations} combinations in {elapsed * 1000:.1f} ms")
+
+    # The vectorized quote must agree with the scalar arithmetic it replaces
+    start = time.perf_counter()
+    mismatches = 0
+    for d, destination in enumerate(destinations):
+        row = engine.rows.get(normalize_city(destination), 0)
+        for l, level in enumerate(BUDGET_LEVELS):
+            multiplier = engine.multipliers[row, l]
+            accommodation, food, activities, transport = engine.daily_costs[row] * multiplier
+            for n, day_count in enumerate(days):
+                for t, traveller_count in enumerate(travellers):
+                    rooms = -(-traveller_count // TRAVELLERS_PER_ROOM)
+                    total = (accommodation * rooms + (food + activities + transport) * traveller_count) * day_count
+                    if abs(total - quote["total"][d, n, l, t]) > 1e-6:
+                        mismatches += 1
+    scalar_elapsed = time.perf_counter() - start
+    print(f"Scalar loop: {scalar_elapsed * 1000:.1f} ms, {mismatches} mismatches")
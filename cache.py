@@ -0,0 +1,220 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# (soft TTL, hard TTL) in seconds for each cache namespace. Between the two
+# the stale value is served while a single background refresh runs.
+CACHE_TTLS = {
+    "search": (300, 6 * 3600),
+    "weather": (300, 3600),
+    # Keys carry the forecast run number (forecast.forecast_cycle), so entries expire with the run
+    "forecast": (3 * 3600, 3 * 3600),
+    "location": (7 * 24 * 3600, 30 * 24 * 3600),
+    "llm": (3600, 24 * 3600),
+    "responses": (300, 3600),
+    "pages": (6 * 3600, 24 * 3600),  # Parsed result pages by canonical URL (page_cache.py)
+    "result_sets": (600, 1800),  # Paged "more results" lists (result_pager.py)
+}
+DEFAULT_TTLS = (300, 3600)
+
+# Most entries each namespace keeps, in process memory or in the shared
+# SQLite file; the least recently used (oldest written, in SQLite) are evicted beyond this
+CACHE_MAX_ENTRIES = {
+    "search": 5000,
+    "weather": 2000,
+    "forecast": 2000,
+    "location": 5000,
+    "llm": 2000,
+    "responses": 2000,
+    "pages": 20000,
+    "result_sets": 2000,
+}
+DEFAULT_MAX_ENTRIES = 5000
+
+# Seconds between deletions of expired and surplus rows in the shared SQLite cache
+PRUNE_INTERVAL = 60
+
+# When set, every cache namespace lives in this SQLite file so that all
+# worker processes on the node share their entries (see run_server.py)
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+
+# Background refreshes for every namespace share this small pool
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+
+class MemoryStore:
+    """Cache entries held in this process, evicting the least recently used beyond max_entries"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, stored_at), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, stored_at):
+        with self._lock:
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteStore:
+    """Cache entries for one namespace in a SQLite file shared by every process on the node.
+
+    Every PRUNE_INTERVAL seconds a write also deletes the namespace's rows
+    older than max_age and, beyond max_entries, its oldest written rows.
+    """
+
+    def __init__(self, namespace, path, max_age=DEFAULT_TTLS[1], max_entries=DEFAULT_MAX_ENTRIES):
+        self.namespace = namespace
+        self.path = path
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._pruned_at = 0.0
+        self._prune_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, stored_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (namespace, stored_at)")
+        self.prune()
+
+    def _connect(self):
+        # One connection per thread; WAL lets readers and a writer work concurrently
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value, stored_at FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        return (pickle.loads(row[0]), row[1]) if row else None
+
+    def set(self, key, value, stored_at):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, stored_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, pickle.dumps(value), stored_at)
+            )
+        if time.time() - self._pruned_at >= PRUNE_INTERVAL:
+            self.prune()
+
+    def prune(self):
+        """Delete expired rows, then the oldest rows beyond max_entries"""
+        with self._prune_lock:
+            self._pruned_at = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND stored_at < ?",
+                (self.namespace, time.time() - self.max_age)
+            )
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache WHERE namespace = ? ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries)
+            )
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+
+
+class Cache:
+    """Cache with stale-while-revalidate expiry, shared by every session in the process"""
+
+    def __init__(self, namespace, soft_ttl, hard_ttl, store=None):
+        self.namespace = namespace
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self._store = store if store is not None else MemoryStore()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, key, fetch, refresh=None):
+        """Return the cached value for key, calling fetch() when it is missing or too old.
+
+        Fresh entries are returned as is. Entries past the soft TTL are
+        returned immediately and refreshed in the background, with refresh()
+        when given (for fetches tied to the calling request) or fetch(); only
+        entries past the hard TTL (or missing) block on fetch().
+        """
+        entry = self._store.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.soft_ttl:
+                return value
+            if age < self.hard_ttl:
+                self._refresh_in_background(key, refresh or fetch)
+                return value
+
+        value = fetch()
+        self.set(key, value)
+        return value
+
+    def peek(self, key):
+        """Return the cached value for key without fetching, or None when missing or past the hard TTL"""
+        entry = self._store.get(key)
+        if entry is None or time.time() - entry[1] >= self.hard_ttl:
+            return None
+        return entry[0]
+
+    def set(self, key, value):
+        self._store.set(key, value, time.time())
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        _refresh_executor.submit(self._refresh, key, fetch)
+
+    def _refresh(self, key, fetch):
+        try:
+            self.set(key, fetch())
+        except Exception as e:
+            # Keep serving the stale value until the hard TTL
+            print(f"Background refresh of {self.namespace} cache entry {key} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace):
+    """Return the shared cache for a namespace, creating it on first use"""
+    with _caches_lock:
+        if namespace not in _caches:
+            soft_ttl, hard_ttl = CACHE_TTLS.get(namespace, DEFAULT_TTLS)
+            if SHARED_CACHE_PATH:
+                store = SQLiteStore(namespace, SHARED_CACHE_PATH, hard_ttl,
+                                    CACHE_MAX_ENTRIES.get(namespace, DEFAULT_MAX_ENTRIES))
+            else:
+                store = MemoryStore(CACHE_MAX_ENTRIES.get(namespace, DEFAULT_MAX_ENTRIES))
+            _caches[namespace] = Cache(namespace, soft_ttl, hard_ttl, store)
+        return _caches[namespace]
@@ -0,0 +1,83 @@
+import json
+import os
+import sys
+import zlib
+
+# Messages kept uncompressed in a session; older ones are archived
+LIVE_MESSAGES = int(os.getenv("CHAT_LIVE_MESSAGES", "40"))
+# Messages rendered on every rerun; earlier ones only on request
+RENDER_WINDOW = int(os.getenv("CHAT_RENDER_WINDOW", "20"))
+# Bytes one session may hold in messages, archive and itinerary together
+SESSION_MEMORY_BUDGET = int(os.getenv("SESSION_MEMORY_BUDGET", str(2 * 1024 * 1024)))
+
+# Share of the budget the live messages may use before they are archived early
+LIVE_SHARE = 0.5
+# Share of the budget the compressed archive may use before its oldest messages are dropped
+ARCHIVE_SHARE = 0.25
+
+
+def message_bytes(messages):
+    """Approximate memory held by a list of {"role", "content"} messages"""
+    return sum(sys.getsizeof(message["content"]) + sys.getsizeof(message) for message in messages)
+
+
+class MessageArchive:
+    """Older messages of one conversation, zlib-compressed in chunks and capped in size.
+
+    The oldest chunks are dropped when the archive grows past max_bytes;
+    the travel details they contributed are already in the session's
+    travel info.
+    """
+
+    def __init__(self, max_bytes=int(SESSION_MEMORY_BUDGET * ARCHIVE_SHARE)):
+        self.max_bytes = max_bytes
+        self.chunks = []  # (message count, compressed JSON)
+        self.nbytes = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return sum(count for count, _ in self.chunks)
+
+    def add(self, messages):
+        if not messages:
+            return
+        chunk = zlib.compress(json.dumps(messages, separators=(",", ":")).encode("utf-8"))
+        self.chunks.append((len(messages), chunk))
+        self.nbytes += len(chunk)
+        while len(self.chunks) > 1 and self.nbytes > self.max_bytes:
+            count, oldest = self.chunks.pop(0)
+            self.nbytes -= len(oldest)
+            self.dropped += count
+
+    def messages(self):
+        """Every archived message, oldest first"""
+        return [message for _, chunk in self.chunks for message in json.loads(zlib.decompress(chunk))]
+
+
+def compact(messages, archive, keep=LIVE_MESSAGES, max_bytes=int(SESSION_MEMORY_BUDGET * LIVE_SHARE)):
+    """Move the oldest live messages into the archive until at most `keep` (and max_bytes) remain.
+
+    Messages are archived in batches of at least a quarter of `keep` so
+    each compressed chunk holds enough text to compress well.
+    """
+    excess = len(messages) - keep
+    if excess < max(1, keep // 4) and message_bytes(messages) <= max_bytes:
+        return 0
+    cut = max(excess, 0)
+    # Over the byte budget: also archive the oldest messages that fit in it, keeping the latest exchange
+    while len(messages) - cut > 2 and message_bytes(messages[cut:]) > max_bytes:
+        cut += 1
+    archive.add(messages[:cut])
+    del messages[:cut]
+    return cut
+
+
+def session_memory(messages, archive, itinerary=None):
+    """Approximate bytes a session holds, by part"""
+    usage = {
+        "messages": message_bytes(messages),
+        "archive": archive.nbytes if archive is not None else 0,
+        "itinerary": sys.getsizeof(itinerary) if itinerary else 0,
+    }
+    usage["total"] = sum(usage.values())
+    return usage
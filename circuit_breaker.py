@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+from metrics import metrics
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def host_of(url):
+    """Host a URL points at, without a leading www."""
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+class CircuitBreaker:
+    """Track one host's recent fetches and stop calling it while it keeps failing.
+
+    Closed: every fetch goes through. When at least `min_requests` of the
+    fetches in the last `window` seconds were made and `failure_rate` of them
+    timed out or failed, the breaker opens and the host is skipped for
+    `open_for` seconds. It then goes half-open and lets a single probe
+    through: success closes it, failure opens it again.
+    """
+
+    def __init__(self, host, window=600, min_requests=4, failure_rate=0.5, open_for=300, max_outcomes=50):
+        self.host = host
+        self.window = window
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.open_for = open_for
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.outcomes = deque(maxlen=max_outcomes)  # (finished_at, ok, seconds)
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True when a fetch from this host may go ahead"""
+        with self._lock:
+            if self.state == OPEN:
+                if time.time() - self.opened_at < self.open_for:
+                    return False
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == HALF_OPEN:
+                if self.probing:
+                    return False  # One probe at a time
+                self.probing = True
+            return True
+
+    def record(self, ok, seconds):
+        """Record how a fetch that allow() let through went"""
+        now = time.time()
+        with self._lock:
+            self.outcomes.append((now, ok, seconds))
+            if self.state == HALF_OPEN:
+                self.probing = False
+                if ok:
+                    self.state = CLOSED
+                    self.outcomes.clear()
+                else:
+                    self._open(now)
+                return
+            if not ok and self.state == CLOSED:
+                recent = self._recent(now)
+                failures = sum(1 for _, outcome_ok, _ in recent if not outcome_ok)
+                if len(recent) >= self.min_requests and failures >= self.failure_rate * len(recent):
+                    self._open(now)
+
+    def release(self):
+        """Give back a fetch allow() let through that never reached the host"""
+        with self._lock:
+            self.probing = False
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        metrics.increment("circuit_breaker.opened")
+        print(f"Circuit opened for {self.host}")
+
+    def _recent(self, now):
+        return [outcome for outcome in self.outcomes if now - outcome[0] <= self.window]
+
+    def status(self):
+        now = time.time()
+        with self._lock:
+            recent = self._recent(now)
+            latencies = sorted(seconds for _, _, seconds in recent)
+            return {
+                "state": self.state,
+                "requests": len(recent),
+                "failures": sum(1 for _, ok, _ in recent if not ok),
+                "p95_seconds": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2) if latencies else None,
+                "retry_in": round(max(0.0, self.opened_at + self.open_for - now), 1) if self.state == OPEN else None
+            }
+
+
+class BreakerRegistry:
+    """One circuit breaker per host, shared by every session in the process"""
+
+    def __init__(self, max_hosts=2000, **breaker_options):
+        self.max_hosts = max_hosts
+        self.breaker_options = breaker_options
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        host = host_of(url)
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                if len(self._breakers) >= self.max_hosts:
+                    # Forget a closed host to make room; open ones keep protecting us
+                    for name, candidate in self._breakers.items():
+                        if candidate.state == CLOSED:
+                            del self._breakers[name]
+                            break
+                breaker = self._breakers[host] = CircuitBreaker(host, **self.breaker_options)
+            return breaker
+
+    def status(self):
+        """Per-host state, slowest hosts first"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        hosts = {breaker.host: breaker.status() for breaker in breakers}
+        return dict(sorted(hosts.items(), key=lambda item: -(item[1]["p95_seconds"] or 0)))
+
+
+breakers = BreakerRegistry()
+metrics.register("circuit_breakers", breakers.status)
@@ -0,0 +1,169 @@
+import random
+import threading
+import time
+import zlib
+
+from destination_catalog import get_catalog, normalize_city
+
+TIMES_OF_DAY = ("morning", "afternoon", "evening")
+
+# Preferences extracted from the conversation, mapped onto the catalog's activity pools
+PREFERENCE_ALIASES = {
+    "cultural": "culture",
+    "historical": "culture",
+    "history": "culture",
+    "art": "culture",
+    "tech": "technology",
+    "outdoor": "nature",
+    "adventure": "nature",
+    "relaxation": "nature",
+    "beach": "nature",
+    "cuisine": "food",
+}
+
+# Used for a time of day when the destination has no activity pools at all
+DEFAULT_ACTIVITIES = {
+    "morning": "Start your day with a visit to a local café",
+    "afternoon": "Visit a local museum or art gallery",
+    "evening": "Enjoy dinner at a local restaurant",
+}
+
+
+def pool_name(preference):
+    preference = preference.strip().lower()
+    return PREFERENCE_ALIASES.get(preference, preference)
+
+
+class _Deck:
+    """One activity pool, dealt in shuffled order without repeats until it runs out"""
+
+    __slots__ = ("activities", "order", "position")
+
+    def __init__(self, activities, rng):
+        self.activities = activities
+        self.order = list(range(len(activities)))
+        rng.shuffle(self.order)
+        self.position = 0
+
+    def remaining(self):
+        return len(self.order) - self.position
+
+    def deal(self):
+        activity = self.activities[self.order[self.position]]
+        self.position += 1
+        return activity
+
+    def reshuffle(self, rng, last=None):
+        rng.shuffle(self.order)
+        # Never deal the same activity twice in a row across a reshuffle
+        if len(self.order) > 1 and self.activities[self.order[0]] == last:
+            self.order.append(self.order.pop(0))
+        self.position = 0
+
+
+class DayPlanner:
+    """Schedule morning, afternoon and evening activities for trips of any length.
+
+    Activity pools are prepared once per destination. Picks rotate across all
+    of the user's preferences (or of every pool, when none of them has one),
+    and no activity repeats in a time slot until every matching pool for that
+    slot has been used up.
+    """
+
+    def __init__(self, catalog=None):
+        self.catalog = catalog or get_catalog()
+        self._pools = {}  # catalog city -> {time of day: {pool name: (activities, ...)}}
+        self._lock = threading.Lock()
+
+    def pools(self, destination):
+        """Return the prepared activity pools for a destination"""
+        # Destinations missing from the catalog all share the default pools
+        city = normalize_city(destination) if destination in self.catalog else ""
+        with self._lock:
+            if city not in self._pools:
+                self._pools[city] = {
+                    time_of_day: {name: tuple(items) for name, items in self.catalog.activities(city, time_of_day).items()}
+                    for time_of_day in TIMES_OF_DAY
+                }
+            return self._pools[city]
+
+    def plan(self, destination, days, preferences=(), seed=None):
+        """Return one {time of day: activity} dict per day.
+
+        The same destination, length and preferences always give the same
+        plan unless another seed is passed.
+        """
+        names = []
+        for preference in preferences:
+            name = pool_name(preference)
+            if name not in names:
+                names.append(name)
+        if seed is None:
+            seed = zlib.crc32(f"{normalize_city(destination)}|{days}|{','.join(names)}".encode("utf-8"))
+        rng = random.Random(seed)
+
+        slots = {}
+        for time_of_day, pools in self.pools(destination).items():
+            # Without a pool for any preference, rotate through every pool the destination has
+            matching = [name for name in names if pools.get(name)] or sorted(name for name in pools if pools[name])
+            slots[time_of_day] = [_Deck(pools[name], rng) for name in matching]
+
+        plan = [{} for _ in range(days)]
+        for time_of_day in TIMES_OF_DAY:
+            decks = slots[time_of_day]
+            turn = TIMES_OF_DAY.index(time_of_day)  # Start each slot on a different preference
+            last = None
+            for day in plan:
+                if not decks:
+                    day[time_of_day] = DEFAULT_ACTIVITIES[time_of_day]
+                    continue
+                # Next preference in the rotation that still has unused activities
+                for _ in range(len(decks)):
+                    deck = decks[turn % len(decks)]
+                    turn += 1
+                    if deck.remaining():
+                        break
+                else:
+                    # Every pool is used up; start a new cycle over all of them
+                    for deck in decks:
+                        deck.reshuffle(rng, last)
+                    deck = decks[turn % len(decks)]
+                    turn += 1
+                last = day[time_of_day] = deck.deal()
+        return plan
+
+
+_day_planner = None
+_day_planner_lock = threading.Lock()
+
+
+def get_day_planner():
+    """Return the process-wide day planner"""
+    global _day_planner
+    with _day_planner_lock:
+        if _day_planner is None:
+            _day_planner = DayPlanner()
+        return _day_planner
+
+
+if __name__ == "__main__":
+    planner = get_day_planner()
+    preferences = ["food", "cultural", "technology"]
+
+    for days in (7, 30, 90):
+        start = time.perf_counter()
+        plan = planner.plan("Tokyo", days, preferences)
+        elapsed = time.perf_counter() - start
+
+        # Count repeats dealt before their time slot had used up every matching pool
+        early_repeats = 0
+        for time_of_day in TIMES_OF_DAY:
+            pool_size = sum(len(planner.pools("Tokyo")[time_of_day].get(name, ())) for name in ("food", "culture", "technology"))
+            activities = [day[time_of_day] for day in plan]
+            for cycle in range(0, days, pool_size):
+                window = activities[cycle:cycle + pool_size]
+                early_repeats += len(window) - len(set(window))
+        print(f"{days}-day plan in {elapsed * 1000:.2f} ms, {early_repeats} early repeats")
+
+    assert planner.plan("Tokyo", 30, preferences) == planner.plan("Tokyo", 30, preferences)
+    print("Plans are deterministic")
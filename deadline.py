@@ -0,0 +1,97 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before this step could produce anything"""
+
+
+class PartialResult(Exception):
+    """A step ran out of time part way; `value` holds what it managed to produce.
+
+    Raised instead of returning so caches never store the incomplete value.
+    """
+
+    def __init__(self, value):
+        super().__init__("Deadline reached with partial results")
+        self.value = value
+
+
+class Deadline:
+    """Time budget for one user request, shared by every call made on its behalf"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.partial = False
+        self.skipped = []  # What was cut short, for logs and responses
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def mark_partial(self, what):
+        self.partial = True
+        if what not in self.skipped:
+            self.skipped.append(what)
+
+
+@contextmanager
+def deadline(seconds):
+    """Run the block under a deadline; calls made inside it see budget() shrink"""
+    request_deadline = Deadline(seconds)
+    token = _current.set(request_deadline)
+    try:
+        yield request_deadline
+    finally:
+        _current.reset(token)
+
+
+def current_deadline():
+    return _current.get()
+
+
+def budget(limit):
+    """Seconds a step may take: its own limit, cut to what is left of the request's deadline.
+
+    Raises DeadlineExceeded when nothing is left, so callers never start work
+    they can't finish.
+    """
+    request_deadline = _current.get()
+    if request_deadline is None:
+        return limit
+    remaining = request_deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline reached")
+    return min(limit, remaining) if limit is not None else remaining
+
+
+def expired():
+    request_deadline = _current.get()
+    return request_deadline is not None and request_deadline.expired()
+
+
+def mark_partial(what):
+    """Flag the current request's result as partial (no-op outside a deadline)"""
+    request_deadline = _current.get()
+    if request_deadline is not None:
+        request_deadline.mark_partial(what)
+
+
+def pause(seconds):
+    """Sleep, but never past the deadline"""
+    request_deadline = _current.get()
+    if request_deadline is not None:
+        seconds = min(seconds, request_deadline.remaining())
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+def submit(executor, func, *args, **kwargs):
+    """Submit func to an executor so it runs under the caller's deadline"""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
@@ -0,0 +1,243 @@
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+
+# Precompiled catalog and the JSON source it is built from
+CATALOG_PATH = os.getenv("DESTINATION_CATALOG_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "destinations.cat"))
+SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "destinations.json")
+
+# File layout:
+#   magic | entry count (u32) | cities length (u32) | cities | entry positions | index entries | payload
+# Cities are the normalized destination keys joined with newlines. Entry positions
+# (u32 each) locate every index entry, in key order, so lookups binary-search the
+# mapped file instead of loading the index. Each index entry is: key length (u16) |
+# key | payload offset (u32) | payload length (u32), where key is
+# "<normalized city>\x1f<category>" and the payload is the category's items as UTF-8
+# joined with newlines. Aliases share the payload of their city.
+MAGIC = b"TACAT\x02"
+KEY_SEPARATOR = "\x1f"
+DEFAULT_CITY = "*"
+
+# Entry locations a catalog remembers before it starts over; destinations come
+# from user text, so lookups that miss are remembered too and must not pile up
+MAX_LOCATED = 65536
+
+
+def normalize_city(name):
+    """Normalize a destination name into a catalog key ("Tokyo, Japan" -> "tokyo")"""
+    if not name:
+        return ""
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    name = name.split(",")[0].lower()
+    name = re.sub(r"^\s*in\s+", "", name)
+    name = re.sub(r"[^a-z0-9]+", " ", name)
+    return name.strip()
+
+
+def _flatten(entry):
+    """Turn one city's JSON entry into {category: [items]}"""
+    categories = {}
+    for field in ("name", "country"):
+        if entry.get(field):
+            categories[field] = [entry[field]]
+    for field in ("attractions", "restaurants", "transport"):
+        if entry.get(field):
+            categories[field] = list(entry[field])
+    for level, text in entry.get("hotels", {}).items():
+        categories[f"hotels:{level}"] = [text]
+    for time_of_day, activities in entry.get("activities", {}).items():
+        for preference, items in activities.items():
+            categories[f"{time_of_day}:{preference}"] = list(items)
+    for field in ("budget_multipliers", "daily_costs"):
+        if entry.get(field):
+            categories[field] = [f"{key} {value}" for key, value in entry[field].items()]
+    return categories
+
+
+def build_catalog(source_path=SOURCE_PATH, target_path=CATALOG_PATH):
+    """Compile the JSON destination source into the binary catalog"""
+    with open(source_path, encoding="utf-8") as f:
+        source = json.load(f)
+
+    payload = bytearray()
+    entries = []
+    for city, entry in source.items():
+        keys = [normalize_city(city) if city != DEFAULT_CITY else DEFAULT_CITY]
+        keys += [normalize_city(alias) for alias in entry.get("aliases", [])]
+        for category, items in _flatten(entry).items():
+            data = "\n".join(items).encode("utf-8")
+            offset = len(payload)
+            payload += data
+            for key in keys:
+                entries.append((f"{key}{KEY_SEPARATOR}{category}".encode("utf-8"), offset, len(data)))
+
+    entries.sort()
+    cities = sorted({key.split(KEY_SEPARATOR.encode("utf-8"), 1)[0] for key, _, _ in entries} - {DEFAULT_CITY.encode("utf-8")})
+    cities = b"\n".join(cities)
+    index = bytearray()
+    positions = []
+    for key, offset, length in entries:
+        positions.append(len(index))
+        index += struct.pack("<H", len(key)) + key + struct.pack("<II", offset, length)
+    with open(target_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<II", len(entries), len(cities)))
+        f.write(cities)
+        f.write(struct.pack(f"<{len(positions)}I", *positions))
+        f.write(index)
+        f.write(payload)
+    return len(source), len(entries)
+
+
+class DestinationCatalog:
+    """Read-only view over the memory-mapped destination catalog.
+
+    Opening maps the file without reading its index; each lookup
+    binary-searches the sorted index in place, and the locations found are
+    remembered for the next lookup of the same entry.
+    """
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self._data = None
+        self._count = 0
+        self._located = {}  # (city, category) -> (payload offset, length), or None when absent
+        if not os.path.exists(path):
+            print(f"Destination catalog not found at {path}, using live search only")
+            return
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._load_header()
+
+    def _load_header(self):
+        data = self._data
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{self.path} is not a destination catalog in the current format "
+                             f"(rebuild it with `python destination_catalog.py build`)")
+        position = len(MAGIC)
+        self._count, cities_length = struct.unpack_from("<II", data, position)
+        position += 8
+        self._cities = (position, cities_length)
+        self._positions_start = position + cities_length
+        self._index_start = self._positions_start + 4 * self._count
+        last = self._entry(self._count - 1) if self._count else None
+        self._payload_start = last[2] + 8 if last else self._index_start
+
+    def _entry(self, i):
+        """(key, payload offset, end of key) of the i-th index entry in key order"""
+        (position,) = struct.unpack_from("<I", self._data, self._positions_start + 4 * i)
+        position += self._index_start
+        (key_length,) = struct.unpack_from("<H", self._data, position)
+        key_end = position + 2 + key_length
+        return self._data[position + 2:key_end], position, key_end
+
+    def _lower_bound(self, key):
+        """Index of the first entry whose key is not less than key"""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _with_prefix(self, prefix):
+        """Yield (key, end of key) of every entry whose key starts with prefix"""
+        for i in range(self._lower_bound(prefix), self._count):
+            key, _, key_end = self._entry(i)
+            if not key.startswith(prefix):
+                return
+            yield key, key_end
+
+    def __contains__(self, destination):
+        prefix = f"{normalize_city(destination)}{KEY_SEPARATOR}".encode("utf-8")
+        return self._data is not None and next(self._with_prefix(prefix), None) is not None
+
+    def cities(self):
+        """Return the normalized key of every destination (and alias) in the catalog"""
+        if self._data is None:
+            return []
+        start, length = self._cities
+        return self._data[start:start + length].decode("utf-8").split("\n") if length else []
+
+    def get(self, destination, category, fallback=False):
+        """Return the items stored for a destination and category, or None.
+
+        With fallback=True the catalog-wide defaults are used when the
+        destination has no entry for this category.
+        """
+        items = self._read(normalize_city(destination), category)
+        if items is None and fallback:
+            items = self._read(DEFAULT_CITY, category)
+        return items
+
+    def _locate(self, city, category):
+        location = self._located.get((city, category), False)
+        if location is not False:
+            return location
+        location = None
+        if self._data is not None:
+            key = f"{city}{KEY_SEPARATOR}{category}".encode("utf-8")
+            i = self._lower_bound(key)
+            if i < self._count:
+                found, _, key_end = self._entry(i)
+                if found == key:
+                    location = struct.unpack_from("<II", self._data, key_end)
+        if len(self._located) >= MAX_LOCATED:
+            self._located.clear()
+        self._located[(city, category)] = location
+        return location
+
+    def _read(self, city, category):
+        location = self._locate(city, category)
+        if location is None:
+            return None
+        offset, length = location
+        start = self._payload_start + offset
+        return self._data[start:start + length].decode("utf-8").split("\n")
+
+    def get_values(self, destination, category, fallback=True):
+        """Return a numeric table (budget multipliers, daily costs) as a dict"""
+        items = self.get(destination, category, fallback=fallback) or []
+        values = {}
+        for item in items:
+            key, value = item.rsplit(" ", 1)
+            values[key] = float(value)
+        return values
+
+    def activities(self, destination, time_of_day):
+        """Return {preference: [activities]} for one time of day"""
+        activities = {}
+        if self._data is None:
+            return activities
+        for city in (DEFAULT_CITY, normalize_city(destination)):
+            prefix = f"{city}{KEY_SEPARATOR}{time_of_day}:".encode("utf-8")
+            for key, key_end in self._with_prefix(prefix):
+                offset, length = struct.unpack_from("<II", self._data, key_end)
+                start = self._payload_start + offset
+                activities[key[len(prefix):].decode("utf-8")] = self._data[start:start + length].decode("utf-8").split("\n")
+        return activities
+
+
+_catalog = None
+
+
+def get_catalog():
+    """Return the process-wide catalog, mapping it on first use"""
+    global _catalog
+    if _catalog is None:
+        _catalog = DestinationCatalog()
+    return _catalog
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        cities, entries = build_catalog()
+        print(f"Built {CATALOG_PATH}: {cities} destinations, {entries} index entries")
+    else:
+        print("Usage: python destination_catalog.py build")
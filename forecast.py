@@ -0,0 +1,86 @@
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+# OpenWeather's 5-day/3-hour forecast is recomputed every three hours
+FORECAST_CYCLE = 3 * 3600
+# Allowance after a cycle boundary before the new run is served upstream
+FORECAST_READY_DELAY = 15 * 60
+# Days ahead the forecast covers
+FORECAST_DAYS = 5
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+          "august", "september", "october", "november", "december"]
+
+# Precipitation chance (percent) worth mentioning in a day's summary
+RAIN_MENTION_CHANCE = 30
+
+
+def forecast_cycle(now=None):
+    """Number of the forecast run currently served; cache entries keyed by it expire with the run"""
+    now = time.time() if now is None else now
+    return int((now - FORECAST_READY_DELAY) // FORECAST_CYCLE)
+
+
+def next_cycle_at(now=None):
+    """Unix time the next forecast run is expected to be served"""
+    return (forecast_cycle(now) + 1) * FORECAST_CYCLE + FORECAST_READY_DELAY
+
+
+def forecast_key(travel_date, today=None, now=None):
+    """Start date and forecast run a trip's Forecast lines come from, or "" when it starts beyond the forecast"""
+    today = today or date.today()
+    start = trip_start(travel_date, today)
+    if start is None or (start - today).days >= FORECAST_DAYS:
+        return ""
+    return f"{start.isoformat()}@{forecast_cycle(now)}"
+
+
+def summarize_days(data):
+    """Turn a 5-day/3-hour forecast response into {ISO date: summary}, in the city's local time"""
+    offset = timedelta(seconds=data.get("city", {}).get("timezone", 0))
+    slots = {}
+    for entry in data.get("list", []):
+        local_time = datetime.fromtimestamp(entry["dt"], timezone.utc) + offset
+        slots.setdefault(local_time.date().isoformat(), []).append((local_time.hour, entry))
+
+    days = {}
+    for day, entries in slots.items():
+        temperatures = [entry["main"]["temp"] for _, entry in entries]
+        # Describe the day by its daytime conditions when the forecast covers them
+        daytime = [entry for hour, entry in entries if 9 <= hour <= 18] or [entry for _, entry in entries]
+        descriptions = Counter(entry["weather"][0]["description"] for entry in daytime)
+        days[day] = {
+            "description": descriptions.most_common(1)[0][0].capitalize(),
+            "min": round(min(temperatures)),
+            "max": round(max(temperatures)),
+            "rain_chance": round(max(entry.get("pop", 0) for _, entry in entries) * 100),
+            "rain_mm": round(sum(entry.get("rain", {}).get("3h", 0) for _, entry in entries), 1),
+        }
+    return days
+
+
+def format_day(summary):
+    """One line describing a day's forecast"""
+    line = f"{summary['description']}, {summary['min']}–{summary['max']}°C"
+    if summary["rain_chance"] >= RAIN_MENTION_CHANCE:
+        line += f", {summary['rain_chance']}% chance of rain"
+    return line
+
+
+def trip_start(travel_date, today=None):
+    """First day of a trip from an ISO date or a month name, or None when it's outside forecast range.
+
+    A trip without a date, or in the current month, is taken to start today.
+    """
+    today = today or date.today()
+    travel_date = (travel_date or "").strip().lower()
+    if not travel_date:
+        return today
+    try:
+        return date.fromisoformat(travel_date[:10])
+    except ValueError:
+        pass
+    if travel_date in MONTHS and MONTHS.index(travel_date) + 1 == today.month:
+        return today
+    return None
@@ -0,0 +1,245 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+
+from destination_catalog import normalize_city
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.json")
+
+# Words the destination extraction drags in around a place name
+# ("Tokyo Is A Great Choice For", "in Paris Here Are Some Top Attractions")
+FILLER_WORDS = {
+    "a", "an", "and", "are", "attractions", "choice", "for", "great", "here", "i", "in", "is",
+    "recommend", "some", "the", "to", "top", "trip", "visit", "city", "my", "of"
+}
+
+# Names that are also ordinary words or initials only count when nothing
+# but filler (or the place's own country) surrounds them
+AMBIGUOUS_NAMES = {"nice", "la", "sf", "dc", "kl", "rio", "goa", "nara", "lima"}
+
+# Trigram similarity a fuzzy match needs to be accepted; short names share
+# trigrams with many ordinary words ("ball" and Bali), so they need more
+FUZZY_THRESHOLD = 0.6
+SHORT_NAME_THRESHOLD = 0.7
+SHORT_NAME_LENGTH = 5
+# Shortest word (or phrase) that is matched fuzzily at all
+FUZZY_MIN_LENGTH = 5
+
+# Cities beat regions beat countries when one message names several
+KIND_RANK = {"city": 0, "region": 1, "country": 2}
+
+
+class Place:
+    """A canonical place: stable ID, display name, country and coordinates"""
+
+    __slots__ = ("id", "name", "kind", "country", "country_code", "lat", "lon")
+
+    def __init__(self, id, name, kind, country, country_code, lat, lon):
+        self.id = id
+        self.name = name
+        self.kind = kind
+        self.country = country
+        self.country_code = country_code
+        self.lat = lat
+        self.lon = lon
+
+    @property
+    def label(self):
+        """Name with the country, as used in search queries ("Tokyo, Japan")"""
+        return self.name if self.kind == "country" else f"{self.name}, {self.country}"
+
+    def __repr__(self):
+        return f"Place({self.id!r}, {self.name!r})"
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def clean_name(raw):
+    """Strip filler words from an extracted destination ("In Paris For" -> "Paris")"""
+    words = []
+    for word in normalize_city(raw).split():
+        if word not in FILLER_WORDS and word not in words:
+            words.append(word)
+    return " ".join(words).title()
+
+
+class Gazetteer:
+    """Offline index of cities, regions and countries with exact and trigram lookup"""
+
+    max_name_words = 4
+
+    def __init__(self, path=GAZETTEER_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        self.places = {}
+        self.names = {}  # normalized name or alias -> [places]
+        self.country_names = {}  # country code -> set of normalized names
+        for code, (name, lat, lon, aliases) in data["countries"].items():
+            place = Place(code.lower(), name, "country", name, code, lat, lon)
+            self._add(place, [name] + aliases)
+            self.country_names[code] = {normalize_city(alias) for alias in [name] + aliases}
+        for name, kind, code, lat, lon, aliases in data["places"]:
+            country = data["countries"][code][0]
+            place_id = f"{code.lower()}/{normalize_city(name).replace(' ', '-')}"
+            self._add(Place(place_id, name, kind, country, code, lat, lon), [name] + aliases)
+
+        # Trigram postings over every name, for misspelled destinations
+        self.name_trigrams = {name: _trigrams(name) for name in self.names}
+        self.postings = {}
+        for name, trigrams in self.name_trigrams.items():
+            for trigram in trigrams:
+                self.postings.setdefault(trigram, []).append(name)
+
+    def _add(self, place, names):
+        self.places[place.id] = place
+        for name in names:
+            places = self.names.setdefault(normalize_city(name), [])
+            if place not in places:
+                places.append(place)
+
+    def resolve(self, raw):
+        """Resolve a raw destination string to a Place, or None when nothing matches"""
+        words = normalize_city(raw).split()
+        if not words:
+            return None
+        return self._exact(words) or self._fuzzy(words)
+
+    def _exact(self, words):
+        # Every run of up to max_name_words words that is a known name
+        best = None
+        for start in range(len(words)):
+            for end in range(min(len(words), start + self.max_name_words), start, -1):
+                name = " ".join(words[start:end])
+                for place in self.names.get(name, ()):
+                    if name in AMBIGUOUS_NAMES and not self._stands_alone(words, start, end, place):
+                        continue
+                    rank = (KIND_RANK[place.kind], -(end - start), start)
+                    if best is None or rank < best[0]:
+                        best = (rank, place)
+        return best[1] if best else None
+
+    def _stands_alone(self, words, start, end, place):
+        rest = " ".join(word for word in words[:start] + words[end:] if word not in FILLER_WORDS)
+        return not rest or rest in self.country_names.get(place.country_code, ())
+
+    def _fuzzy(self, words):
+        words = [word for word in words if word not in FILLER_WORDS]
+        queries = [" ".join(words)] + [word for word in words if len(word) >= FUZZY_MIN_LENGTH]
+        best_score, best_name = 0.0, None
+        for query in queries:
+            if len(query) < FUZZY_MIN_LENGTH:
+                continue
+            trigrams = _trigrams(query)
+            shared = Counter()
+            for trigram in trigrams:
+                for name in self.postings.get(trigram, ()):
+                    shared[name] += 1
+            for name, count in shared.items():
+                if name in AMBIGUOUS_NAMES:
+                    continue
+                score = 2 * count / (len(trigrams) + len(self.name_trigrams[name]))
+                threshold = SHORT_NAME_THRESHOLD if len(name) <= SHORT_NAME_LENGTH else FUZZY_THRESHOLD
+                if score >= threshold and score > best_score:
+                    best_score, best_name = score, name
+        if best_name is None:
+            return None
+        return min(self.names[best_name], key=lambda place: KIND_RANK[place.kind])
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Return the process-wide gazetteer, loading it on first use"""
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer()
+        return _gazetteer
+
+
+@lru_cache(maxsize=4096)
+def resolve_place(raw):
+    """Resolve a raw destination string with the shared gazetteer"""
+    return get_gazetteer().resolve(raw or "")
+
+
+def canonical_name(raw):
+    """Canonical display name for a destination, or its cleaned-up text when it is unknown"""
+    place = resolve_place(raw)
+    return place.name if place else clean_name(raw)
+
+
+def place_key(raw):
+    """Cache key for a destination: its place ID, or its cleaned text when it is unknown"""
+    place = resolve_place(raw)
+    return place.id if place else f"text:{normalize_city(clean_name(raw))}"
+
+
+# Raw destinations as extraction produces them, and the place they must resolve to
+RESOLUTION_CORPUS = [
+    ("Tokyo", "jp/tokyo"),
+    ("Tokyo Is A Great Choice For", "jp/tokyo"),
+    ("In Paris Here Are Some Top Attractions", "fr/paris"),
+    ("paris, france", "fr/paris"),
+    ("New York City", "us/new-york"),
+    ("nyc for", "us/new-york"),
+    ("Kyoto Japan", "jp/kyoto"),
+    ("Tokio", "jp/tokyo"),
+    ("Barcelonna", "es/barcelona"),
+    ("Amsterdamm", "nl/amsterdam"),
+    ("Japan", "jp"),
+    ("Nice", "fr/nice"),
+    ("Nice France", "fr/nice"),
+    ("Somewhere Nice", None),
+    ("Ho Chi Minh", "vn/ho-chi-minh-city"),
+    ("Zürich", "ch/zurich"),
+    ("Bali For A Week", "id/bali"),
+    ("Pariss", "fr/paris"),
+    ("Romee", "it/rome"),
+    ("Berln", "de/berlin"),
+    ("Atlantis", None),
+    # Ordinary words that share trigrams with short names must not resolve
+    ("A Ball Game", None),
+    ("My Home Town", None),
+    ("A Long Walk", None),
+    ("The Best Beach", None),
+    ("Some Good Food", None),
+    ("Hiking Trails", None),
+    ("Rom", None),
+]
+
+
+if __name__ == "__main__":
+    gazetteer = get_gazetteer()
+    failures = 0
+    for raw, expected in RESOLUTION_CORPUS:
+        place = gazetteer.resolve(raw)
+        if (place.id if place else None) != expected:
+            failures += 1
+            print(f"MISRESOLVED {raw!r}: got {place!r}, expected {expected!r}")
+    print(f"{len(RESOLUTION_CORPUS) - failures}/{len(RESOLUTION_CORPUS)} destinations resolved as expected")
+
+    raws = [raw for raw, _ in RESOLUTION_CORPUS]
+    rounds = 500
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for raw in raws:
+            gazetteer.resolve(raw)
+    elapsed = time.perf_counter() - start
+    print(f"Uncached resolution: {elapsed / (rounds * len(raws)) * 1e6:.1f} µs per destination")
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for raw in raws:
+            resolve_place(raw)
+    elapsed = time.perf_counter() - start
+    print(f"Cached resolution: {elapsed / (rounds * len(raws)) * 1e6:.2f} µs per destination")
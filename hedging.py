@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from deadline import submit as submit_with_deadline
+from metrics import metrics
+
+# Hedging sends extra requests to third-party sites, so it is opt-in
+ENABLE_HEDGING = os.getenv("ENABLE_HEDGING", "false").lower() == "true"
+
+# At most this share of calls in a host class may send a hedge
+HEDGE_MAX_RATE = float(os.getenv("HEDGE_MAX_RATE", "0.1"))
+
+
+class LatencyTracker:
+    """Recent latencies for one host class and the hedge delay they imply"""
+
+    def __init__(self, percentile=0.9, min_samples=20, max_samples=200, rate_window=60):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.samples = deque(maxlen=max_samples)
+        self.rate_window = rate_window
+        self.window_started = time.monotonic()
+        self.window_calls = 0
+        self.window_hedges = 0
+        self.calls = self.hedged = self.hedge_wins = self.primary_wins = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging (the running p90), or None until there are enough samples"""
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+
+    def count_call(self):
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            if now - self.window_started > self.rate_window:
+                self.window_started, self.window_calls, self.window_hedges = now, 0, 0
+            self.window_calls += 1
+
+    def allow_hedge(self, max_rate):
+        with self._lock:
+            if self.window_hedges >= max_rate * self.window_calls:
+                return False
+            self.window_hedges += 1
+            self.hedged += 1
+            return True
+
+    def count_win(self, hedge):
+        with self._lock:
+            if hedge:
+                self.hedge_wins += 1
+            else:
+                self.primary_wins += 1
+
+    def status(self):
+        delay = self.hedge_delay()
+        with self._lock:
+            return {
+                "p90_seconds": round(delay, 3) if delay is not None else None,
+                "samples": len(self.samples),
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "primary_wins": self.primary_wins
+            }
+
+
+class Hedger:
+    """Race a slow call against a duplicate (or an alternative) once it passes its class's p90.
+
+    Latencies are tracked per host class ("openweather", "search_page"). A
+    call that hasn't answered by the class's running p90 gets a hedge, unless
+    more than `max_rate` of the class's recent calls were already hedged; the
+    first successful answer wins.
+    """
+
+    def __init__(self, enabled=ENABLE_HEDGING, max_rate=HEDGE_MAX_RATE, max_workers=16):
+        self.enabled = enabled
+        self.max_rate = max_rate
+        self.trackers = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def tracker(self, host_class):
+        with self._lock:
+            if host_class not in self.trackers:
+                self.trackers[host_class] = LatencyTracker()
+            return self.trackers[host_class]
+
+    def call(self, host_class, primary, backup=None):
+        """Return primary(), hedged with backup() (or a second primary()) when it is slow"""
+        if not self.enabled:
+            return primary()
+
+        tracker = self.tracker(host_class)
+        tracker.count_call()
+        started = time.monotonic()
+        first = submit_with_deadline(self._executor, primary)
+        # The primary's own latency feeds the p90, whether or not it wins
+        first.add_done_callback(lambda future: future.exception() is None and tracker.record(time.monotonic() - started))
+
+        delay = tracker.hedge_delay()
+        if delay is None or first in wait([first], timeout=delay).done or not tracker.allow_hedge(self.max_rate):
+            return first.result()
+
+        second = submit_with_deadline(self._executor, backup or primary)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    tracker.count_win(hedge=future is second)
+                    metrics.increment(f"hedging.{host_class}.{'hedge' if future is second else 'primary'}_wins")
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def status(self):
+        with self._lock:
+            trackers = dict(self.trackers)
+        return {"enabled": self.enabled, "max_rate": self.max_rate, **{name: tracker.status() for name, tracker in trackers.items()}}
+
+
+hedger = Hedger()
+metrics.register("hedging", hedger.status)
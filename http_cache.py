@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import json
+import time
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is used when brotli isn't installed
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; the headers would eat the gain
+COMPRESSION_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def request_key(namespace, params):
+    """Content address for a request: a hash of its normalized parameters"""
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return f"{namespace}_{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+
+class EncodedBody:
+    """A response body with its strong ETag and precompressed variants.
+
+    Bodies are compressed once when they are built, so repeated requests for
+    the same content only cost a dictionary lookup.
+    """
+
+    def __init__(self, body, media_type="application/json", min_size=COMPRESSION_MIN_SIZE, headers=None):
+        self.body = body
+        self.media_type = media_type
+        self.headers = headers or {}  # Extra headers sent with every representation
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.variants = {}  # content coding -> compressed body
+        if len(body) >= min_size:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            if brotli is not None:
+                self.variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+
+    def negotiate(self, accept_encoding):
+        """Return (content coding or None, body, ETag header) for an Accept-Encoding header"""
+        accepted = parse_accept_encoding(accept_encoding)
+        for coding in ("br", "gzip"):
+            if coding in self.variants and coding in accepted:
+                # Each representation needs its own strong validator
+                return coding, self.variants[coding], f'"{self.etag}-{coding}"'
+        return None, self.body, f'"{self.etag}"'
+
+    def matches(self, if_none_match):
+        """True when an If-None-Match header names any representation of this body"""
+        if not if_none_match:
+            return False
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            tag = tag[2:] if tag.startswith("W/") else tag
+            if tag.strip('"').split("-", 1)[0] == self.etag:
+                return True
+        return False
+
+
+def parse_accept_encoding(header):
+    """Return the content codings a client accepts (q=0 means refused)"""
+    accepted = set()
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+if __name__ == "__main__":
+    from day_planner import get_day_planner
+    from destination_catalog import get_catalog
+
+    # A long itinerary shaped like the ones generate_recommendations builds
+    catalog = get_catalog()
+    itinerary = "# Your 14 days Itinerary for Tokyo\n\n## Day-by-Day Itinerary\n"
+    for day, activities in enumerate(get_day_planner().plan("Tokyo", 14, ["food", "culture", "technology"]), 1):
+        itinerary += f"\n### Day {day}\n"
+        for time_of_day, activity in activities.items():
+            itinerary += f"**{time_of_day.capitalize()}:**\n- {activity}\n\n"
+    itinerary += "\n### Key Attractions\n" + "\n".join(catalog.get("Tokyo", "attractions")) + "\n"
+    itinerary += "\n### Recommended Restaurants\n" + "\n".join(catalog.get("Tokyo", "restaurants")) + "\n"
+    body = json.dumps(itinerary).encode("utf-8")
+
+    rounds = 200
+    print(f"Identity: {len(body)} bytes")
+    start = time.perf_counter()
+    for _ in range(rounds):
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    elapsed = time.perf_counter() - start
+    print(f"gzip -{GZIP_LEVEL}: {len(compressed)} bytes ({len(compressed) / len(body):.0%}), {elapsed / rounds * 1000:.3f} ms per response")
+    if brotli is not None:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+        elapsed = time.perf_counter() - start
+        print(f"brotli q{BROTLI_QUALITY}: {len(compressed)} bytes ({len(compressed) / len(body):.0%}), {elapsed / rounds * 1000:.3f} ms per response")
+    else:
+        print("brotli not installed, skipped")
+
+    encoded = EncodedBody(body)
+    start = time.perf_counter()
+    for _ in range(rounds * 50):
+        encoded.negotiate("gzip, deflate, br")
+    elapsed = time.perf_counter() - start
+    print(f"Precompressed repeat request: {elapsed / (rounds * 50) * 1e6:.1f} µs per response")
+
+    start = time.perf_counter()
+    for _ in range(rounds * 50):
+        encoded.matches(f'"{encoded.etag}-gzip"')
+    elapsed = time.perf_counter() - start
+    print(f"Conditional request (304, 0 body bytes): {elapsed / (rounds * 50) * 1e6:.1f} µs per response")
@@ -0,0 +1,191 @@
+import re
+
+# Intents in priority order: (intent, keywords, required slot). The first
+# intent with a keyword in the message wins; an intent with a required slot
+# only wins when that slot was filled as well. Keywords match anywhere in the
+# lowercased message, exactly like the `keyword in text` checks they replace.
+INTENTS = [
+    ("beach", ("beach", "beaches"), None),
+    ("interests", ("love", "interested in", "like", "enjoy", "want to"), "interests"),
+    ("weather", ("weather", "temperature", "climate", "rain", "sunny", "forecast", "whats weather", "what's weather",
+                 "whats the weather", "what's the weather", "weather in", "weather there"), None),
+    ("hotel", ("hotel", "stay", "accommodation", "lodging", "place to sleep"), None),
+    ("restaurant", ("restaurant", "food", "eat", "dining", "cuisine", "meal"), None),
+    ("attraction", ("attraction", "visit", "see", "museum", "landmark", "sight"), None),
+    ("itinerary", ("itinerary", "plan", "schedule", "day by day", "what to do"), None),
+    ("transport", ("transport", "getting around", "travel within", "public transit", "bus", "train", "subway", "metro"), None),
+    ("safety", ("safe", "safety", "dangerous", "crime", "secure"), None),
+    ("currency", ("currency", "money", "cash", "exchange", "payment", "credit card"), None),
+    ("language", ("language", "speak", "talk", "communicate", "phrase", "translation"), None),
+    ("accessibility", ("wheelchair", "accessible", "disability", "mobility", "handicap"), None),
+    ("special_interest", (), "special_interest"),
+    ("vague", ("where should i go", "recommend a place", "good place to visit", "somewhere nice", "vacation ideas"), None),
+]
+
+# Slots: ordered (value, keywords) tables. Every matching value is collected,
+# in table order.
+SLOTS = {
+    "interests": [
+        ("food", ("food", "restaurant")),
+        ("technology", ("technology", "tech")),
+        ("art", ("art", "museum")),
+        ("culture", ("culture", "cultural")),
+        ("shopping", ("shopping",)),
+        ("nature", ("nature", "outdoor")),
+        ("beach", ("beach",)),
+    ],
+    "special_interest": [
+        ("broadway", ("broadway", "theater", "theatre", "show", "musical", "play")),
+        ("wine", ("wine", "vineyard", "winery", "wine tasting")),
+        ("photography", ("photography", "photo", "camera", "picture")),
+        ("architecture", ("architecture", "building", "design", "structure")),
+        ("literature", ("literature", "book", "author", "literary", "bookstore")),
+        ("music", ("music", "concert", "festival", "live music", "band")),
+        ("sports", ("sports", "game", "match", "stadium", "arena")),
+    ],
+}
+
+# Keyword groups that only the conversational follow-ups look at
+FLAGS = {
+    "greeting": ("hi", "hello"),
+    "destination_given": ("visit", "travel to", "going to"),
+    "day": ("day",),
+    "followup_transport": ("transport", "getting around"),
+    "followup_safety": ("safety", "safe"),
+    "followup_weather": ("weather", "climate"),
+    "followup_currency": ("currency", "money"),
+    "followup_language": ("language", "speak"),
+    "followup_budget": ("budget", "cost", "expensive"),
+    "accessibility_mention": ("wheelchair", "accessible", "disability"),
+    "dietary": ("vegetarian", "vegan", "gluten-free", "food allergy", "dietary"),
+    "more": ("more", "tell me more", "what else", "other", "another"),
+}
+
+
+class Route:
+    """Result of routing one message: the winning intent, its slots and every intent and flag seen"""
+
+    __slots__ = ("intent", "slots", "matched", "flags")
+
+    def __init__(self, intent, slots, matched, flags):
+        self.intent = intent
+        self.slots = slots
+        self.matched = matched
+        self.flags = flags
+
+    def has(self, flag):
+        return flag in self.flags
+
+    def mentions(self, intent):
+        """True when the message has a keyword for intent, even if a higher-priority intent won"""
+        return intent in self.matched
+
+    def __repr__(self):
+        return f"Route({self.intent!r}, {self.slots!r})"
+
+
+def _trie_pattern(keywords):
+    """Build a regex matching the longest keyword at a position, factored as a trie"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        terminal = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Optional (greedy) continuation when a keyword can also end here
+        return f"(?:{body})?" if terminal else body
+
+    return build(trie)
+
+
+def _bits(mask, values):
+    """Return the values whose bit is set in mask, in table order"""
+    selected = []
+    while mask:
+        lowest = mask & -mask
+        selected.append(values[lowest.bit_length() - 1])
+        mask ^= lowest
+    return selected
+
+
+class IntentRouter:
+    """Compile the intent, slot and flag tables into a single-pass matcher.
+
+    Every keyword is compiled to one bitmask over intents, slot values and
+    flags, so routing a message is a regex scan plus a few integer ORs.
+    """
+
+    def __init__(self, intents=INTENTS, slots=SLOTS, flags=FLAGS):
+        self.intent_names = [intent for intent, _, _ in intents]
+        self.required_slots = [required_slot for _, _, required_slot in intents]
+        self.flag_names = list(flags)
+
+        # One bit per intent, then per slot value, then per flag
+        self.slot_values = []
+        offset = len(intents)
+        for name, table in slots.items():
+            self.slot_values.append((name, offset, [value for value, _ in table]))
+            offset += len(table)
+        self.flag_offset = offset
+        self.intent_mask = (1 << len(intents)) - 1
+
+        masks = {}
+        for bit, (_, keywords, _) in enumerate(intents):
+            for keyword in keywords:
+                masks[keyword] = masks.get(keyword, 0) | 1 << bit
+        special_interest_bit = 1 << self.intent_names.index("special_interest")
+        for name, offset, _ in self.slot_values:
+            for index, (_, keywords) in enumerate(slots[name]):
+                for keyword in keywords:
+                    masks[keyword] = masks.get(keyword, 0) | 1 << (offset + index)
+                    if name == "special_interest":
+                        masks[keyword] |= special_interest_bit
+        for index, keywords in enumerate(flags.values()):
+            for keyword in keywords:
+                masks[keyword] = masks.get(keyword, 0) | 1 << (self.flag_offset + index)
+
+        # At each position the pattern reports the longest keyword starting
+        # there; every shorter keyword matching at that position is a prefix
+        # of it, so its bits are folded in to keep substring semantics.
+        self.masks = {}
+        for keyword in masks:
+            mask = 0
+            for other, other_mask in masks.items():
+                if keyword.startswith(other):
+                    mask |= other_mask
+            self.masks[keyword] = mask
+        self.pattern = re.compile(f"(?=({_trie_pattern(masks)}))")
+
+    def route(self, text):
+        """Route a lowercased message to (intent, slots) in one scan"""
+        mask = 0
+        masks = self.masks
+        for keyword in self.pattern.findall(text):
+            mask |= masks[keyword]
+
+        slots = {
+            name: _bits(mask >> offset & (1 << len(values)) - 1, values)
+            for name, offset, values in self.slot_values
+        }
+        flags = set(_bits(mask >> self.flag_offset, self.flag_names))
+        matched = _bits(mask & self.intent_mask, self.intent_names)
+        for intent in matched:
+            required_slot = self.required_slots[self.intent_names.index(intent)]
+            if required_slot is None or slots[required_slot]:
+                return Route(intent, slots, matched, flags)
+        return Route(None, slots, matched, flags)
+
+
+router = IntentRouter()
+
+
+def route_message(text):
+    """Route a lowercased message with the shared router"""
+    return router.route(text)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from forecast import forecast_key
+from gazetteer import place_key
+
+# Shared by the Streamlit app and every API worker on the node
+ITINERARY_DB_PATH = os.getenv("ITINERARY_DB_PATH", os.path.join(".cache", "itineraries.db"))
+
+# Stored itineraries include the weather at the time they were built, so
+# identical requests only reuse records younger than this (seconds)
+ITINERARY_REUSE_TTL = int(os.getenv("ITINERARY_REUSE_TTL", str(6 * 3600)))
+
+# Records older than this (seconds) can no longer be reopened by ID and are deleted,
+# as are the oldest beyond ITINERARY_MAX_RECORDS
+ITINERARY_MAX_AGE = int(os.getenv("ITINERARY_MAX_AGE", str(30 * 24 * 3600)))
+ITINERARY_MAX_RECORDS = int(os.getenv("ITINERARY_MAX_RECORDS", "100000"))
+# Seconds between prunes; writes in between skip it
+PRUNE_INTERVAL = 60
+
+
+def normalize_inputs(travel_info, forecast=""):
+    """Reduce travel info to the inputs an itinerary depends on, in a canonical form.
+
+    `forecast` is the forecast_key() of the Forecast lines the itinerary
+    shows, or "" when it shows none.
+    """
+    duration = str(travel_info.get("duration") or "")
+    days = duration.split()[0] if duration.split() else ""
+    preferences = travel_info.get("preferences") or []
+    if isinstance(preferences, str):
+        preferences = preferences.split(",")
+    return {
+        "destination": place_key(travel_info.get("destination", "")),
+        "days": int(days) if days.isdigit() else duration.lower(),
+        "budget": (travel_info.get("budget") or "moderate").lower(),
+        # Order matters: the first preference drives the attraction search
+        "preferences": [preference.strip().lower() for preference in preferences if preference.strip()],
+        # The day-by-day forecast depends on when the trip starts
+        "travel_date": (travel_info.get("travel_date") or "").strip().lower(),
+        # Itineraries with Forecast lines are only reused on the same start date and
+        # while the same forecast run is served
+        "forecast": forecast
+    }
+
+
+def inputs_hash(inputs):
+    canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ItineraryStore:
+    """Immutable itinerary records in a local SQLite file.
+
+    A record's ID is derived from the hash of its normalized inputs and its
+    creation time, so a record never changes once written; rebuilding an
+    itinerary for the same inputs adds a new record with a new ID. Records
+    older than max_age, and the oldest beyond max_records, are deleted.
+    """
+
+    def __init__(self, path=ITINERARY_DB_PATH, reuse_ttl=ITINERARY_REUSE_TTL,
+                 max_age=ITINERARY_MAX_AGE, max_records=ITINERARY_MAX_RECORDS):
+        self.path = path
+        self.reuse_ttl = reuse_ttl
+        self.max_age = max_age
+        self.max_records = max_records
+        self._pruned_at = 0.0
+        self._prune_lock = threading.Lock()
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS itineraries ("
+                "id TEXT PRIMARY KEY, inputs_hash TEXT NOT NULL, inputs TEXT NOT NULL, "
+                "itinerary BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS itineraries_inputs ON itineraries (inputs_hash, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS itineraries_created_at ON itineraries (created_at)")
+        self.prune()
+
+    def _connect(self):
+        # One connection per thread; WAL lets readers and a writer work concurrently
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _record(row):
+        record_id, inputs, itinerary, created_at = row
+        return {
+            "id": record_id,
+            "inputs": json.loads(inputs),
+            "itinerary": zlib.decompress(itinerary).decode("utf-8"),
+            "created_at": created_at
+        }
+
+    def get(self, itinerary_id):
+        """Return the record with this ID, or None"""
+        row = self._connect().execute(
+            "SELECT id, inputs, itinerary, created_at FROM itineraries WHERE id = ?", (itinerary_id,)
+        ).fetchone()
+        return self._record(row) if row else None
+
+    def find(self, travel_info):
+        """Return the newest reusable record for these travel details, or None.
+
+        Records without Forecast lines match on the travel details alone;
+        records with them also need the current start date and forecast run.
+        """
+        hashes = [inputs_hash(normalize_inputs(travel_info))]
+        forecast = forecast_key(travel_info.get("travel_date"))
+        if forecast:
+            hashes.append(inputs_hash(normalize_inputs(travel_info, forecast)))
+        row = self._connect().execute(
+            "SELECT id, inputs, itinerary, created_at FROM itineraries "
+            f"WHERE inputs_hash IN ({', '.join('?' * len(hashes))}) AND created_at > ? ORDER BY created_at DESC LIMIT 1",
+            (*hashes, time.time() - self.reuse_ttl)
+        ).fetchone()
+        return self._record(row) if row else None
+
+    def save(self, travel_info, itinerary, forecast=""):
+        """Store a newly built itinerary and return its ID; `forecast` keys any Forecast lines it shows"""
+        inputs = normalize_inputs(travel_info, forecast)
+        digest = inputs_hash(inputs)
+        created_at = time.time()
+        itinerary_id = f"{digest[:20]}{int(created_at * 1000):x}"
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO itineraries (id, inputs_hash, inputs, itinerary, created_at) VALUES (?, ?, ?, ?, ?)",
+                (itinerary_id, digest, json.dumps(inputs), zlib.compress(itinerary.encode("utf-8")), created_at)
+            )
+        if time.time() - self._pruned_at >= PRUNE_INTERVAL:
+            self.prune()
+        return itinerary_id
+
+    def prune(self):
+        """Delete records past max_age, then the oldest beyond max_records"""
+        with self._prune_lock:
+            self._pruned_at = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM itineraries WHERE created_at < ?", (time.time() - self.max_age,))
+            conn.execute(
+                "DELETE FROM itineraries WHERE id IN ("
+                "SELECT id FROM itineraries ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_records,)
+            )
+
+
+_itinerary_store = None
+_itinerary_store_lock = threading.Lock()
+
+
+def get_itinerary_store():
+    """Return the process-wide itinerary store"""
+    global _itinerary_store
+    with _itinerary_store_lock:
+        if _itinerary_store is None:
+            _itinerary_store = ItineraryStore()
+        return _itinerary_store
@@ -0,0 +1,318 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+from deadline import deadline
+from metrics import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFull(RuntimeError):
+    """Raised when a job is submitted while the queue already holds its maximum"""
+
+
+def new_job(kind, payload, callback_url=None, owner=None):
+    now = time.time()
+    return {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "owner": owner,  # ID of the worker process that runs the job
+        "status": QUEUED,
+        "payload": payload,
+        "callback_url": callback_url,
+        "attempts": 0,
+        "sections": {},  # Parts of the result that are already available, by name
+        "result": None,
+        "error": None,
+        "partial": False,
+        "created_at": now,
+        "updated_at": now,
+        "finished_at": None,
+    }
+
+
+def process_alive(pid):
+    """Whether a process with this ID is running on this node"""
+    if not pid:
+        return False
+    if os.name == "nt":
+        # os.kill would terminate it; assume it is running
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MemoryJobStore:
+    """Jobs held in this process"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def save(self, job):
+        with self._lock:
+            self._jobs[job["id"]] = json.loads(json.dumps(job))
+
+    def take_over(self, abandoned, owner):
+        """Give every unfinished job for which abandoned(job) is true to owner, and return them"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if not job["finished_at"] and abandoned(job)]
+            for job in jobs:
+                job["owner"] = owner
+            return json.loads(json.dumps(jobs))
+
+    def purge(self, finished_before):
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job["finished_at"] and job["finished_at"] < finished_before]:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Jobs in a local SQLite file, so any worker process on the node can report on them"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, data TEXT NOT NULL, finished_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+
+    def _connect(self):
+        # One connection per thread; WAL lets readers and a writer work concurrently
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, job):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, data, finished_at) VALUES (?, ?, ?)",
+                (job["id"], json.dumps(job, separators=(",", ":")), job["finished_at"])
+            )
+
+    def take_over(self, abandoned, owner):
+        """Give every unfinished job for which abandoned(job) is true to owner, and return them"""
+        conn = self._connect()
+        with conn:
+            # Taken under the write lock, so two processes starting together can't both take a job
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT data FROM jobs WHERE finished_at IS NULL").fetchall()
+            jobs = [job for job in (json.loads(row[0]) for row in rows) if abandoned(job)]
+            for job in jobs:
+                job["owner"] = owner
+                conn.execute("UPDATE jobs SET data = ? WHERE id = ?",
+                             (json.dumps(job, separators=(",", ":")), job["id"]))
+        return jobs
+
+    def purge(self, finished_before):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (finished_before,))
+
+
+def create_job_store(backend="memory", path=os.path.join(".cache", "jobs.db")):
+    """Create the job store selected in the settings"""
+    if backend == "sqlite":
+        return SQLiteJobStore(path)
+    return MemoryJobStore()
+
+
+class JobQueue:
+    """Run long jobs on a bounded worker pool and keep their status for polling.
+
+    Handlers are registered per job kind and called as
+    handler(payload, progress), where progress(name, value) publishes one
+    finished section of the result while the rest is still running. A
+    failed job is retried up to max_retries times with exponential
+    backoff; finished jobs are kept for result_ttl seconds. When a job has
+    a callback URL, its final status is POSTed there; callback hosts must
+    be in callback_hosts.
+
+    Jobs left queued or running by a worker process that has since exited
+    (a restart, or a crash) are taken over when the handler for their kind
+    is registered: retried when they have attempts left, failed otherwise.
+    """
+
+    def __init__(self, store, max_workers=4, max_queued=1000, max_retries=2,
+                 retry_delay=2.0, result_ttl=3600, timeout=120.0, callback_hosts=()):
+        self.store = store
+        self.owner = os.getpid()
+        self.callback_hosts = {host.lower() for host in callback_hosts}
+        self.max_queued = max_queued
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.result_ttl = result_ttl
+        self.timeout = timeout
+        self._handlers = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._pending = 0  # Jobs of this process that are queued, running or waiting to retry
+        self._lock = threading.Lock()
+        metrics.register("jobs", self.status)
+
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+        self._recover(kind)
+
+    def submit(self, kind, payload, callback_url=None):
+        """Queue a job and return it; raises QueueFull when too many jobs are pending"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if callback_url:
+            parts = urlsplit(callback_url)
+            if parts.scheme not in ("http", "https"):
+                raise ValueError("The callback URL must be an http(s) URL")
+            if (parts.hostname or "") not in self.callback_hosts:
+                raise ValueError(f"Callbacks to {parts.hostname} are not allowed")
+        with self._lock:
+            if self._pending >= self.max_queued:
+                raise QueueFull(f"{self._pending} jobs are already pending")
+            self._pending += 1
+
+        self.store.purge(time.time() - self.result_ttl)
+        job = new_job(kind, payload, callback_url, self.owner)
+        self.store.save(job)
+        metrics.increment("jobs.submitted")
+        self._executor.submit(self._run, job["id"])
+        return job
+
+    def get(self, job_id):
+        """Return a job, or None when it is unknown or its result has expired"""
+        job = self.store.get(job_id)
+        if job is None or (job["finished_at"] and time.time() - job["finished_at"] > self.result_ttl):
+            return None
+        return job
+
+    def status(self):
+        with self._lock:
+            return {"pending": self._pending, "max_queued": self.max_queued}
+
+    def _recover(self, kind):
+        def abandoned(job):
+            # Handlers are registered at startup, so jobs under this process's own ID are from an earlier one that reused it
+            return job["kind"] == kind and (job.get("owner") == self.owner or not process_alive(job.get("owner")))
+
+        for job in self.store.take_over(abandoned, self.owner):
+            if job["attempts"] <= self.max_retries:
+                print(f"Resuming job {job['id']} ({job['kind']}) left by a stopped worker")
+                job["status"] = QUEUED
+                job["updated_at"] = time.time()
+                self.store.save(job)
+                with self._lock:
+                    self._pending += 1
+                metrics.increment("jobs.resumed")
+                self._executor.submit(self._run, job["id"])
+                continue
+            job["status"] = FAILED
+            job["error"] = "The worker running this job stopped"
+            job["finished_at"] = job["updated_at"] = time.time()
+            self.store.save(job)
+            metrics.increment("jobs.failed")
+            if job["callback_url"]:
+                self._executor.submit(self._notify, job)
+
+    def _run(self, job_id):
+        retrying = False
+        try:
+            job = self.store.get(job_id)
+            if job is None:
+                return
+            job["status"] = RUNNING
+            job["attempts"] += 1
+            job["updated_at"] = time.time()
+            self.store.save(job)
+
+            def progress(name, value):
+                job["sections"][name] = value
+                job["updated_at"] = time.time()
+                self.store.save(job)
+
+            try:
+                # Each attempt gets the full time budget for the lookups it makes
+                with deadline(self.timeout) as job_deadline:
+                    job["result"] = self._handlers[job["kind"]](job["payload"], progress)
+                job["status"] = DONE
+                job["partial"] = job_deadline.partial
+                job["error"] = None
+                metrics.increment("jobs.done")
+            except Exception as e:
+                print(f"Job {job_id} ({job['kind']}) attempt {job['attempts']} failed: {str(e)}")
+                job["error"] = str(e)
+                if job["attempts"] <= self.max_retries:
+                    job["status"] = QUEUED
+                    job["updated_at"] = time.time()
+                    self.store.save(job)
+                    metrics.increment("jobs.retried")
+                    delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+                    threading.Timer(delay, self._executor.submit, (self._run, job_id)).start()
+                    retrying = True
+                    return
+                job["status"] = FAILED
+                metrics.increment("jobs.failed")
+
+            job["finished_at"] = job["updated_at"] = time.time()
+            self.store.save(job)
+            if job["callback_url"]:
+                self._notify(job)
+        except Exception as e:
+            print(f"Job {job_id} could not be run: {str(e)}")
+            metrics.increment("jobs.errors")
+        finally:
+            # A job waiting to be retried is still pending
+            if not retrying:
+                with self._lock:
+                    self._pending -= 1
+
+    def _notify(self, job):
+        try:
+            # Not redirected, so a callback can't be bounced to a host outside the allowlist
+            requests.post(job["callback_url"], json=job_view(job), timeout=10, allow_redirects=False)
+        except requests.RequestException as e:
+            print(f"Callback for job {job['id']} failed: {str(e)}")
+            metrics.increment("jobs.callback_failed")
+
+
+def job_view(job):
+    """The parts of a job reported to clients"""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "sections": job["sections"],
+        "result": job["result"],
+        "error": job["error"],
+        "partial": job["partial"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+    }
@@ -0,0 +1,37 @@
+import threading
+import time
+
+
+class MetricsRegistry:
+    """Process-wide counters plus collectors that report component state on demand"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._counters = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def register(self, name, collector):
+        """Report collector() under name in every snapshot"""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            collectors = dict(self._collectors)
+        snapshot = {"uptime": round(time.time() - self.started_at, 1), "counters": counters}
+        for name, collector in collectors.items():
+            try:
+                snapshot[name] = collector()
+            except Exception as e:
+                snapshot[name] = {"error": str(e)}
+        return snapshot
+
+
+# Shared by every component in this process
+metrics = MetricsRegistry()
@@ -0,0 +1,114 @@
+import hashlib
+import math
+import threading
+import time
+
+# (TTL in seconds, expected failures per TTL) for each kind of failure
+NEGATIVE_TTLS = {
+    "location": (900, 2000),   # Cities the weather API can't resolve
+    "query": (600, 5000),      # Searches that returned nothing usable
+    "url": (1800, 20000),      # Pages that timed out or didn't return 200
+}
+DEFAULT_NEGATIVE_TTL = (600, 5000)
+
+# Chance that a key which never failed is reported as failed (and skipped until its TTL)
+FALSE_POSITIVE_RATE = 0.001
+
+
+class BloomFilter:
+    """Fixed-size set membership with no false negatives and a tunable false positive rate"""
+
+    __slots__ = ("size", "hashes", "bits")
+
+    def __init__(self, capacity, error_rate=FALSE_POSITIVE_RATE):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: k positions from one 128-bit digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & 1 << (position & 7) for position in self._positions(key))
+
+
+class NegativeCache:
+    """Recently failed keys, kept in one Bloom filter per time bucket.
+
+    A key stays failed for between (buckets - 1) / buckets and the full TTL
+    after it was added; whole buckets expire at once, so there is no
+    per-entry bookkeeping and memory stays fixed however many keys fail.
+    """
+
+    def __init__(self, namespace, ttl, capacity, buckets=4):
+        self.namespace = namespace
+        self.width = ttl / buckets
+        self.buckets = buckets
+        # Each bucket sees roughly 1/buckets of the failures expected per TTL
+        self.bucket_capacity = max(64, capacity // buckets)
+        self._filters = {}  # bucket number -> BloomFilter
+        self._lock = threading.Lock()
+
+    def _bucket(self):
+        return int(time.time() // self.width)
+
+    def add(self, key):
+        """Record that key just failed"""
+        current = self._bucket()
+        with self._lock:
+            for bucket in [bucket for bucket in self._filters if bucket <= current - self.buckets]:
+                del self._filters[bucket]
+            if current not in self._filters:
+                self._filters[current] = BloomFilter(self.bucket_capacity)
+            self._filters[current].add(key)
+
+    def __contains__(self, key):
+        """True when key failed within the TTL (or, rarely, is a false positive)"""
+        oldest = self._bucket() - self.buckets
+        with self._lock:
+            filters = [bloom for bucket, bloom in self._filters.items() if bucket > oldest]
+        return any(key in bloom for bloom in filters)
+
+    def memory(self):
+        with self._lock:
+            return sum(len(bloom.bits) for bloom in self._filters.values())
+
+
+_negative_caches = {}
+_negative_caches_lock = threading.Lock()
+
+
+def get_negative_cache(namespace):
+    """Return the process-wide negative cache for a kind of failure"""
+    with _negative_caches_lock:
+        if namespace not in _negative_caches:
+            ttl, capacity = NEGATIVE_TTLS.get(namespace, DEFAULT_NEGATIVE_TTL)
+            _negative_caches[namespace] = NegativeCache(namespace, ttl, capacity)
+        return _negative_caches[namespace]
+
+
+if __name__ == "__main__":
+    failed_urls = get_negative_cache("url")
+    for i in range(5000):
+        failed_urls.add(f"https://example.com/dead/{i}")
+
+    misses = sum(f"https://example.com/dead/{i}" not in failed_urls for i in range(5000))
+    false_positives = sum(f"https://example.com/live/{i}" in failed_urls for i in range(100000))
+    print(f"{misses} failed URLs forgotten, {false_positives / 100000:.3%} false positives")
+    print(f"{failed_urls.memory()} bytes for 5000 failed URLs")
+
+    rounds = 100000
+    start = time.perf_counter()
+    for i in range(rounds):
+        f"https://example.com/live/{i}" in failed_urls
+    elapsed = time.perf_counter() - start
+    print(f"Lookup: {elapsed / rounds * 1e6:.1f} µs")
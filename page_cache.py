@@ -0,0 +1,125 @@
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from cache import get_cache
+from circuit_breaker import host_of
+from metrics import metrics
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "gclid", "fbclid", "msclkid", "dclid", "yclid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "referrer", "source", "_ga", "_gl", "igshid", "spm",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_")
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonical_url(url):
+    """One spelling per page: lowercase scheme and host, no www., default port, fragment or tracking parameters"""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "http").lower()
+    host = host_of(url)
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip("/") or "/"
+    params = sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit((scheme, host, path, urlencode(params), ""))
+
+
+def dedupe_urls(urls, per_domain=1):
+    """URLs as returned, in order, dropping any whose canonical form repeats and keeping at most per_domain per domain.
+
+    Only the canonical form is compared; the URLs themselves are kept, since
+    some sites only answer on their own spelling (www., trailing slash).
+    """
+    seen = set()
+    per_host = {}
+    unique = []
+    for url in urls:
+        canonical = canonical_url(url)
+        host = host_of(canonical)
+        if canonical in seen or per_host.get(host, 0) >= per_domain:
+            continue
+        seen.add(canonical)
+        per_host[host] = per_host.get(host, 0) + 1
+        unique.append(url)
+    return unique
+
+
+class PageCache:
+    """Parsed result pages, shared by every query.
+
+    Pages are looked up by any spelling of their URL and stored under its
+    canonical form; downloads use the URL as given.
+
+    A page is stored as its parsed fields, or as {} when it was fetched but
+    had nothing usable, so neither kind is downloaded or parsed again until
+    the "pages" cache TTL runs out. Concurrent requests for the same page
+    wait for the one download already in flight.
+    """
+
+    def __init__(self):
+        self._cache = get_cache("pages")
+        self._inflight = {}  # canonical URL -> Event set when its download finishes
+        self._lock = threading.Lock()
+
+    def peek(self, url):
+        """Return the parsed page for a URL, or None when it hasn't been fetched recently"""
+        page = self._cache.peek(canonical_url(url))
+        if page is not None:
+            metrics.increment("pages.hits")
+        return page
+
+    def fetch(self, url, download, wait=15):
+        """Return the parsed page for a URL, calling download(url) unless it is cached or another thread is downloading it.
+
+        Returns (page, downloaded), where downloaded tells whether this call ran download().
+        """
+        key = canonical_url(url)
+        page = self._cache.peek(key)
+        if page is not None:
+            metrics.increment("pages.hits")
+            return page, False
+
+        with self._lock:
+            done = self._inflight.get(key)
+            if done is None:
+                self._inflight[key] = done = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            metrics.increment("pages.joined")
+            done.wait(wait)
+            page = self._cache.peek(key)
+            if page is None:
+                raise LookupError(f"Concurrent fetch of {url} produced no page")
+            return page, False
+
+        try:
+            metrics.increment("pages.downloads")
+            page = download(url)
+            self._cache.set(key, page)
+            return page, True
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            done.set()
+
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache():
+    """Return the process-wide parsed page cache"""
+    global _page_cache
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = PageCache()
+        return _page_cache
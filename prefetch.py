@@ -0,0 +1,91 @@
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+
+class Prefetcher:
+    """Run speculative lookups for a conversation in the background.
+
+    All prefetches share a single low-priority worker that spaces outbound
+    lookups at least `min_interval` seconds apart, so prefetching never adds
+    more than one extra stream of requests to the search and weather APIs.
+    When a session's travel details change, its queued lookups are dropped
+    before the new ones are queued. Only the `max_sessions` most recently
+    updated sessions are tracked; lookups of the others are dropped too.
+    """
+
+    def __init__(self, min_interval=2.0, max_sessions=10000):
+        self.min_interval = min_interval
+        self.max_sessions = max_sessions
+        self._queue = queue.PriorityQueue()
+        self._sessions = OrderedDict()  # session ID -> (generation, signature), least recently updated first
+        self._sequence = itertools.count()
+        self._generations = itertools.count(1)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._last_run = 0.0
+
+    def update(self, session_id, destination, signature, make_lookups):
+        """Schedule lookups for a session when its travel details change.
+
+        `signature` captures every detail the lookups depend on (destination,
+        budget, dietary preferences, ...); nothing is scheduled while it is
+        unchanged. `make_lookups` returns (priority, name, func) tuples.
+        """
+        if not destination:
+            return
+        with self._lock:
+            if session_id in self._sessions and self._sessions[session_id][1] == signature:
+                return
+            # New details invalidate everything still queued for the old ones
+            generation = next(self._generations)
+            self._sessions[session_id] = (generation, signature)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            for priority, name, func in make_lookups():
+                self._queue.put((priority, next(self._sequence), session_id, generation, name, func))
+            self._ensure_worker()
+
+    def cancel(self, session_id):
+        """Drop every queued lookup for a session"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _is_current(self, session_id, generation):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry is not None and entry[0] == generation
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="prefetcher", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            _, _, session_id, generation, name, func = self._queue.get()
+            if not self._is_current(session_id, generation):
+                continue
+
+            # Respect the outbound rate limit shared by all prefetches
+            wait = self._last_run + self.min_interval - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            if not self._is_current(session_id, generation):
+                continue
+
+            self._last_run = time.time()
+            try:
+                print(f"Prefetching {name}")
+                func()
+            except Exception as e:
+                print(f"Prefetch of {name} failed: {str(e)}")
+            finally:
+                self._last_run = time.time()
+
+
+# Shared by every session in this process
+prefetcher = Prefetcher()
@@ -0,0 +1,106 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+# Where folded (flamegraph-ready) profiles are written
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+
+class SamplingProfiler:
+    """Sample the call stack of a single thread at a fixed interval.
+
+    Nothing runs until start() is called, so requests that are not profiled
+    pay no overhead at all.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self.profile_id = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.time() - self.started_at
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((os.path.basename(code.co_filename), code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        """Return the samples in collapsed-stack format (flamegraph.pl, speedscope)"""
+        lines = []
+        for stack, count in self.stacks.most_common():
+            frames = ";".join(f"{name} ({filename}:{line})" for filename, name, line in stack)
+            lines.append(f"{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def top_functions(self, filename="app.py", limit=10):
+        """Rank functions defined in `filename` by the share of samples they appear in"""
+        counts = Counter()
+        for stack, count in self.stacks.items():
+            # Count each function once per sample even when it recurses
+            for frame in set(frame for frame in stack if frame[0] == filename):
+                counts[frame] += count
+        return [
+            {
+                "function": name,
+                "line": line,
+                "samples": count,
+                "percent": round(100.0 * count / self.samples, 1) if self.samples else 0.0
+            }
+            for (_, name, line), count in counts.most_common(limit)
+        ]
+
+    def save(self, label="request"):
+        """Write the folded profile to PROFILE_DIR and return its profile ID"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profile_id = f"{label}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        with open(profile_path(profile_id), "w", encoding="utf-8") as f:
+            f.write(self.folded())
+        return profile_id
+
+
+def profile_path(profile_id):
+    """Return the on-disk path of a saved profile, rejecting anything that is not a plain ID"""
+    if not profile_id or os.path.basename(profile_id) != profile_id:
+        raise ValueError(f"Invalid profile ID: {profile_id}")
+    return os.path.join(PROFILE_DIR, f"{profile_id}.folded")
+
+
+@contextmanager
+def profile_request(label="request", interval=0.005):
+    """Profile the calling thread for the duration of the block and save the result"""
+    profiler = SamplingProfiler(interval=interval)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.profile_id = profiler.save(label)
+        print(f"Saved profile {profiler.profile_id} ({profiler.samples} samples, {profiler.duration:.2f}s)")
@@ -0,0 +1,158 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import get_cache
+from metrics import metrics
+
+# Results shown per page of a "more" reply
+PAGE_SIZE = 3
+# Results loaded for a new result set, and the most a set grows to
+FIRST_LOAD = 9
+MAX_RESULTS = 30
+# A larger set is fetched in the background once fewer than this many unseen results remain
+PREFETCH_MARGIN = PAGE_SIZE
+
+# Background growth and refreshes of result sets share this small pool
+_grow_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="result-pager")
+
+
+class UncachedResults(Exception):
+    """Raised by a loader whose results are only messages (an error, or a fallback with no search results).
+
+    `items` are shown for this request, but never kept in the shared result set.
+    """
+
+    def __init__(self, items):
+        super().__init__("Results not worth keeping")
+        self.items = items
+
+
+def result_set_key(category, place, qualifier=""):
+    """Key of the result set for one kind of lookup at a place, such as restaurants|jp/tokyo|vegan"""
+    return f"{category}|{place}|{qualifier.strip().lower()}"
+
+
+class ResultPager:
+    """Cursor pagination over result sets shared by every conversation.
+
+    Each (category, place, qualifier) has one cached list of results,
+    loaded with load(limit). Conversations keep only a cursor per list in
+    their state (state["cursors"]), so "more" replies are served from memory
+    and the list is only grown, in the background, when a cursor gets close
+    to its end. Lists older than the "result_sets" soft TTL are still served
+    while they are reloaded in the background.
+    """
+
+    def __init__(self, page_size=PAGE_SIZE, first_load=FIRST_LOAD, max_results=MAX_RESULTS):
+        self.page_size = page_size
+        self.first_load = first_load
+        self.max_results = max_results
+        self._sets = get_cache("result_sets")  # key -> {"items": [...], "limit": requested, "exhausted": bool, "loaded_at": time}
+        self._loading = set()
+        self._lock = threading.Lock()
+
+    def first_page(self, state, key, load):
+        """Return the first page of a result set and point the conversation's cursor past it"""
+        return self._page(state, key, load, 0)
+
+    def next_page(self, state, key, load):
+        """Return the page after the conversation's cursor (an empty list once the set is exhausted)"""
+        offset = state.get("cursors", {}).get(key, 0)
+        return self._page(state, key, load, offset)
+
+    def _page(self, state, key, load, offset):
+        try:
+            result_set = self._sets.peek(key)
+            if result_set is None or (offset + self.page_size > len(result_set["items"]) and not result_set["exhausted"]):
+                # Nothing loaded past the cursor yet: this request has to wait for the results
+                limit = max(result_set["limit"] * 2, offset + self.page_size * 3) if result_set else self.first_load
+                result_set = self._load(key, load, limit)
+            else:
+                metrics.increment("result_pages.hits")
+                if time.time() - result_set["loaded_at"] >= self._sets.soft_ttl:
+                    # Served as it is while a fresh copy is loaded in the background
+                    self._in_background(key, self._refresh, key, load)
+        except UncachedResults as e:
+            result_set = {"items": list(e.items), "limit": 0, "exhausted": True}
+
+        items = result_set["items"][offset:offset + self.page_size]
+        cursor = offset + len(items)
+        cursors = dict(state.get("cursors") or {})
+        cursors[key] = cursor
+        state["cursors"] = cursors
+
+        if not result_set["exhausted"] and len(result_set["items"]) - cursor < PREFETCH_MARGIN + self.page_size:
+            self._in_background(key, self._grow, key, load, result_set["limit"] * 2)
+        return items
+
+    def _load(self, key, load, limit):
+        limit = min(limit, self.max_results)
+        metrics.increment("result_pages.loads")
+        loaded = list(load(limit))
+        # Results already paged through keep their positions so cursors stay valid
+        current = self._sets.peek(key)
+        items = list(current["items"]) if current else []
+        added = [item for item in loaded if item not in items]
+        items.extend(added)
+        result_set = {
+            "items": items,
+            "limit": limit,
+            # A larger load that brings nothing new, or one at the cap: there are no more to fetch.
+            # A short load alone doesn't tell, since the search helpers filter what they return
+            "exhausted": (current is not None and limit > current["limit"] and not added) or limit >= self.max_results,
+            "loaded_at": current["loaded_at"] if current else time.time(),
+        }
+        self._sets.set(key, result_set)
+        return result_set
+
+    def _in_background(self, key, work, *args):
+        # One background load per result set at a time
+        with self._lock:
+            if key in self._loading:
+                return
+            self._loading.add(key)
+        _grow_executor.submit(self._run, key, work, *args)
+
+    def _run(self, key, work, *args):
+        try:
+            work(*args)
+        except UncachedResults:
+            pass  # Keep the results already loaded
+        except Exception as e:
+            print(f"Loading results for {key} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._loading.discard(key)
+
+    def _grow(self, key, load, limit):
+        current = self._sets.peek(key)
+        if current is None or current["limit"] < min(limit, self.max_results):
+            self._load(key, load, limit)
+
+    def _refresh(self, key, load):
+        # A refresh replaces the list at the size it had grown to, so cursors may skip or repeat a result
+        current = self._sets.peek(key)
+        if current is None:
+            return
+        metrics.increment("result_pages.refreshes")
+        limit = current["limit"]
+        self._sets.set(key, {
+            "items": list(load(limit)),
+            "limit": limit,
+            "exhausted": limit >= self.max_results,
+            "loaded_at": time.time(),
+        })
+
+
+_result_pager = None
+_result_pager_lock = threading.Lock()
+
+
+def get_result_pager():
+    """Return the process-wide result pager"""
+    global _result_pager
+    with _result_pager_lock:
+        if _result_pager is None:
+            _result_pager = ResultPager()
+        return _result_pager
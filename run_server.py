@@ -8,14 +8,23 @@ def run_streamlit():
     """Run the Streamlit application"""
     subprocess.run([sys.executable, "-m", "streamlit", "run", "app.py"])
 
-def run_api():
+def run_api(workers=1):
     """Run the FastAPI server"""
-    subprocess.run([sys.executable, "api.py"])
+    env = os.environ.copy()
+    env["API_WORKERS"] = str(workers)
+    if workers > 1:
+        # Workers share caches, conversation sessions and job status through SQLite files on this node
+        env.setdefault("SHARED_CACHE_PATH", os.path.join(".cache", "shared_cache.db"))
+        env.setdefault("SESSION_BACKEND", "sqlite")
+        env.setdefault("JOB_BACKEND", "sqlite")
+    subprocess.run([sys.executable, "api.py"], env=env)
 
 def main():
     parser = argparse.ArgumentParser(description='Run the Travel Agent application')
     parser.add_argument('--mode', choices=['streamlit', 'api'], default='streamlit',
                       help='Choose the mode to run the application (default: streamlit)')
+    parser.add_argument('--workers', type=int, default=1,
+                      help='Number of API worker processes (api mode only, default: 1)')
     args = parser.parse_args()
 
     # Load environment variables
@@ -25,8 +34,8 @@ def main():
         print("Starting Streamlit application...")
         run_streamlit()
     else:
-        print("Starting API server...")
-        run_api()
+        print(f"Starting API server with {args.workers} worker(s)...")
+        run_api(args.workers)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
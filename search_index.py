@@ -0,0 +1,160 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from destination_catalog import normalize_city
+from gazetteer import resolve_place
+from search_result import SearchResult
+
+# Append-only log of every indexed search result, replayed on startup
+INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(".cache", "search_index.jsonl"))
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOP_WORDS = {
+    "a", "an", "and", "are", "at", "best", "by", "for", "from", "in", "is", "of",
+    "on", "or", "the", "to", "top", "with"
+}
+
+
+def tokenize(text):
+    """Split text into lowercase index terms, folding simple plurals"""
+    terms = []
+    for term in TOKEN_PATTERN.findall(text.lower()):
+        if term in STOP_WORDS:
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+class SearchIndex:
+    """Incremental inverted index over search results, ranked with BM25"""
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.documents = []
+        self.urls = {}
+        self.postings = {}
+        self.lengths = []
+        self.total_length = 0
+        self.by_destination = {}
+        self._offset = 0  # Bytes of the log already indexed
+        self._lock = threading.Lock()
+        with self._lock:
+            self._catch_up()
+        print(f"Loaded {len(self.documents)} indexed search results")
+
+    def _catch_up(self):
+        """Index results other processes appended to the log since we last read it"""
+        if not self.path or not os.path.exists(self.path) or os.path.getsize(self.path) == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Another process is still writing this line
+                self._offset += len(line)
+                try:
+                    self._index(SearchResult.from_dict(json.loads(line)))
+                except (ValueError, KeyError):
+                    continue  # Skip a line torn by an interrupted write
+
+    def _index(self, document):
+        if document.url in self.urls:
+            return False
+        doc_id = len(self.documents)
+        terms = Counter(tokenize(f"{document.title} {document.description}"))
+        self.documents.append(document)
+        self.urls[document.url] = doc_id
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        length = sum(terms.values())
+        self.lengths.append(length)
+        self.total_length += length
+        self.by_destination.setdefault(document.destination, set()).add(doc_id)
+        return True
+
+    def add(self, results, destination=""):
+        """Index new SearchResult records under a destination and persist them"""
+        destination = normalize_city(destination)
+        added = []
+        with self._lock:
+            self._catch_up()
+            for result in results:
+                document = result if result.destination == destination else SearchResult(
+                    result.title, result.url, result.description, destination
+                )
+                if self._index(document):
+                    added.append(document)
+            if added and self.path:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                # One append per batch so concurrent workers never interleave lines
+                with open(self.path, "ab") as f:
+                    f.write("".join(json.dumps(document.to_dict()) + "\n" for document in added).encode("utf-8"))
+        return len(added)
+
+    def search(self, query, destination=None, limit=5, min_match=0.5):
+        """Return the best matching results for a query, best first.
+
+        Only documents containing at least `min_match` of the distinct query
+        terms are returned, so callers can treat a short list as low recall.
+        """
+        query_terms = set(tokenize(query))
+        if destination:
+            # The destination is applied as a filter, so don't score on it, nor on the
+            # country queries name it with ("Best restaurants in Tokyo, Japan")
+            query_terms -= set(tokenize(destination))
+            place = resolve_place(destination)
+            if place:
+                query_terms -= set(tokenize(place.label))
+        if not query_terms:
+            return []
+
+        with self._lock:
+            self._catch_up()
+            if destination:
+                candidates = self.by_destination.get(normalize_city(destination), set())
+                if not candidates:
+                    return []
+            else:
+                candidates = None
+
+            document_count = len(self.documents)
+            average_length = self.total_length / document_count if document_count else 0
+            scores = Counter()
+            matches = Counter()
+            for term in query_terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    if candidates is not None and doc_id not in candidates:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+                    matches[doc_id] += 1
+
+            required = math.ceil(len(query_terms) * min_match)
+            ranked = [doc_id for doc_id, _ in scores.most_common() if matches[doc_id] >= required]
+            return [self.documents[doc_id] for doc_id in ranked[:limit]]
+
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """Return the process-wide search index, loading it on first use"""
+    global _search_index
+    with _search_index_lock:
+        if _search_index is None:
+            _search_index = SearchIndex()
+        return _search_index
@@ -0,0 +1,101 @@
+import sys
+
+from circuit_breaker import host_of
+
+
+class SearchResult:
+    """One web search result.
+
+    Slotted and with the domain and destination interned, so the thousands
+    of results held by the search cache and index share one copy of each
+    host and city name. Results are rendered to text only when shown
+    (str(result) gives the "title - description" line used in replies).
+    """
+
+    __slots__ = ("title", "url", "description", "domain", "destination")
+
+    def __init__(self, title, url, description, destination=""):
+        self.title = title
+        self.url = url
+        self.description = description
+        self.domain = sys.intern(host_of(url))
+        self.destination = sys.intern(destination)
+
+    def __str__(self):
+        return f"{self.title} - {self.description}"
+
+    def __repr__(self):
+        return f"SearchResult({self.title!r}, {self.url!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, SearchResult) and self.url == other.url
+
+    def __hash__(self):
+        return hash(self.url)
+
+    def __reduce__(self):
+        # Rebuild through __init__ so results loaded from the shared cache are interned again
+        return SearchResult, (self.title, self.url, self.description, self.destination)
+
+    def replace(self, title=None, description=None):
+        """Return a copy with a different title or description (or this record when both are unchanged)"""
+        if (title is None or title == self.title) and (description is None or description == self.description):
+            return self
+        return SearchResult(
+            self.title if title is None else title,
+            self.url,
+            self.description if description is None else description,
+            self.destination
+        )
+
+    def to_dict(self):
+        return {"title": self.title, "url": self.url, "description": self.description, "destination": self.destination}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["title"], data["url"], data["description"], data.get("destination", ""))
+
+
+if __name__ == "__main__":
+    # Compare the memory held by cached results as dicts plus formatted strings
+    # (the old representation) and as SearchResult records
+    import random
+    import tracemalloc
+
+    domains = [f"site{i}.example.com" for i in range(40)]
+    cities = ["tokyo", "paris", "rome", "new york", "bangkok", "lisbon", "kyoto", "barcelona"]
+    words = "museum garden temple market tower river old town view local food art walk night".split()
+    rows = []
+    for i in range(20000):
+        title = " ".join(random.choices(words, k=5)).title()
+        description = " ".join(random.choices(words, k=25)) + "."
+        # Text decoded from pages or JSON arrives as fresh, uninterned strings
+        url = f"https://{random.choice(domains)}/page/{i}".encode().decode()
+        city = random.choice(cities).encode().decode()
+        rows.append((title, url, description, city))
+
+    def measure(build):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        entries = build()
+        size = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del entries
+        return size / len(rows)
+
+    def as_dicts():
+        entries = []
+        for title, url, description, city in rows:
+            entries.append({"title": title, "url": url, "description": description})
+            entries.append(f"{title} - {description}")  # The helpers' formatted copy
+        return entries
+
+    def as_records():
+        return [SearchResult(title, url, description, city) for title, url, description, city in rows]
+
+    dict_bytes = measure(as_dicts)
+    record_bytes = measure(as_records)
+    print(f"dict + formatted string: {dict_bytes:.0f} bytes per result")
+    print(f"SearchResult:            {record_bytes:.0f} bytes per result")
+    print(f"saved:                   {dict_bytes - record_bytes:.0f} bytes per result "
+          f"({1 - record_bytes / dict_bytes:.0%})")
@@ -0,0 +1,131 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+# Only the most recent messages are kept per session; extracted travel info
+# carries everything older messages contributed.
+MAX_SESSION_MESSAGES = 50
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def new_session():
+    return {"messages": [], "travel_info": {}, "itinerary": None}
+
+
+def pack_session(session):
+    """Serialize a session into its compact stored form"""
+    session = dict(session, messages=session["messages"][-MAX_SESSION_MESSAGES:])
+    return zlib.compress(json.dumps(session, separators=(",", ":")).encode("utf-8"))
+
+
+def unpack_session(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class MemorySessionStore:
+    """In-process session store with TTL expiry and LRU eviction under a memory cap"""
+
+    def __init__(self, ttl=3600, max_sessions=10000, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()  # session ID -> (packed session, updated_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """Return the session for an ID, or None when it is unknown or expired"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            blob, updated_at = entry
+            if time.time() - updated_at > self.ttl:
+                self._remove(session_id)
+                return None
+            self._sessions.move_to_end(session_id)
+        return unpack_session(blob)
+
+    def save(self, session_id, session):
+        blob = pack_session(session)
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+            self._sessions[session_id] = (blob, time.time())
+            self._bytes += len(blob)
+            # Evict least recently used sessions until we are back under the caps
+            while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._sessions)))
+
+    def delete(self, session_id):
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove(session_id)
+
+    def _remove(self, session_id):
+        blob, _ = self._sessions.pop(session_id)
+        self._bytes -= len(blob)
+
+
+class SQLiteSessionStore:
+    """Session store in a local SQLite file, shared by every worker process on the node"""
+
+    def __init__(self, path, ttl=3600, max_sessions=100000):
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+
+    def _connect(self):
+        # One connection per thread; WAL lets readers and a writer work concurrently
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id):
+        row = self._connect().execute(
+            "SELECT data FROM sessions WHERE id = ? AND updated_at > ?",
+            (session_id, time.time() - self.ttl)
+        ).fetchone()
+        return unpack_session(row[0]) if row else None
+
+    def save(self, session_id, session):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, pack_session(session), now)
+            )
+            conn.execute("DELETE FROM sessions WHERE updated_at <= ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM sessions WHERE id IN ("
+                "SELECT id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            )
+
+    def delete(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+
+def create_session_store(backend="memory", path="sessions.db", ttl=3600, max_sessions=10000, max_bytes=64 * 1024 * 1024):
+    """Create the session store selected in the settings"""
+    if backend == "sqlite":
+        return SQLiteSessionStore(path, ttl=ttl, max_sessions=max_sessions)
+    return MemorySessionStore(ttl=ttl, max_sessions=max_sessions, max_bytes=max_bytes)
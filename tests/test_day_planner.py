@@ -0,0 +1,20 @@
+import pytest
+
+from day_planner import TIMES_OF_DAY, get_day_planner
+
+
+@pytest.mark.parametrize("destination, preferences", [
+    ("Tokyo", []),
+    ("Tokyo", ["shopping", "nightlife"]),
+    ("Atlantis", []),
+])
+def test_days_differ_without_matching_preferences(destination, preferences):
+    plan = get_day_planner().plan(destination, 5, preferences)
+    for time_of_day in TIMES_OF_DAY:
+        activities = [day[time_of_day] for day in plan]
+        assert len(set(activities)) == len(activities)
+
+
+def test_plans_are_deterministic():
+    planner = get_day_planner()
+    assert planner.plan("Tokyo", 30, ["food", "cultural"]) == planner.plan("Tokyo", 30, ["food", "cultural"])
@@ -0,0 +1,28 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from catalog_scale import generate_fixture  # noqa: E402
+from destination_catalog import DestinationCatalog, build_catalog  # noqa: E402
+
+
+def test_lookups_in_a_large_catalog(tmp_path):
+    source_path = tmp_path / "destinations.json"
+    target_path = tmp_path / "destinations.cat"
+    fixture = generate_fixture(2000)
+    source_path.write_text(json.dumps(fixture), encoding="utf-8")
+    build_catalog(str(source_path), str(target_path))
+    catalog = DestinationCatalog(str(target_path))
+
+    assert len(catalog.cities()) >= 2000
+    for city in ["tokyo 0", "paris 1002", "bangkok 1997"]:
+        entry = fixture[city]
+        assert catalog.get(city, "attractions") == entry["attractions"]
+        assert city in catalog
+        morning = {**fixture["*"]["activities"]["morning"], **entry.get("activities", {}).get("morning", {})}
+        assert catalog.activities(city, "morning") == morning
+    assert catalog.get("Nowhere", "attractions") is None
+    assert "nowhere" not in catalog
+    assert catalog.get("Nowhere", "transport", fallback=True) == fixture["*"]["transport"]
@@ -0,0 +1,40 @@
+import pytest
+
+from intent_router import route_message
+
+# Expected routing for representative messages: (message, intent, slots)
+ROUTING_CORPUS = [
+    ("are there good beaches in bali?", "beach", {}),
+    ("i love food and technology", "interests", {"interests": ["food", "technology"]}),
+    ("i'd like to see some art museums", "interests", {"interests": ["art"]}),
+    ("i love it", None, {"interests": []}),
+    ("what's the weather like in paris", "weather", {"interests": []}),
+    ("whats the weather there", "weather", {}),
+    ("find me a hotel near the station", "hotel", {}),
+    ("where can i eat sushi", "restaurant", {}),
+    ("top attractions please", "attraction", {}),
+    ("make me an itinerary", "itinerary", {}),
+    ("how do i get around by subway", "transport", {}),
+    ("is it dangerous at night", "safety", {}),
+    ("do they take credit card", "currency", {}),
+    ("what language do they use", "language", {}),
+    ("i use a wheelchair", "accessibility", {}),
+    ("any jazz concert tonight", "special_interest", {"special_interest": ["music"]}),
+    ("vacation ideas", "vague", {}),
+    ("thanks", None, {}),
+]
+
+
+@pytest.mark.parametrize("message, intent, slots", ROUTING_CORPUS)
+def test_routing_corpus(message, intent, slots):
+    route = route_message(message)
+    assert route.intent == intent
+    for name, values in slots.items():
+        assert route.slots[name] == values
+
+
+def test_lower_priority_intents_are_still_mentioned():
+    route = route_message("is the weather safe for a beach day")
+    assert route.intent == "beach"
+    assert route.mentions("weather") and route.mentions("safety")
+    assert route.has("day")
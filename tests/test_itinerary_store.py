@@ -0,0 +1,41 @@
+import time
+
+import itinerary_store
+from itinerary_store import ItineraryStore
+
+
+def trip(days):
+    return {"destination": "Tokyo", "duration": f"{days} days", "budget": "moderate", "travel_date": "December"}
+
+
+def test_prune_caps_records(tmp_path):
+    store = ItineraryStore(str(tmp_path / "itineraries.db"), max_records=3)
+    ids = [store.save(trip(days), f"plan {days}") for days in range(1, 6)]
+    store.prune()
+    assert [store.get(itinerary_id) is not None for itinerary_id in ids] == [False, False, True, True, True]
+
+
+def test_prune_expires_old_records(tmp_path):
+    store = ItineraryStore(str(tmp_path / "itineraries.db"), max_age=0.05)
+    itinerary_id = store.save(trip(3), "plan")
+    time.sleep(0.1)
+    store.prune()
+    assert store.get(itinerary_id) is None
+
+
+def test_undated_itinerary_without_forecast_lines_outlives_forecast_runs(tmp_path, monkeypatch):
+    store = ItineraryStore(str(tmp_path / "itineraries.db"))
+    undated = {"destination": "Tokyo", "duration": "3 days"}
+    itinerary_id = store.save(undated, "plan without forecast lines")
+    monkeypatch.setattr(itinerary_store, "forecast_key", lambda travel_date: "2026-10-19@999999")
+    assert store.find(undated)["id"] == itinerary_id
+
+
+def test_itinerary_with_forecast_lines_needs_the_same_forecast_run(tmp_path, monkeypatch):
+    store = ItineraryStore(str(tmp_path / "itineraries.db"))
+    undated = {"destination": "Tokyo", "duration": "3 days"}
+    monkeypatch.setattr(itinerary_store, "forecast_key", lambda travel_date: "2026-10-19@1")
+    itinerary_id = store.save(undated, "plan with forecast lines", "2026-10-19@1")
+    assert store.find(undated)["id"] == itinerary_id
+    monkeypatch.setattr(itinerary_store, "forecast_key", lambda travel_date: "2026-10-19@2")
+    assert store.find(undated) is None
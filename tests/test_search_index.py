@@ -0,0 +1,21 @@
+from search_index import SearchIndex
+from search_result import SearchResult
+
+
+def make_index():
+    index = SearchIndex(path=None)
+    index.add([
+        SearchResult("Senso-ji Temple", "https://a.example/sensoji", "Tokyo's oldest Buddhist temple in Asakusa, Japan", "Tokyo"),
+        SearchResult("Meiji Shrine", "https://a.example/meiji", "Shinto shrine in a forest in central Tokyo, Japan", "Tokyo"),
+        SearchResult("Sushi Dai", "https://a.example/sushi", "Restaurant serving sushi breakfasts at Toyosu market", "Tokyo"),
+    ], "Tokyo")
+    return index
+
+
+def test_country_in_query_label_is_not_scored():
+    results = make_index().search("Best restaurants in Tokyo, Japan", destination="Tokyo")
+    assert [result.url for result in results] == ["https://a.example/sushi"]
+
+
+def test_query_of_only_the_place_label_matches_nothing():
+    assert make_index().search("Tokyo, Japan", destination="Tokyo") == []
@@ -0,0 +1,52 @@
+from app import extract_info_directly
+from chat_history import MessageArchive, compact
+from session_store import MAX_SESSION_MESSAGES, MemorySessionStore, new_session
+
+
+def test_duration_survives_archiving():
+    messages = [
+        {"role": "user", "content": "I'm planning a trip to Tokyo for 10 days"},
+        {"role": "assistant", "content": "Great choice! What are you interested in?"},
+    ]
+    travel_info = extract_info_directly([msg["content"] for msg in messages])
+    assert travel_info["duration"] == "10 days"
+
+    # Enough small talk to push the first messages out of the live window
+    archive = MessageArchive()
+    for i in range(30):
+        messages.append({"role": "user", "content": f"Any tips for museums and food, question {i}?"})
+        messages.append({"role": "assistant", "content": "Here are some ideas."})
+        travel_info = extract_info_directly([msg["content"] for msg in messages], travel_info)
+        compact(messages, archive, keep=8)
+
+    assert not any("10 days" in msg["content"] for msg in messages)
+    assert travel_info["duration"] == "10 days"
+    assert travel_info["destination"] == "Tokyo"
+    assert set(travel_info["preferences"]) >= {"art", "food"}
+
+
+def test_new_duration_replaces_known_one():
+    known = extract_info_directly(["I want to visit Paris for 10 days"])
+    travel_info = extract_info_directly(["Actually, make it 4 days"], known)
+    assert travel_info["duration"] == "4 days"
+    assert travel_info["destination"] == known["destination"]
+
+
+def test_default_duration_only_without_one():
+    assert extract_info_directly(["I want to visit Rome"])["duration"] == "5 days"
+
+
+def test_api_session_keeps_travel_info_past_trim():
+    store = MemorySessionStore()
+    session = new_session()
+    for message in ["I'm going to Lisbon for 10 days"] + [f"More food tips please ({i})" for i in range(60)]:
+        session["messages"].append({"role": "user", "content": message})
+        session["travel_info"] = extract_info_directly(
+            [msg["content"] for msg in session["messages"]], session["travel_info"]
+        )
+        store.save("s", session)
+        session = store.get("s")
+
+    assert len(session["messages"]) == MAX_SESSION_MESSAGES
+    assert session["travel_info"]["duration"] == "10 days"
+    assert session["travel_info"]["destination"] == "Lisbon"
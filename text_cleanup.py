@@ -0,0 +1,117 @@
+import re
+
+# Titles: everything from the first "|" or spaced dash (" - ", " – ", " — ") on is
+# the site name or a tagline; hyphens inside words ("Hop-on", "Senso-ji") stay
+TITLE_TAIL_PATTERN = re.compile(r"\s*\|.*|\s+[-–—]\s+.*", re.DOTALL)
+
+# Descriptions: "Visit example.com" plugs are removed, and a URL or "www."
+# cuts the rest of the text. One alternation, so the text is scanned once.
+DESCRIPTION_NOISE_PATTERN = re.compile(r"(?i:visit.*?\.com)|https?://.*|www\..*", re.DOTALL)
+
+# Hotel names: a year and anything after it ("Hotel Lumen 2024 Review") is dropped
+YEAR_SUFFIX_PATTERN = re.compile(r"\s*\d{4}.*", re.DOTALL)
+
+
+def collapse_whitespace(text):
+    """Text on one line with single spaces; str.split does this faster than a regex pass"""
+    return " ".join(text.split())
+
+
+def clean_title(title):
+    """Page title without the site name or tagline, on one line"""
+    return collapse_whitespace(TITLE_TAIL_PATTERN.sub("", title, count=1))
+
+
+def clean_description(description):
+    """Description without site plugs, trailing URLs or extra whitespace"""
+    return collapse_whitespace(DESCRIPTION_NOISE_PATTERN.sub("", description))
+
+
+def short_title(title):
+    """A clean title cut before any year"""
+    return YEAR_SUFFIX_PATTERN.sub("", title, count=1)
+
+
+def first_sentence(text):
+    """Text up to its first full stop"""
+    return text.split(".", 1)[0].strip()
+
+
+if __name__ == "__main__":
+    # Benchmark the fused cleanup against the per-pattern chain it replaced,
+    # on the titles in the local search index when there is one
+    import json
+    import os
+    import timeit
+
+    def legacy_title(title):
+        title = re.sub(r'\s*\|.*$', '', title)
+        title = re.sub(r'\s*-\s*.*$', '', title)
+        title = re.sub(r'\s+', ' ', title).strip()
+        # The helpers then cleaned the title again
+        title = re.sub(r'\s*\|.*$', '', title)
+        return re.sub(r'\s*-\s*.*$', '', title)
+
+    def legacy_description(description):
+        description = re.sub(r'Visit.*?\.com', '', description, flags=re.IGNORECASE)
+        description = re.sub(r'https?://.*$', '', description)
+        description = re.sub(r'www\..*$', '', description)
+        return re.sub(r'\s+', ' ', description).strip()
+
+    titles = [
+        "THE 15 BEST Things to Do in Tokyo (2024) - Must-See Attractions",
+        "Tokyo travel guide | Lonely Planet",
+        "Top 10 attractions in Paris | Time Out Paris",
+        "The 25 Best Restaurants in Rome Right Now - Eater",
+        "Kyoto's Best Temples and Shrines - Japan Guide",
+        "Where to Eat in Lisbon: 20 Essential Restaurants | Condé Nast Traveler",
+        "Barcelona Beaches: A Local's Guide - Barcelona Tourism",
+        "  Wheelchair Accessible Things to Do in London \n | VisitLondon.com  ",
+        "Best Luxury Hotels in Bangkok 2024 | Forbes Travel Guide",
+        "New York City Museums — The Complete Guide | NYC Tourism",
+        "Street Food in Bangkok: Where to Go and What to Eat",
+        "Sydney Opera House Tours & Tickets - Official Site",
+        "Amsterdam Canal Cruises | Compare Prices & Book Online",
+        "Vegan Restaurants in Berlin - HappyCow",
+        "The Best Hikes Near Cape Town | AllTrails",
+        # Hyphenated names and unspaced dashes belong to the title
+        "Hop-on Hop-off Bus Tours in Rome - Official Site",
+        "Senso-ji Temple: Tokyo's Oldest Temple | Japan Guide",
+        "Half-Day Walking Tour of Old Montréal",
+        "Saint-Germain-des-Prés Cafés — Le Guide",
+        "Wi-Fi Friendly Cafés in Lisbon – Remote Work Guide",
+        "Day Trip to Mont-Saint-Michel from Paris",
+        "Lisbon 2-Day Itinerary|Lisbon Lux",
+    ]
+    descriptions = [
+        "Discover the best things to do in Tokyo, from temples to neon-lit streets. Visit gotokyo.com for more.",
+        "Plan your trip with our guide to Paris.\n\nMore at https://www.example.com/paris/guide",
+        "Book tours and activities in Rome, read reviews and see photos.   www.example.org/rome",
+        "Our editors pick the restaurants worth a detour in Lisbon, updated monthly.",
+    ]
+    index_path = os.getenv("SEARCH_INDEX_PATH", os.path.join(".cache", "search_index.jsonl"))
+    if os.path.exists(index_path):
+        # Titles in the index are already clean, so this corpus mostly measures the no-op path
+        with open(index_path, encoding="utf-8") as f:
+            documents = [json.loads(line) for line in f if line.strip()]
+        titles += [document["title"] for document in documents]
+        descriptions += [document["description"] for document in documents]
+
+    # The old chain cut titles at any hyphen ("Hop-on ..." became "Hop"), and its "$"
+    # only matched at the very end, so it left URLs on inner lines of multi-line
+    # text in place; those are the expected differences
+    changed_titles = sum(clean_title(title) != legacy_title(title).strip() for title in titles)
+    changed_descriptions = sum(clean_description(text) != legacy_description(text) for text in descriptions)
+    print(f"{len(titles)} titles, {len(descriptions)} descriptions; cleaned differently from the old chain: "
+          f"{changed_titles} titles, {changed_descriptions} descriptions")
+
+    rounds = max(1, 20000 // len(titles))
+    for name, legacy, fused, corpus in [
+        ("titles", legacy_title, clean_title, titles),
+        ("descriptions", legacy_description, clean_description, descriptions),
+    ]:
+        before = timeit.timeit(lambda: [legacy(text) for text in corpus], number=rounds)
+        after = timeit.timeit(lambda: [fused(text) for text in corpus], number=rounds)
+        count = rounds * len(corpus)
+        print(f"{name:13} old chain {before / count * 1e6:6.2f} us   fused {after / count * 1e6:6.2f} us   "
+              f"({before / after:.1f}x)")